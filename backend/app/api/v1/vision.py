@@ -3,15 +3,47 @@ Vision API for real-time pose detection and exercise tracking.
 Uses WebSocket for low-latency video frame processing.
 """
 import os
-import base64
+import asyncio
+import functools
 import json
 import logging
-import numpy as np
-import cv2
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
-from fastapi.responses import JSONResponse
-from typing import Dict, Any
-from app.workouts import get_rtmpose_processor
+import math
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from typing import Dict, Any, NamedTuple, Optional, Tuple, Union
+from app.config import settings
+from app.services.redis_service import redis_service
+from app.workouts import get_rtmpose_processor, PoseSession, SessionRegistry
+from app.workouts.adaptive import NodeLoadMonitor
+from app.workouts.admission import CapacityManager, TokenBucket
+from app.workouts.exercise_catalog import ExerciseCatalog
+from app.workouts.frames import FrameDecodeError
+from app.workouts.inference_executor import InferenceExecutor, InferenceQueueFull
+from app.workouts.mailbox import FrameMailbox
+from app.workouts.metrics import NULL_TIMER, LatencyHistograms, StageTimer
+from app.workouts.onnx_sessions import OrtSessionConfig
+from app.workouts.protocol import (
+    FRAME_HEADER,
+    CompactResponseEncoder,
+    MSG_IMAGE_FRAME,
+    MSG_KEYPOINTS,
+    MSG_ROI_FRAME,
+    PROTOCOL_VERSION,
+    RESULT_HEADER,
+    ProtocolError,
+    build_exercise_ids,
+    parse_binary_frame,
+    parse_keypoints_payload,
+    parse_roi_payload
+)
+from app.workouts.rtmpose_processor import MAX_FRAME_SIZE, POSE_MODEL_FILES
+from app.workouts.video_analysis import VideoAnalysisError, analyze_video, create_video_pool
+from app.workouts.vision_workers import VisionWorkerPool
 
 logger = logging.getLogger(__name__)
 
@@ -22,20 +54,119 @@ BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__
 MODELS_DIR = os.path.join(BACKEND_DIR, 'models')
 EXERCISES_CONFIG = os.path.join(BACKEND_DIR, 'data', 'exercises.json')
 
+# Client-chosen token under which a session's state is persisted for resume
+SESSION_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,128}$')
+
+# exercises.json, parsed once and hot-reloaded into live sessions when it changes
+exercise_catalog = ExerciseCatalog(EXERCISES_CONFIG, check_interval=settings.VISION_EXERCISES_RELOAD_SECONDS)
+
 # Initialize processor (singleton pattern)
 processor = None
+_processor_lock = threading.Lock()
+
+# Per-stage frame latency, exported by GET /metrics
+stage_latency = LatencyHistograms()
+
+# Startup warm-up progress (VISION_WARMUP), reported by GET /ready
+warmup_status: Dict[str, Any] = {"state": "pending", "models": {}}
+
+# Optional multi-process inference tier (VISION_WORKER_PROCESSES > 0)
+worker_pool: Optional[VisionWorkerPool] = None
+
+# Process pool for uploaded video analysis (created on first upload)
+video_pool: Optional[ProcessPoolExecutor] = None
+
+# Per-connection counting sessions sharing the processor's models
+sessions = SessionRegistry()
+
+# Decode + pose + count work runs here instead of on the event loop
+inference_executor = InferenceExecutor(
+    max_workers=settings.VISION_INFERENCE_WORKERS,
+    max_pending=settings.VISION_MAX_PENDING_FRAMES
+)
+
+# Session admission from the measured inference budget (VISION_ADMISSION_CONTROL)
+capacity_manager = CapacityManager(
+    parallelism=(
+        min(settings.VISION_INFERENCE_WORKERS, settings.VISION_WORKER_PROCESSES)
+        if settings.VISION_WORKER_PROCESSES > 0 else settings.VISION_INFERENCE_WORKERS
+    ),
+    target_utilization=settings.VISION_TARGET_UTILIZATION,
+    session_fps=settings.VISION_SESSION_FPS,
+    retry_after=settings.VISION_BUSY_RETRY_SECONDS
+)
+
+# WebSocket close codes for "try again later" and "internal error" (RFC 6455 registry)
+WS_TRY_AGAIN_LATER = 1013
+WS_INTERNAL_ERROR = 1011
+
+# Node load signal for adaptive mode selection (VISION_ADAPTIVE_MODE)
+load_monitor = NodeLoadMonitor(
+    inference_executor,
+    overload_latency_ms=settings.VISION_OVERLOAD_LATENCY_MS,
+    overload_queue_ratio=settings.VISION_OVERLOAD_QUEUE_RATIO
+)
+
+
+def get_session_config() -> OrtSessionConfig:
+    """ONNX Runtime session options from settings"""
+    cache_dir = settings.VISION_ORT_CACHE_DIR
+    if cache_dir and not os.path.isabs(cache_dir):
+        cache_dir = os.path.join(BACKEND_DIR, cache_dir)
+    return OrtSessionConfig(
+        intra_op_threads=settings.VISION_ORT_INTRA_OP_THREADS,
+        inter_op_threads=settings.VISION_ORT_INTER_OP_THREADS,
+        execution_mode=settings.VISION_ORT_EXECUTION_MODE,
+        graph_optimization=settings.VISION_ORT_GRAPH_OPTIMIZATION,
+        enable_mem_arena=settings.VISION_ORT_MEM_ARENA,
+        cache_dir=cache_dir or None
+    )
 
 
 def get_processor():
-    """Get or initialize RTMPose processor"""
-    global processor
-    if processor is None:
+    """Get or initialize RTMPose processor (thread-safe; the first call loads the models)"""
+    global processor, worker_pool
+    if processor is not None:
+        return processor
+
+    with _processor_lock:
+        if processor is not None:
+            return processor
         try:
-            processor = get_rtmpose_processor(
+            use_workers = settings.VISION_WORKER_PROCESSES > 0
+            mode = settings.VISION_MODE  # Can be: 'lightweight', 'balanced', 'performance'
+            # Adaptive sessions switch models per frame, so keep every mode loaded
+            extra_modes = list(POSE_MODEL_FILES) if settings.VISION_ADAPTIVE_MODE else []
+            session_config = get_session_config()
+            proc = get_rtmpose_processor(
                 models_dir=MODELS_DIR,
                 exercises_config_path=EXERCISES_CONFIG,
-                mode='balanced'  # Can be: 'lightweight', 'balanced', 'performance'
+                mode=mode,
+                load_models=not use_workers,
+                session_config=session_config,
+                precision=settings.VISION_MODEL_PRECISION,
+                catalog=exercise_catalog
             )
+            if use_workers:
+                # Models live in the worker processes; this process only counts
+                worker_pool = VisionWorkerPool(
+                    models_dir=MODELS_DIR,
+                    mode=mode,
+                    workers=settings.VISION_WORKER_PROCESSES,
+                    session_config=session_config,
+                    precision=settings.VISION_MODEL_PRECISION,
+                    extra_modes=extra_modes
+                )
+                proc.pose_runner = worker_pool
+            else:
+                proc.load_pose_modes(extra_modes)
+                if settings.VISION_BATCH_WINDOW_MS > 0:
+                    proc.enable_batching(
+                        window_ms=settings.VISION_BATCH_WINDOW_MS,
+                        max_batch_size=settings.VISION_MAX_BATCH_SIZE
+                    )
+            # Published only once fully set up, so other threads never see a half-built processor
+            processor = proc
             logger.info("✓ RTMPose processor initialized successfully")
         except Exception as e:
             logger.error(f"✗ Failed to initialize RTMPose processor: {e}")
@@ -43,40 +174,542 @@ def get_processor():
     return processor
 
 
+async def get_processor_async():
+    """get_processor without blocking the event loop while models load"""
+    if processor is not None:
+        return processor
+    return await asyncio.to_thread(get_processor)
+
+
+def warm_up_vision():
+    """Load every model and run it on dummy frames (startup background thread)"""
+    warmup_status.update(state="warming", started_at=time.time())
+    started = time.perf_counter()
+    try:
+        proc = get_processor()
+        if worker_pool is not None:
+            models = {f"worker_{i}": stats for i, stats in enumerate(worker_pool.warm_stats)}
+        else:
+            models = proc.warm_up(settings.VISION_WARMUP_RUNS)
+        warmup_status.update(state="ready", models=models)
+
+        # Until real frames are measured, budget sessions with the warm detector + pose latency
+        model_stats = next(iter(models.values()), {}) if worker_pool is not None else models
+        frame_ms = [model_stats.get(name, {}).get("warm_ms") for name in ("detector", f"pose_{proc.mode}")]
+        if all(frame_ms):
+            capacity_manager.seed_cost(sum(frame_ms))
+        logger.info(f"✓ Vision models warm in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        warmup_status.update(state="failed", error=str(e))
+        logger.error(f"✗ Vision warm-up failed: {e}")
+    warmup_status["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def start_vision_warmup() -> threading.Thread:
+    """Warm the vision models without delaying application startup"""
+    thread = threading.Thread(target=warm_up_vision, name="vision-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_video_pool() -> ProcessPoolExecutor:
+    """Get or start the video analysis process pool"""
+    global video_pool
+    if video_pool is None:
+        video_pool = create_video_pool(
+            workers=settings.VISION_VIDEO_WORKERS,
+            models_dir=MODELS_DIR,
+            mode=settings.VISION_MODE,
+            session_config=get_session_config(),
+            precision=settings.VISION_MODEL_PRECISION
+        )
+    return video_pool
+
+
+def shutdown_vision():
+    """Stop inference threads and worker processes"""
+    inference_executor.shutdown()
+    if worker_pool is not None:
+        worker_pool.close()
+    if video_pool is not None:
+        video_pool.shutdown(wait=False, cancel_futures=True)
+
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the models are loaded and warm, 503 before (per-model warm-up latency)"""
+    body = {"ready": warmup_status["state"] == "ready", **warmup_status}
+    if not body["ready"] and not settings.VISION_WARMUP and processor is not None:
+        # Lazy loading without warm-up: loaded is as ready as it gets
+        body.update(ready=True, state="loaded")
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
 @router.get("/health")
 async def health_check():
     """Check if vision API is ready"""
+    if warmup_status["state"] == "warming":
+        raise HTTPException(status_code=503, detail="Vision API not ready: models are warming up")
     try:
-        proc = get_processor()
+        proc = await get_processor_async()
         return {
             "status": "healthy",
             "pose_detection": "ready",
+            "mode": proc.mode,
+            "precision": proc.precision,
+            "adaptive": load_monitor.get_stats() if settings.VISION_ADAPTIVE_MODE else None,
+            "active_sessions": len(sessions),
+            "inference": inference_executor.get_stats(),
+            "batching": proc.pose_batcher.get_stats() if proc.pose_batcher else None,
+            "workers": worker_pool.get_stats() if worker_pool else None,
             "models_dir": MODELS_DIR,
-            "exercises_config": EXERCISES_CONFIG
+            "exercises_config": EXERCISES_CONFIG,
+            "exercises": exercise_catalog.get_stats(),
+            "capacity": capacity_manager.get_stats()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail=f"Vision API not ready: {str(e)}")
 
 
+@router.get("/capacity")
+async def capacity():
+    """Utilization and session headroom for load balancers: 200 while admitting, else 503"""
+    stats = capacity_manager.get_stats()
+    if stats["admitting"] or not settings.VISION_ADMISSION_CONTROL:
+        return stats
+    return JSONResponse(status_code=503, content=stats, headers={"Retry-After": str(stats["retry_after"])})
+
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms per model mode and current load"""
+    inference = inference_executor.get_stats()
+    capacity_stats = capacity_manager.get_stats()
+    gauges = [
+        ("vision_utilization", "Busy share of the inference budget over the last window",
+         capacity_stats["utilization"]),
+        ("vision_session_capacity", "Sessions that fit under the target utilization", capacity_stats["session_capacity"]),
+        ("vision_frame_cost_seconds", "Smoothed service time of one image frame", capacity_stats["frame_cost_ms"] / 1000),
+        ("vision_rejected_sessions_total", "Sessions turned away for lack of capacity",
+         capacity_stats["rejected_sessions"]),
+        ("vision_active_sessions", "Open pose WebSocket sessions", len(sessions)),
+        ("vision_inference_pending", "Frames queued or running on the inference executor", inference["pending"]),
+        ("vision_inference_rejected_frames_total", "Frames rejected because the node was saturated",
+         inference["rejected_frames"])
+    ]
+    lines = []
+    for name, help_text, value in gauges:
+        metric_type = "counter" if name.endswith("_total") else "gauge"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+    body = "\n".join(lines) + "\n" + stage_latency.render_prometheus()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
 @router.get("/exercises")
-async def list_exercises():
-    """Get list of supported exercises"""
+async def list_exercises(request: Request):
+    """Get list of supported exercises (revalidate with If-None-Match)"""
+    snapshot = exercise_catalog.snapshot
+    if snapshot.listing is None:
+        logger.error(f"Failed to load exercises from {EXERCISES_CONFIG}")
+        raise HTTPException(status_code=500, detail="Failed to load exercises")
+
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if snapshot.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.listing, media_type="application/json", headers=headers)
+
+
+async def _load_session_snapshot(session: PoseSession, token: str) -> bool:
+    """Restore the state last persisted under a session token; True if resumed"""
     try:
-        with open(EXERCISES_CONFIG, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            exercises = []
-            for ex_id, ex_data in data.get('exercises', {}).items():
-                exercises.append({
-                    "id": ex_id,
-                    "name_ru": ex_data.get("name_ru"),
-                    "name_en": ex_data.get("name_en"),
-                    "is_leg_exercise": ex_data.get("is_leg_exercise", False)
-                })
-            return {"exercises": exercises}
+        data = await redis_service.get_vision_session(token)
+        if not data:
+            return False
+        session.restore_snapshot(json.loads(data))
+        return True
     except Exception as e:
-        logger.error(f"Failed to load exercises: {e}")
-        raise HTTPException(status_code=500, detail="Failed to load exercises")
+        logger.warning(f"Session snapshot restore failed: {e}")
+        return False
+
+
+async def _store_session_snapshot(token: str, data: str):
+    """Write a serialized session snapshot (failures only cost resumability)"""
+    try:
+        await redis_service.store_vision_session(token, data, settings.VISION_SESSION_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Session snapshot write failed: {e}")
+
+
+def _serialize_snapshot(session: PoseSession) -> str:
+    return json.dumps(session.get_snapshot(), separators=(',', ':'))
+
+
+class KeypointFrame(NamedTuple):
+    """Keypoints computed on the client (COCO-17 or BlazePose-33)"""
+    keypoints: Any
+    scores: Any
+
+
+class RoiFrame(NamedTuple):
+    """Encoded crop of the client's camera frame at (x, y)"""
+    data: Union[str, memoryview]
+    origin: Tuple[float, float]
+
+
+def _process_message(
+    session: PoseSession,
+    frame_data: Union[str, memoryview, KeypointFrame, RoiFrame],
+    exercise_type: str,
+    timer: StageTimer = NULL_TIMER
+) -> Dict[str, Any]:
+    """Decode, run pose detection and build the response (runs on the inference executor)"""
+    is_keypoint_frame = isinstance(frame_data, KeypointFrame)
+    timer.mark('queue')
+    try:
+        if is_keypoint_frame:
+            current_angle, angle_point, keypoints = session.process_keypoints(
+                frame_data.keypoints,
+                frame_data.scores,
+                exercise_type,
+                timer
+            )
+        elif isinstance(frame_data, RoiFrame):
+            current_angle, angle_point, keypoints = session.process_encoded_frame(
+                frame_data.data,
+                exercise_type,
+                timer,
+                frame_data.origin
+            )
+        else:
+            current_angle, angle_point, keypoints = session.process_encoded_frame(
+                frame_data,
+                exercise_type,
+                timer
+            )
+    except FrameDecodeError as e:
+        logger.error(f"Image decode error: {e}")
+        return {"error": str(e)}
+    except ValueError as e:
+        return {"error": f"Invalid keypoints: {str(e)}", "success": False}
+    except Exception as e:
+        logger.error(f"Frame processing error: {e}")
+        return {
+            "error": f"Processing error: {str(e)}",
+            "success": False
+        }
+
+    # Prepare response
+    response: Dict[str, Any] = {
+        "success": True,
+        "session_id": session.session_id,
+        "exercise": exercise_type,
+        **session.get_state()
+    }
+
+    if not is_keypoint_frame:
+        response["mode"] = session.last_mode
+        if session.roi_frame_size is not None:
+            # Region the client may crop the next frame to (None: send the full frame)
+            response["roi"] = session.tracked_roi()
+
+    # Add keypoints if detected (clients that sent keypoints already have them)
+    if keypoints is not None:
+        if not is_keypoint_frame and session.send_keypoints:
+            response["keypoints"] = keypoints
+        response["detected"] = True
+    else:
+        response["detected"] = False
+
+    # Add angle info if available
+    if current_angle is not None:
+        response["angle"] = round(float(current_angle), 1)
+
+    if angle_point is not None:
+        response["angle_point"] = angle_point
+
+    if session.debug_timings:
+        response["timings_ms"] = timer.as_dict()
+
+    return response
+
+
+def _process_image_message(
+    session: PoseSession,
+    frame_data: Union[str, memoryview, RoiFrame],
+    exercise_type: str,
+    timer: StageTimer = NULL_TIMER
+) -> Dict[str, Any]:
+    """_process_message for image frames, reporting their service time to admission control"""
+    started = time.perf_counter()
+    try:
+        return _process_message(session, frame_data, exercise_type, timer)
+    finally:
+        capacity_manager.record((time.perf_counter() - started) * 1000)
+
+
+async def _send(websocket: WebSocket, send_lock: asyncio.Lock, payload: Dict[str, Any]):
+    """Send JSON from either the reader or the inference task without interleaving"""
+    async with send_lock:
+        await websocket.send_json(payload)
+
+
+async def _send_result(
+    websocket: WebSocket,
+    send_lock: asyncio.Lock,
+    session: PoseSession,
+    response: Dict[str, Any],
+    timer: StageTimer = NULL_TIMER
+):
+    """Send a processed frame as a compact binary result or as JSON"""
+    if session.response_encoder is not None and response.get("success"):
+        data = session.response_encoder.encode(response)
+        timer.mark('serialize')
+        async with send_lock:
+            await websocket.send_bytes(data)
+        timer.mark('send')
+        return
+
+    keypoints = response.get("keypoints")
+    if keypoints is not None:
+        # Convert numpy arrays to lists for JSON serialization
+        response["keypoints"] = keypoints.tolist()
+    # Serialized here rather than in send_json so both stages can be timed
+    text = json.dumps(response, separators=(",", ":"), ensure_ascii=False)
+    timer.mark('serialize')
+    async with send_lock:
+        await websocket.send_text(text)
+    timer.mark('send')
+
+
+def _session_share_fps() -> Optional[float]:
+    """Frame rate one session may use of the node's inference budget"""
+    if not settings.VISION_ADMISSION_CONTROL:
+        return None
+    capacity_fps = capacity_manager.capacity_fps * capacity_manager.target_utilization
+    return capacity_fps / max(capacity_manager.active_sessions, 1)
+
+
+def _number_option(message: Dict[str, Any], key: str, default: float, low: float, high: float) -> Optional[float]:
+    """Positive numeric hello option clamped to [low, high], None when the client sent anything else"""
+    value = message.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value) or value <= 0:
+        return None
+    return min(max(value, low), high)
+
+
+def _configure_rate_control(session: PoseSession, enabled: bool, latency_budget_ms: Optional[float] = None):
+    session.configure_rate_control(
+        enabled,
+        max_fps=settings.VISION_SESSION_MAX_FPS or 30.0,
+        latency_budget_ms=latency_budget_ms or settings.VISION_RATE_LATENCY_BUDGET_MS
+    )
+
+
+async def _inference_loop(
+    websocket: WebSocket,
+    session: PoseSession,
+    mailbox: FrameMailbox,
+    send_lock: asyncio.Lock
+):
+    """Always process the newest frame of one session on the inference executor"""
+    snapshot_task: Optional[asyncio.Task] = None
+    snapshot_frame, snapshot_reps = session.frames_processed, session.exercise_counter.get_counter()
+    next_rate_control = 0.0
+
+    while True:
+        # Persist resumable state every few frames and on every rep, without waiting for Redis
+        if session.resume_token is not None and (snapshot_task is None or snapshot_task.done()):
+            reps = session.exercise_counter.get_counter()
+            if reps != snapshot_reps or session.frames_processed - snapshot_frame >= settings.VISION_SESSION_SNAPSHOT_FRAMES:
+                snapshot_frame, snapshot_reps = session.frames_processed, reps
+                snapshot_task = asyncio.create_task(
+                    _store_session_snapshot(session.resume_token, _serialize_snapshot(session))
+                )
+
+        frame_data, exercise_type, frame_meta, timer = await mailbox.get()
+        started = time.perf_counter()
+
+        # Client keypoints only need counting, which is cheap enough to run inline
+        if isinstance(frame_data, KeypointFrame):
+            response = _process_message(session, frame_data, exercise_type, timer)
+            response.update(frame_meta)
+            response["queue_depth"] = mailbox.depth
+            response["dropped_frames"] = session.dropped_frames
+            await _send_result(websocket, send_lock, session, response, timer)
+            stage_latency.record(timer, "keypoints")
+            continue
+
+        # Reject the frame when the node as a whole is saturated
+        try:
+            inference_executor.reserve(session.session_id)
+        except InferenceQueueFull:
+            session.dropped_frames += 1
+            await _send(websocket, send_lock, {
+                "success": False,
+                "error": "Server busy, frame dropped",
+                "dropped": True,
+                "dropped_frames": session.dropped_frames,
+                **frame_meta
+            })
+            continue
+
+        try:
+            response = await inference_executor.run(
+                _process_image_message, session, frame_data, exercise_type, timer
+            )
+        finally:
+            inference_executor.release(session.session_id)
+
+        response.update(frame_meta)
+        response["queue_depth"] = mailbox.depth
+        response["dropped_frames"] = session.dropped_frames
+        await _send_result(websocket, send_lock, session, response, timer)
+        stage_latency.record(timer, session.last_mode)
+
+        # Periodically recommend a frame rate and size, and measure the round trip
+        advisor = session.rate_advisor
+        if advisor is not None:
+            now = time.perf_counter()
+            advisor.record_frame((now - started) * 1000)
+            if now >= next_rate_control:
+                next_rate_control = now + settings.VISION_RATE_CONTROL_INTERVAL
+                recommendation = advisor.recommend(_session_share_fps())
+                if advisor.changed(recommendation):
+                    await _send(websocket, send_lock, {"type": "rate", **recommendation})
+                await _send(websocket, send_lock, {"type": "ping", "ts": round(time.monotonic() * 1000, 1)})
+
+
+def _stop_reader_on_failure(reader: asyncio.Task, inference_task: asyncio.Task):
+    """Done-callback of the inference loop: a crashed loop cancels the reader so the session ends"""
+    if not inference_task.cancelled() and inference_task.exception() is not None:
+        reader.cancel()
+
+
+async def _reject_busy(websocket: WebSocket, send_lock: asyncio.Lock):
+    """Turn a session away for lack of capacity (close code 1013, try again later)"""
+    stats = capacity_manager.get_stats()
+    logger.warning(f"Vision session rejected: no capacity ({stats['active_sessions']} active)")
+    await _send(websocket, send_lock, {
+        "type": "busy",
+        "error": "Server busy, retry later",
+        "retry_after": stats["retry_after"],
+        "utilization": stats["utilization"],
+        "session_capacity": stats["session_capacity"]
+    })
+    await websocket.close(code=WS_TRY_AGAIN_LATER, reason=f"Server busy, retry after {stats['retry_after']}s")
+
+
+def _negotiate(session: PoseSession, message: Dict[str, Any], exercise_ids: Dict[str, int]) -> Dict[str, Any]:
+    """Handle a hello message selecting the frame protocol and per-session options"""
+    protocol = message.get("protocol", session.protocol)
+    if protocol not in ("json", "binary"):
+        return {"type": "hello", "error": f"Unsupported protocol: {protocol}"}
+
+    session.protocol = protocol
+
+    response_format = message.get("response_format")
+    if response_format not in (None, "json", "compact"):
+        return {"type": "hello", "error": f"Unsupported response format: {response_format}"}
+
+    if "keypoints" in message:
+        session.send_keypoints = bool(message["keypoints"])
+    if response_format == "compact":
+        session.response_encoder = CompactResponseEncoder(include_keypoints=session.send_keypoints)
+    elif response_format == "json":
+        session.response_encoder = None
+    elif session.response_encoder is not None:
+        session.response_encoder.include_keypoints = session.send_keypoints
+
+    if "rate_control" in message or "rate_latency_budget_ms" in message:
+        rate_budget_ms = _number_option(
+            message, "rate_latency_budget_ms", settings.VISION_RATE_LATENCY_BUDGET_MS, 10.0, 10000.0
+        )
+        if rate_budget_ms is None:
+            return {"type": "hello", "error": "rate_latency_budget_ms must be a positive number of milliseconds"}
+        _configure_rate_control(
+            session,
+            bool(message.get("rate_control", session.rate_advisor is not None)),
+            rate_budget_ms
+        )
+
+    if "debug_timings" in message:
+        session.debug_timings = bool(message["debug_timings"])
+
+    if "roi" in message:
+        if not message["roi"]:
+            session.configure_roi(None)
+        else:
+            frame_size = message.get("frame_size")
+            if (not isinstance(frame_size, list) or len(frame_size) != 2 or
+                    not all(isinstance(v, int) and 0 < v <= 0xFFFF for v in frame_size)):
+                return {"type": "hello", "error": "ROI mode requires frame_size [width, height]"}
+            session.configure_roi(frame_size, settings.VISION_DETECT_INTERVAL)
+
+    if "tracking" in message or "detect_interval" in message:
+        detect_interval = _number_option(message, "detect_interval", settings.VISION_DETECT_INTERVAL, 1, 300)
+        if detect_interval is None:
+            return {"type": "hello", "error": "detect_interval must be a positive number of frames"}
+        session.configure_tracking(
+            bool(message.get("tracking", session.tracker is not None)),
+            int(detect_interval)
+        )
+
+    if "adaptive" in message or "latency_budget_ms" in message:
+        latency_budget_ms = _number_option(
+            message, "latency_budget_ms", settings.VISION_LATENCY_BUDGET_MS, 10.0, 10000.0
+        )
+        if latency_budget_ms is None:
+            return {"type": "hello", "error": "latency_budget_ms must be a positive number of milliseconds"}
+        enabled = bool(message.get("adaptive", session.mode_controller is not None))
+        if enabled and settings.VISION_FALLBACK_MODE not in session.processor.loaded_modes:
+            return {"type": "hello", "error": "Adaptive mode is not available on this server"}
+        session.configure_adaptive(
+            load_monitor if enabled else None,
+            settings.VISION_FALLBACK_MODE,
+            latency_budget_ms
+        )
+
+    response: Dict[str, Any] = {
+        "type": "hello",
+        "session_id": session.session_id,
+        "protocol": protocol,
+        "response_format": "compact" if session.response_encoder else "json",
+        "keypoints": session.send_keypoints,
+        "tracking": session.tracker is not None,
+        "mode": session.mode,
+        "adaptive": session.mode_controller is not None,
+        "debug_timings": session.debug_timings,
+        "rate_control": session.rate_advisor is not None,
+        "roi": session.roi_frame_size is not None
+    }
+    if session.tracker is not None:
+        response["detect_interval"] = session.tracker.detect_interval
+    if session.mode_controller is not None:
+        response["latency_budget_ms"] = session.mode_controller.latency_budget_ms
+    if session.rate_advisor is not None:
+        response["rate_latency_budget_ms"] = session.rate_advisor.latency_budget_ms
+    if protocol == "binary":
+        response.update({
+            "protocol_version": PROTOCOL_VERSION,
+            "frame_header": FRAME_HEADER.format,
+            "exercise_ids": exercise_ids
+        })
+    if session.response_encoder is not None:
+        response.update({
+            "protocol_version": PROTOCOL_VERSION,
+            "result_header": RESULT_HEADER.format
+        })
+    return response
 
 
 @router.websocket("/ws/pose")
@@ -85,119 +718,359 @@ async def websocket_pose_detection(websocket: WebSocket):
     WebSocket endpoint for real-time pose detection.
 
     Client sends: JSON with { "frame": "base64_image", "exercise": "squat" }
-    Server responds: JSON with { "keypoints": [[x,y], ...], "reps": 10, "angle": 145.2, "angle_point": [[x1,y1], [x2,y2], [x3,y3]] }
+    Server responds: JSON with { "session_id": "...", "keypoints": [[x,y], ...], "reps": 10, "angle": 145.2, "angle_point": [[x1,y1], [x2,y2], [x3,y3]], "queue_depth": 0, "dropped_frames": 0 }
+
+    Binary mode: after { "type": "hello", "protocol": "binary" } the client may
+    send binary messages (header + raw JPEG/WebP, see app.workouts.protocol).
+    Responses stay JSON and echo "seq" and "client_ts".
+
+    Keypoints mode: clients running pose estimation themselves send
+    { "type": "keypoints", "exercise": "squat", "keypoints": [[x,y], ...], "scores": [...] }
+    (COCO-17 or BlazePose-33) or a binary message of type 2; these go straight
+    to the counter without image decoding or ONNX inference.
+
+    Compact responses: { "type": "hello", "response_format": "compact" } switches
+    results to binary frames with int16 keypoints, where static fields (reps,
+    stage, ...) are only sent when they change (see app.workouts.protocol).
+    "keypoints": false suppresses keypoints in either format. Errors stay JSON.
+
+    The hello message may also set { "tracking": true, "detect_interval": 10 }
+    to run the person detector only every N frames for this session.
+
+    Adaptive mode: { "adaptive": true, "latency_budget_ms": 150 } (or
+    VISION_ADAPTIVE_MODE) moves the session to the lightweight model while the
+    node is overloaded or its frames exceed the budget, and back when load
+    eases. Image frame responses report the model used in "mode".
+
+    Timings: { "type": "hello", "debug_timings": true } (or VISION_DEBUG_TIMINGS)
+    adds "timings_ms" with the per-stage durations (parse, queue, b64decode,
+    imdecode, resize, detect, pose, count) to JSON responses. Stage latencies
+    of all sessions are exported by GET /metrics.
+
+    Resume: connecting with ?session_token=<16-128 chars of [A-Za-z0-9_-]>
+    persists the counting state in Redis every few frames and on every rep.
+    A later connection with the same token, on any worker, continues from
+    it; the server first sends { "type": "session", "resumed": true, "reps": n, ... }.
+
+    Rate control: { "type": "hello", "rate_control": true,
+    "rate_latency_budget_ms": 250 } (or VISION_RATE_CONTROL) makes the server
+    send { "type": "rate", "fps": 12, "max_size": 480, "latency_ms": ...,
+    "server_ms": ..., "rtt_ms": ... } whenever its recommendation changes,
+    based on the measured processing time of this session's image frames,
+    the round trip time and the session's share of the node budget. It also
+    sends { "type": "ping", "ts": t } every VISION_RATE_CONTROL_INTERVAL
+    seconds; clients answer { "type": "pong", "ts": t }. Clients may send
+    their own { "type": "ping", "ts": t } and receive a pong with the same ts.
+
+    ROI frames: { "type": "hello", "roi": true, "frame_size": [w, h] } (camera
+    frame size) adds "roi": [x1, y1, x2, y2] to image frame responses, the
+    tracked person box in camera pixels (null while no one is tracked). The
+    client may then send only that region: { "frame": "<crop>", "roi_offset":
+    [x1, y1] } or a binary message of type 3 (see app.workouts.protocol).
+    Keypoints come back in full-frame coordinates and the detector is skipped
+    while the track holds; after a null "roi" the client sends full frames.
+
+    Admission control (VISION_ADMISSION_CONTROL): a session is counted against
+    the inference budget with its first image frame (keypoint-only sessions
+    are not). If the node has no headroom at that point the client receives
+    { "type": "busy", "retry_after": 5, ... } and the connection is closed
+    with code 1013 (try again later). Image frames above
+    VISION_SESSION_MAX_FPS are answered with { "success": false,
+    "rate_limited": true } instead of being processed.
+
+    Each connection gets its own counter; the pose models are shared.
+    Decoding and inference run on a bounded executor so the event loop stays
+    responsive. Frames are coalesced latest-wins: if a newer frame arrives
+    before the previous one was processed, the older one is dropped. Every
+    response reports "dropped_frames" so clients can lower their send rate;
+    when the node is saturated the client gets
+    { "success": false, "dropped": true, "dropped_frames": n }.
     """
     await websocket.accept()
     logger.info("✓ WebSocket connection established")
 
+    session = None
+    session_id = None
+    inference_task = None
+    admitted = False
+    frame_limiter = TokenBucket(settings.VISION_SESSION_MAX_FPS) if settings.VISION_SESSION_MAX_FPS > 0 else None
+
     try:
-        proc = get_processor()
-        session_id = id(websocket)
-        logger.info(f"Session {session_id}: Started")
+        proc = await get_processor_async()
+        session = sessions.open(proc)
+        session_id = session.session_id
+        session.configure_tracking(settings.VISION_TRACKING_ENABLED, settings.VISION_DETECT_INTERVAL)
+        if settings.VISION_REDUCED_DECODE:
+            session.decode_max_size = MAX_FRAME_SIZE
+        session.debug_timings = settings.VISION_DEBUG_TIMINGS
+        if settings.VISION_RATE_CONTROL:
+            _configure_rate_control(session, True)
+        if settings.VISION_ADAPTIVE_MODE:
+            session.configure_adaptive(
+                load_monitor,
+                settings.VISION_FALLBACK_MODE,
+                settings.VISION_LATENCY_BUDGET_MS
+            )
+        logger.info(f"Session {session_id}: Started ({len(sessions)} active)")
 
-        while True:
-            try:
-                # Receive message from client
-                data = await websocket.receive_text()
-                message = json.loads(data)
+        resume_token = websocket.query_params.get("session_token")
+        if resume_token is not None:
+            if not SESSION_TOKEN_PATTERN.match(resume_token):
+                await websocket.send_json({"type": "session", "error": "Invalid session_token"})
+            else:
+                session.resume_token = resume_token
+                resumed = await _load_session_snapshot(session, resume_token)
+                if resumed:
+                    logger.info(f"Session {session_id}: Resumed at {session.exercise_counter.get_counter()} reps")
+                await websocket.send_json({
+                    "type": "session",
+                    "session_id": session_id,
+                    "session_token": resume_token,
+                    "resumed": resumed,
+                    **session.get_state()
+                })
 
-                # Extract frame and exercise type
-                frame_b64 = message.get("frame")
-                exercise_type = message.get("exercise", "squat")
+        exercise_ids = build_exercise_ids(proc.exercise_counter.exercise_configs)
+        exercise_by_id = {ex_id: exercise_type for exercise_type, ex_id in exercise_ids.items()}
 
-                if not frame_b64:
-                    await websocket.send_json({
-                        "error": "Missing 'frame' in message"
-                    })
-                    continue
+        mailbox = FrameMailbox()
+        send_lock = asyncio.Lock()
+        inference_task = asyncio.create_task(
+            _inference_loop(websocket, session, mailbox, send_lock)
+        )
+        # Without results the reader would keep accepting frames nobody processes
+        inference_task.add_done_callback(functools.partial(_stop_reader_on_failure, asyncio.current_task()))
 
-                # Decode base64 image
-                try:
-                    # Remove data URL prefix if present
-                    if ',' in frame_b64:
-                        frame_b64 = frame_b64.split(',')[1]
+        while True:
+            try:
+                # Receive message from client
+                data = await websocket.receive()
+                if data["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(data.get("code", 1000))
+                timed = settings.VISION_METRICS_ENABLED or session.debug_timings
+                timer = StageTimer() if timed else NULL_TIMER
 
-                    img_data = base64.b64decode(frame_b64)
-                    nparr = np.frombuffer(img_data, np.uint8)
-                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                if data.get("bytes") is not None:
+                    if session.protocol != "binary":
+                        await _send(websocket, send_lock, {
+                            "error": "Binary frames require a hello message with protocol 'binary'"
+                        })
+                        continue
 
-                    if frame is None:
-                        await websocket.send_json({
-                            "error": "Failed to decode image"
+                    binary_frame = parse_binary_frame(data["bytes"])
+                    exercise_type = exercise_by_id.get(binary_frame.exercise_id)
+                    if exercise_type is None:
+                        await _send(websocket, send_lock, {
+                            "error": f"Unknown exercise id: {binary_frame.exercise_id}",
+                            "seq": binary_frame.seq
                         })
                         continue
 
-                except Exception as e:
-                    logger.error(f"Image decode error: {e}")
-                    await websocket.send_json({
-                        "error": f"Image decode error: {str(e)}"
-                    })
-                    continue
+                    if binary_frame.msg_type == MSG_KEYPOINTS:
+                        frame_data = KeypointFrame(*parse_keypoints_payload(binary_frame.payload))
+                    elif binary_frame.msg_type == MSG_IMAGE_FRAME:
+                        frame_data = binary_frame.payload
+                    elif binary_frame.msg_type == MSG_ROI_FRAME:
+                        origin, crop = parse_roi_payload(binary_frame.payload)
+                        frame_data = RoiFrame(crop, origin)
+                    else:
+                        raise ProtocolError(f"Unknown message type: {binary_frame.msg_type}")
+                    frame_meta = {"seq": binary_frame.seq, "client_ts": binary_frame.client_ts}
+                else:
+                    message = json.loads(data["text"])
 
-                # Process frame with RTMPose
-                try:
-                    current_angle, angle_point, keypoints = proc.process_frame(
-                        frame,
-                        exercise_type
-                    )
+                    if message.get("type") == "hello":
+                        await _send(websocket, send_lock, _negotiate(session, message, exercise_ids))
+                        continue
+                    if message.get("type") == "pong":
+                        ts = message.get("ts")
+                        if isinstance(ts, bool) or not isinstance(ts, (int, float)) or not math.isfinite(ts):
+                            raise ProtocolError("pong ts must be the ts of a server ping")
+                        rtt_ms = time.monotonic() * 1000 - ts
+                        if session.rate_advisor is not None and 0 <= rtt_ms < 60000:
+                            session.rate_advisor.record_rtt(rtt_ms)
+                        continue
+                    if message.get("type") == "ping":
+                        await _send(websocket, send_lock, {
+                            "type": "pong",
+                            "ts": message.get("ts"),
+                            "server_ts": round(time.time() * 1000, 1)
+                        })
+                        continue
 
-                    # Prepare response
-                    response: Dict[str, Any] = {
-                        "success": True,
-                        "exercise": exercise_type,
-                        "reps": proc.exercise_counter.get_counter(),
-                        "stage": proc.exercise_counter.get_stage(),
-                        "form_corrections": proc.exercise_counter.get_form_corrections()
-                    }
-
-                    # Add keypoints if detected
-                    if keypoints is not None:
-                        # Convert numpy arrays to lists for JSON serialization
-                        keypoints_list = keypoints.tolist()
-                        response["keypoints"] = keypoints_list
-                        response["detected"] = True
+                    # Extract frame (or client keypoints) and exercise type
+                    if message.get("type") == "keypoints":
+                        frame_data = KeypointFrame(message.get("keypoints"), message.get("scores"))
                     else:
-                        response["detected"] = False
+                        frame_data = message.get("frame")
+                        roi_offset = message.get("roi_offset")
+                        if frame_data and roi_offset is not None:
+                            if (not isinstance(roi_offset, list) or len(roi_offset) != 2 or
+                                    not all(isinstance(v, (int, float)) and v >= 0 for v in roi_offset)):
+                                raise ProtocolError("roi_offset must be [x, y]")
+                            frame_data = RoiFrame(frame_data, (float(roi_offset[0]), float(roi_offset[1])))
+                    exercise_type = message.get("exercise", "squat")
+                    frame_meta = {}
+                timer.mark('parse')
 
-                    # Add angle info if available
-                    if current_angle is not None:
-                        response["angle"] = round(float(current_angle), 1)
-
-                    if angle_point is not None:
-                        response["angle_point"] = angle_point
+                if not frame_data:
+                    await _send(websocket, send_lock, {
+                        "error": "Missing 'frame' in message"
+                    })
+                    continue
+                if isinstance(frame_data, RoiFrame) and session.roi_frame_size is None:
+                    await _send(websocket, send_lock, {
+                        "error": "ROI frames require a hello message with roi and frame_size",
+                        **frame_meta
+                    })
+                    continue
 
-                    # Send response
-                    await websocket.send_json(response)
+                # Shed load before it reaches the sessions already running; only
+                # image frames draw on the inference budget
+                if (settings.VISION_ADMISSION_CONTROL and not admitted and
+                        not isinstance(frame_data, KeypointFrame)):
+                    if not capacity_manager.try_admit():
+                        await _reject_busy(websocket, send_lock)
+                        return
+                    admitted = True
 
-                except Exception as e:
-                    logger.error(f"Frame processing error: {e}")
-                    await websocket.send_json({
-                        "error": f"Processing error: {str(e)}",
-                        "success": False
+                # Per-session frame rate cap on model inference
+                if (frame_limiter is not None and not isinstance(frame_data, KeypointFrame) and
+                        not frame_limiter.consume()):
+                    session.dropped_frames += 1
+                    await _send(websocket, send_lock, {
+                        "success": False,
+                        "error": "Frame rate limit exceeded, frame dropped",
+                        "dropped": True,
+                        "rate_limited": True,
+                        "max_fps": frame_limiter.rate,
+                        "dropped_frames": session.dropped_frames,
+                        **frame_meta
                     })
+                    continue
+
+                # Latest frame wins: an unprocessed older frame is dropped
+                if mailbox.put((frame_data, exercise_type, frame_meta, timer)):
+                    session.dropped_frames += 1
 
             except json.JSONDecodeError as e:
                 logger.error(f"JSON decode error: {e}")
-                await websocket.send_json({
+                await _send(websocket, send_lock, {
                     "error": "Invalid JSON format"
                 })
+            except ProtocolError as e:
+                logger.error(f"Binary frame error: {e}")
+                await _send(websocket, send_lock, {
+                    "error": str(e)
+                })
 
     except WebSocketDisconnect:
         logger.info(f"Session {session_id}: WebSocket disconnected")
+    except asyncio.CancelledError:
+        if inference_task is None or not inference_task.done() or inference_task.cancelled():
+            raise
+        logger.error(f"Session {session_id}: Inference loop failed: {inference_task.exception()}")
+        try:
+            await websocket.send_json({"error": "Frame processing failed, session closed"})
+            await websocket.close(code=WS_INTERNAL_ERROR)
+        except Exception:
+            pass    # Client already gone
     except Exception as e:
         logger.error(f"Session {session_id}: Unexpected error: {e}")
     finally:
-        # Reset counter when session ends
-        if proc:
-            proc.exercise_counter.reset_counter()
+        if admitted:
+            capacity_manager.release()
+        if inference_task:
+            inference_task.cancel()
+        # Drop this connection's counter only; other sessions are unaffected
+        if session:
+            inference_executor.discard(session_id)
+            sessions.close(session_id)
+            # Final state for a reconnect (the periodic writes may be a few frames behind)
+            if session.resume_token is not None:
+                await _store_session_snapshot(session.resume_token, _serialize_snapshot(session))
         logger.info(f"Session {session_id}: Ended")
 
 
+@router.post("/analyze-video")
+async def analyze_video_upload(
+    file: UploadFile = File(...),
+    exercise: str = Form(...)
+):
+    """
+    Count an exercise over an uploaded video (e.g. a set recorded on a phone).
+
+    Returns the rep count, each rep's timestamp, the angle series and form
+    corrections with timestamps (all times in seconds of video).
+    """
+    proc = await get_processor_async()
+    if exercise not in proc.exercise_counter.rules:
+        raise HTTPException(status_code=400, detail=f"Unknown exercise: {exercise}")
+
+    # OpenCV needs a file, so stream the upload to disk
+    max_bytes = settings.VISION_MAX_UPLOAD_MB * 1024 * 1024
+    suffix = os.path.splitext(file.filename or '')[1] or '.mp4'
+    upload = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        size = 0
+        with upload:
+            while chunk := await file.read(1024 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Video exceeds {settings.VISION_MAX_UPLOAD_MB} MB"
+                    )
+                upload.write(chunk)
+
+        started = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                analyze_video,
+                upload.name,
+                exercise,
+                proc,
+                get_video_pool(),
+                chunk_seconds=settings.VISION_VIDEO_CHUNK_SECONDS,
+                overlap_seconds=settings.VISION_VIDEO_OVERLAP_SECONDS,
+                sample_fps=settings.VISION_VIDEO_SAMPLE_FPS
+            )
+        )
+        processing_time = time.perf_counter() - started
+
+        logger.info(
+            f"Analyzed {result['duration']}s video in {processing_time:.1f}s "
+            f"({result['chunks']} chunks, {result['reps']} reps)"
+        )
+        return {
+            "success": True,
+            **result,
+            "processing_time": round(processing_time, 3)
+        }
+    except HTTPException:
+        raise
+    except VideoAnalysisError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Video analysis failed: {e}")
+        raise HTTPException(status_code=500, detail="Video analysis failed")
+    finally:
+        os.unlink(upload.name)
+
+
 @router.post("/reset-counter")
-async def reset_counter():
-    """Reset the exercise counter"""
+async def reset_counter(session_id: Optional[str] = None):
+    """Reset the exercise counter of a session (or the shared default counter)"""
+    if session_id is not None:
+        session = sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session.reset()
+        return {"success": True, "message": "Counter reset", "session_id": session_id}
+
     try:
-        proc = get_processor()
+        proc = await get_processor_async()
         proc.exercise_counter.reset_counter()
         return {"success": True, "message": "Counter reset"}
     except Exception as e:
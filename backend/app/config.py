@@ -44,6 +44,49 @@ class Settings(BaseSettings):
     # Token Expiry
     REFRESH_TOKEN_EXPIRE_DAYS_REMEMBER: int = 30  # Remember Me
 
+    # Vision inference
+    VISION_INFERENCE_WORKERS: int = 2        # Threads running decode + pose + count
+    VISION_MAX_PENDING_FRAMES: int = 32      # Max queued frames across all sessions
+    VISION_BATCH_WINDOW_MS: float = 0.0      # Cross-session pose batching window (0 = off)
+    VISION_MAX_BATCH_SIZE: int = 16          # Max person crops per batched pose call
+    VISION_TRACKING_ENABLED: bool = False    # Skip the detector using keypoint bbox tracking
+    VISION_DETECT_INTERVAL: int = 10         # With tracking, run the detector every N frames
+    VISION_WORKER_PROCESSES: int = 0         # Inference worker processes (0 = in-process)
+    VISION_REDUCED_DECODE: bool = True       # Decode large JPEG frames at 1/2, 1/4 or 1/8 size
+    VISION_MODE: str = "balanced"            # Default pose model: lightweight | balanced | performance
+    VISION_ADAPTIVE_MODE: bool = False       # Per-session fallback to a lighter model under load
+    VISION_FALLBACK_MODE: str = "lightweight"
+    VISION_LATENCY_BUDGET_MS: float = 150.0  # Per-session frame latency budget
+    VISION_OVERLOAD_LATENCY_MS: float = 120.0    # Node overloaded above this smoothed latency...
+    VISION_OVERLOAD_QUEUE_RATIO: float = 0.75    # ...or this share of VISION_MAX_PENDING_FRAMES
+    VISION_VIDEO_WORKERS: int = 2            # Processes analyzing uploaded videos
+    VISION_VIDEO_CHUNK_SECONDS: float = 10.0     # Video time per worker task
+    VISION_VIDEO_OVERLAP_SECONDS: float = 0.5    # Pre-roll decoded (not analyzed) before each chunk
+    VISION_VIDEO_SAMPLE_FPS: float = 0.0     # Analyze at most N frames/sec of video (0 = all)
+    VISION_MAX_UPLOAD_MB: int = 200
+    VISION_MODEL_PRECISION: str = "fp32"     # fp32 | int8 (quantized models, see benchmarks.quantization)
+    VISION_ORT_INTRA_OP_THREADS: int = 0     # ONNX Runtime threads per model call (0 = all cores)
+    VISION_ORT_INTER_OP_THREADS: int = 0     # Threads for parallel execution mode (0 = default)
+    VISION_ORT_EXECUTION_MODE: str = "sequential"   # sequential | parallel
+    VISION_ORT_GRAPH_OPTIMIZATION: str = "all"      # disabled | basic | extended | all
+    VISION_ORT_MEM_ARENA: bool = True        # ONNX Runtime CPU memory arena
+    VISION_ORT_CACHE_DIR: str = ""           # Optimized-model cache directory (empty = off)
+    VISION_EXERCISES_RELOAD_SECONDS: float = 2.0     # exercises.json change check interval (0 = no reload)
+    VISION_WARMUP: bool = True               # Load and warm the models at startup instead of on first use
+    VISION_WARMUP_RUNS: int = 3              # Dummy inferences per model during warm-up
+    VISION_SESSION_SNAPSHOT_FRAMES: int = 15     # Frames between Redis snapshots of resumable sessions
+    VISION_SESSION_TTL_SECONDS: int = 900        # How long a dropped session can be resumed
+    VISION_METRICS_ENABLED: bool = True      # Per-stage frame latency histograms (GET /vision/metrics)
+    VISION_DEBUG_TIMINGS: bool = False       # Attach per-stage timings to every response
+    VISION_ADMISSION_CONTROL: bool = True    # Turn away image sessions when the node has no headroom
+    VISION_TARGET_UTILIZATION: float = 0.8   # Inference budget share sessions may fill
+    VISION_SESSION_FPS: float = 15.0         # Frame rate budgeted per session
+    VISION_SESSION_MAX_FPS: float = 30.0     # Per-session image frame cap (token bucket, 0 = off)
+    VISION_BUSY_RETRY_SECONDS: int = 5       # retry_after sent to rejected sessions
+    VISION_RATE_CONTROL: bool = False        # Recommend fps/frame size to every session (else via hello)
+    VISION_RATE_CONTROL_INTERVAL: float = 2.0    # Seconds between recommendations and RTT pings
+    VISION_RATE_LATENCY_BUDGET_MS: float = 250.0     # End-to-end latency above which frames get smaller
+
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,muscleup://"
 
@@ -30,10 +30,15 @@ async def lifespan(app: FastAPI):
     # Initialize Redis
     await redis_service.connect()
 
+    # Load and warm the pose models in the background; GET /api/v1/vision/ready reports progress
+    if settings.VISION_WARMUP:
+        vision.start_vision_warmup()
+
     yield
 
     # Shutdown
     logger.info("🛑 Shutting down MuscleUp Vision API...")
+    vision.shutdown_vision()
     await close_db()
     await redis_service.close()
     logger.info("Connections closed")
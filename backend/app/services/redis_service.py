@@ -84,6 +84,17 @@ class RedisService:
         logger.warning("Invalid or already used CSRF token")
         return False
 
+    # Vision Session Snapshots
+    async def store_vision_session(self, token: str, snapshot: str, expires_in: int):
+        """Store a serialized vision session snapshot under the client's session token"""
+        key = f"vision_session:{token}"
+        await self.redis.setex(key, expires_in, snapshot)
+
+    async def get_vision_session(self, token: str) -> Optional[str]:
+        """Get the last vision session snapshot stored for a session token"""
+        key = f"vision_session:{token}"
+        return await self.redis.get(key)
+
     # Rate Limiting
     async def check_rate_limit(self, identifier: str, max_requests: int, window_seconds: int) -> bool:
         """
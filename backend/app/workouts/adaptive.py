@@ -0,0 +1,139 @@
+"""
+Load-adaptive pose model selection.
+
+A node-wide monitor tracks smoothed inference latency and executor queue
+pressure. Each session has a controller that keeps its preferred mode while
+the node is healthy and its own latency fits its budget, and drops to the
+fallback (lightweight) model otherwise. Thresholds have hysteresis and a
+minimum dwell time so sessions do not flap between models.
+"""
+from typing import Any, Dict
+
+
+class NodeLoadMonitor:
+    """Node-wide inference latency (EWMA) and queue pressure"""
+
+    def __init__(
+        self,
+        executor,
+        overload_latency_ms: float = 120.0,
+        overload_queue_ratio: float = 0.75,
+        recover_ratio: float = 0.6,
+        alpha: float = 0.2
+    ):
+        self.executor = executor    # InferenceExecutor (pending / max_pending)
+        self.overload_latency_ms = overload_latency_ms
+        self.overload_queue_ratio = overload_queue_ratio
+        self.recover_ratio = recover_ratio
+        self.alpha = alpha
+
+        self.latency_ms = 0.0
+        self.overloaded = False
+        self.overload_events = 0
+
+    @property
+    def queue_pressure(self) -> float:
+        """Share of the executor's global frame limit in use"""
+        if not self.executor.max_pending:
+            return 0.0
+        return self.executor.pending / self.executor.max_pending
+
+    def record(self, latency_ms: float):
+        """Add one frame's inference latency"""
+        if self.latency_ms == 0.0:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += self.alpha * (latency_ms - self.latency_ms)
+
+    def is_overloaded(self) -> bool:
+        """Enter overload above either threshold, leave it once both are well below"""
+        pressure = self.queue_pressure
+        if not self.overloaded:
+            if self.latency_ms > self.overload_latency_ms or pressure > self.overload_queue_ratio:
+                self.overloaded = True
+                self.overload_events += 1
+        elif (
+            self.latency_ms < self.overload_latency_ms * self.recover_ratio and
+            pressure < self.overload_queue_ratio * self.recover_ratio
+        ):
+            self.overloaded = False
+        return self.overloaded
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Load statistics"""
+        return {
+            "latency_ms": round(self.latency_ms, 1),
+            "queue_pressure": round(self.queue_pressure, 2),
+            "overloaded": self.overloaded,
+            "overload_events": self.overload_events
+        }
+
+
+class AdaptiveModeController:
+    """Chooses the pose model mode for one session"""
+
+    def __init__(
+        self,
+        monitor: NodeLoadMonitor,
+        preferred_mode: str = 'balanced',
+        fallback_mode: str = 'lightweight',
+        latency_budget_ms: float = 150.0,
+        min_dwell_frames: int = 30,
+        alpha: float = 0.2
+    ):
+        self.monitor = monitor
+        self.preferred_mode = preferred_mode
+        self.fallback_mode = fallback_mode
+        self.latency_budget_ms = latency_budget_ms
+        self.min_dwell_frames = min_dwell_frames
+        self.alpha = alpha
+
+        self.mode = preferred_mode
+        self.latency_ms = 0.0
+        self.frames_in_mode = 0
+        self.dwell_frames = min_dwell_frames
+        self.switches = 0
+
+    def record(self, latency_ms: float):
+        """Add one frame's latency and re-evaluate the mode"""
+        if self.latency_ms == 0.0:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += self.alpha * (latency_ms - self.latency_ms)
+        self.monitor.record(latency_ms)
+        self.frames_in_mode += 1
+        self._update_mode()
+
+    def _update_mode(self):
+        # Falling back is always allowed after the minimum dwell; recovery may be backed off
+        dwell = self.min_dwell_frames if self.mode == self.preferred_mode else self.dwell_frames
+        if self.frames_in_mode < dwell:
+            return
+
+        overloaded = self.monitor.is_overloaded()
+        if self.mode == self.preferred_mode:
+            if overloaded or self.latency_ms > self.latency_budget_ms:
+                # Falling back soon after recovering: wait longer before the next try
+                if self.switches and self.frames_in_mode < self.dwell_frames * 4:
+                    self.dwell_frames = min(self.dwell_frames * 2, self.min_dwell_frames * 8)
+                else:
+                    self.dwell_frames = self.min_dwell_frames
+                self._switch(self.fallback_mode)
+        elif not overloaded and self.latency_ms < self.latency_budget_ms * self.monitor.recover_ratio:
+            self._switch(self.preferred_mode)
+
+    def _switch(self, mode: str):
+        self.mode = mode
+        self.frames_in_mode = 0
+        # The smoothed latency belonged to the previous model
+        self.latency_ms = 0.0
+        self.switches += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Mode statistics for this session"""
+        return {
+            "mode": self.mode,
+            "latency_ms": round(self.latency_ms, 1),
+            "latency_budget_ms": self.latency_budget_ms,
+            "switches": self.switches
+        }
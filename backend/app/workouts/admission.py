@@ -0,0 +1,141 @@
+"""
+Admission control and load shedding for pose sessions.
+
+The CapacityManager turns the measured service time of image frames (EWMA of
+decode + inference time on the executor) into a node budget: `parallelism`
+frames can run at once, so the node sustains about parallelism * 1000 / cost
+frames per second. At the expected per-session frame rate that gives the
+number of sessions that fit under the target utilization. New sessions are
+admitted only while both the session count and the measured utilization
+leave headroom; the others are told to retry later. A TokenBucket per session
+caps the frame rate a single client can push into the shared budget.
+"""
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class TokenBucket:
+    """Allows `rate` events per second on average, with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate / 2, 1.0)
+        self.clock = clock
+        self.tokens = self.burst
+        self._updated = clock()
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available; False means the event exceeds the rate"""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+
+class CapacityManager:
+    """Session admission from the node's measured inference budget"""
+
+    def __init__(
+        self,
+        parallelism: int = 2,
+        target_utilization: float = 0.8,
+        session_fps: float = 15.0,
+        initial_cost_ms: float = 50.0,
+        retry_after: int = 5,
+        window_seconds: float = 5.0,
+        alpha: float = 0.05,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.parallelism = max(parallelism, 1)
+        self.target_utilization = target_utilization
+        self.session_fps = session_fps      # Frame rate budgeted per session
+        self.cost_ms = initial_cost_ms      # Service time per image frame (EWMA)
+        self.retry_after = retry_after
+        self.window_seconds = window_seconds
+        self.alpha = alpha
+        self.clock = clock
+
+        self.measured = False
+        self.active_sessions = 0
+        self.rejected_sessions = 0
+        self.utilization = 0.0              # Busy share of the last full window
+
+        self._lock = threading.Lock()
+        self._window_start = clock()
+        self._window_busy_ms = 0.0
+
+    def seed_cost(self, cost_ms: float):
+        """Initial frame cost (e.g. from model warm-up) until real frames are measured"""
+        if not self.measured and cost_ms > 0:
+            self.cost_ms = cost_ms
+
+    def record(self, busy_ms: float):
+        """Add the service time of one frame (called from the inference threads)"""
+        with self._lock:
+            if self.measured:
+                self.cost_ms += self.alpha * (busy_ms - self.cost_ms)
+            else:
+                self.cost_ms, self.measured = busy_ms, True
+            self._window_busy_ms += busy_ms
+            self._roll_window()
+
+    def _roll_window(self):
+        elapsed = self.clock() - self._window_start
+        if elapsed >= self.window_seconds:
+            self.utilization = self._window_busy_ms / (elapsed * 1000 * self.parallelism)
+            self._window_start += elapsed
+            self._window_busy_ms = 0.0
+
+    @property
+    def capacity_fps(self) -> float:
+        """Image frames per second the node sustains at full utilization"""
+        return self.parallelism * 1000.0 / max(self.cost_ms, 1e-3)
+
+    @property
+    def session_capacity(self) -> int:
+        """Sessions that fit under the target utilization at session_fps each (at least one)"""
+        return max(1, math.floor(self.capacity_fps * self.target_utilization / self.session_fps))
+
+    def has_headroom(self) -> bool:
+        """Whether one more session fits"""
+        with self._lock:
+            self._roll_window()
+            utilization = self.utilization
+        if self.active_sessions == 0:
+            return True
+        return self.active_sessions < self.session_capacity and utilization < self.target_utilization
+
+    def try_admit(self) -> bool:
+        """Count a new session in if there is headroom"""
+        if not self.has_headroom():
+            self.rejected_sessions += 1
+            return False
+        self.active_sessions += 1
+        return True
+
+    def release(self):
+        """A session admitted with try_admit() ended"""
+        self.active_sessions = max(self.active_sessions - 1, 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Capacity and utilization, for health checks and load balancers"""
+        capacity = self.session_capacity
+        return {
+            "admitting": self.has_headroom(),
+            "active_sessions": self.active_sessions,
+            "session_capacity": capacity,
+            "session_headroom": max(capacity - self.active_sessions, 0),
+            "utilization": round(self.utilization, 3),
+            "target_utilization": self.target_utilization,
+            "frame_cost_ms": round(self.cost_ms, 1),
+            "cost_measured": self.measured,
+            "capacity_fps": round(self.capacity_fps, 1),
+            "session_fps": self.session_fps,
+            "rejected_sessions": self.rejected_sessions,
+            "retry_after": self.retry_after
+        }
@@ -0,0 +1,193 @@
+"""
+Streaming smoothing filters for joint angles.
+
+Each exercise picks its filter in exercises.json under "smoothing", e.g.
+`{"type": "one_euro", "min_cutoff": 1.0, "beta": 0.02}`. All filters update
+in constant time on plain floats, without per-frame array allocation:
+
+- window: median/2-sigma outlier mean over the last frames (the original filter)
+- median: running median over a fixed ring buffer
+- ema: exponential moving average
+- one_euro: One-Euro filter, smoothing strongly at rest and little while moving
+"""
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class AngleFilter:
+    """Base class: one filter instance per counter and exercise"""
+
+    def update(self, value: float, timestamp: float) -> float:
+        """Add one angle (degrees) at a timestamp (seconds) and return the smoothed angle"""
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serializable parameters and internal state (buffers, running values)"""
+        return {name: list(value) if isinstance(value, (list, deque)) else value for name, value in vars(self).items()}
+
+    def set_state(self, state: Dict[str, Any]) -> bool:
+        """Restore get_state() output; False (state unchanged) unless it has the same parameters"""
+        current = self.get_state()
+        if set(state) != set(current):
+            return False
+        if any(state[name] != value for name, value in current.items() if not name.startswith('_')):
+            return False    # e.g. a different window size or cutoff
+        for name, value in state.items():
+            if name.startswith('_'):
+                setattr(self, name, list(value) if isinstance(value, list) else value)
+        return True
+
+
+class WindowOutlierFilter(AngleFilter):
+    """Mean of the window after dropping values more than 2 std devs from its median"""
+
+    def __init__(self, window: int = 5):
+        self.window = window
+        self._values: Deque[float] = deque(maxlen=window)
+        self._sorted: List[float] = []     # Same values, kept sorted for the median
+
+    def update(self, value: float, timestamp: float) -> float:
+        values = self._values
+        if len(values) == self.window:
+            del self._sorted[bisect_left(self._sorted, values[0])]
+        values.append(value)
+        insort(self._sorted, value)
+        size = len(values)
+        if size < 3:
+            return value
+
+        middle = size // 2
+        ordered = self._sorted
+        median = ordered[middle] if size % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+        mean = sum(values) / size
+        variance = 0.0
+        for v in values:
+            variance += (v - mean) ** 2
+        limit = 2 * math.sqrt(variance / size)
+
+        total, kept = 0.0, 0
+        for v in values:
+            if abs(v - median) <= limit:
+                total += v
+                kept += 1
+        return total / kept if kept else value
+
+    def reset(self):
+        self._values.clear()
+        self._sorted.clear()
+
+    def set_state(self, state: Dict[str, Any]) -> bool:
+        if not super().set_state(state):
+            return False
+        self._values = deque(self._values, maxlen=self.window)
+        return True
+
+
+class RunningMedianFilter(AngleFilter):
+    """Median of the last `window` angles (ring buffer plus a sorted copy)"""
+
+    def __init__(self, window: int = 5):
+        self.window = window
+        self._ring: List[float] = [0.0] * window
+        self._sorted: List[float] = []
+        self._count = 0
+
+    def update(self, value: float, timestamp: float) -> float:
+        slot = self._count % self.window
+        if self._count >= self.window:
+            del self._sorted[bisect_left(self._sorted, self._ring[slot])]
+        self._ring[slot] = value
+        insort(self._sorted, value)
+        self._count += 1
+
+        size = len(self._sorted)
+        middle = size // 2
+        return self._sorted[middle] if size % 2 else (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+    def reset(self):
+        self._sorted.clear()
+        self._count = 0
+
+
+class EmaFilter(AngleFilter):
+    """Exponential moving average"""
+
+    def __init__(self, alpha: float = 0.4):
+        self.alpha = alpha
+        self._value: Optional[float] = None
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self.alpha * (value - self._value)
+        return self._value
+
+    def reset(self):
+        self._value = None
+
+
+class OneEuroFilter(AngleFilter):
+    """One-Euro filter (Casiez et al.): the cutoff frequency rises with angular speed"""
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.02, d_cutoff: float = 1.0, rate: float = 60.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.rate = rate    # Highest expected frame rate: closer frames (e.g. a backlog) count as 1/rate apart
+        self.reset()
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, value: float, timestamp: float) -> float:
+        if self._value is None:
+            self._value, self._speed, self._timestamp = value, 0.0, timestamp
+            return value
+
+        dt = max(timestamp - self._timestamp, 1.0 / self.rate)
+        self._timestamp = timestamp
+
+        speed = (value - self._value) / dt
+        self._speed += self._alpha(self.d_cutoff, dt) * (speed - self._speed)
+        cutoff = self.min_cutoff + self.beta * abs(self._speed)
+        self._value += self._alpha(cutoff, dt) * (value - self._value)
+        return self._value
+
+    def reset(self):
+        self._value: Optional[float] = None
+        self._speed = 0.0
+        self._timestamp = 0.0
+
+
+ANGLE_FILTERS = {
+    'window': WindowOutlierFilter,
+    'median': RunningMedianFilter,
+    'ema': EmaFilter,
+    'one_euro': OneEuroFilter
+}
+
+
+def create_angle_filter(spec: Optional[Dict[str, Any]] = None, window: int = 5) -> AngleFilter:
+    """Build a filter from an exercises.json "smoothing" entry (None = window filter)"""
+    params = dict(spec or {})
+    filter_type = params.pop('type', 'window')
+    if filter_type not in ANGLE_FILTERS:
+        raise ValueError(f"Unknown angle filter: {filter_type}")
+    if filter_type in ('window', 'median'):
+        params.setdefault('window', window)
+    for name, value in params.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"Angle filter {name} must be a number")
+        if value < 0 or (value == 0 and name != 'beta'):
+            raise ValueError(f"Angle filter {name} must be positive")
+    if not isinstance(params.get('window', 1), int) or params.get('alpha', 0) > 1:
+        raise ValueError("Angle filter window must be an integer and alpha at most 1")
+    return ANGLE_FILTERS[filter_type](**params)
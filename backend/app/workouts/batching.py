@@ -0,0 +1,157 @@
+"""
+Cross-session micro-batching for the RTMPose SimCC model.
+
+Inference threads preprocess their own person crops and hand them to a single
+scheduler thread, which waits up to `window_ms` for crops from other sessions,
+runs the pose model once on the stacked batch and returns each result to its
+caller.
+"""
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import List, Optional, Tuple, Dict, Any
+
+
+class _PoseRequest:
+    """One preprocessed person crop waiting for a batch"""
+
+    __slots__ = ('image', 'center', 'scale', 'future')
+
+    def __init__(self, image: np.ndarray, center: np.ndarray, scale: np.ndarray):
+        self.image = image
+        self.center = center
+        self.scale = scale
+        self.future: Future = Future()
+
+
+class PoseBatchScheduler:
+    """Collects pose crops from concurrent sessions and runs them as one batch"""
+
+    def __init__(self, pose_model, window_ms: float = 8.0, max_batch_size: int = 16):
+        self.pose_model = pose_model
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        # Exported models with a fixed batch dimension can only run one crop at a time
+        self.supports_batching = self._has_dynamic_batch(pose_model)
+
+        self.batches_run = 0
+        self.crops_processed = 0
+
+        self._queue: "queue.Queue[Optional[_PoseRequest]]" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="pose-batcher",
+            daemon=True
+        )
+        self._thread.start()
+
+    @staticmethod
+    def _has_dynamic_batch(pose_model) -> bool:
+        """Check whether the ONNX Runtime session accepts batch sizes above 1"""
+        if getattr(pose_model, 'backend', None) != 'onnxruntime':
+            return False
+        batch_dim = pose_model.session.get_inputs()[0].shape[0]
+        return not isinstance(batch_dim, int) or batch_dim > 1
+
+    def __call__(self, image: np.ndarray, bboxes: list = []) -> Tuple[np.ndarray, np.ndarray]:
+        """Same contract as RTMPose.__call__, but inference is shared with other sessions"""
+        if len(bboxes) == 0:
+            bboxes = [[0, 0, image.shape[1], image.shape[0]]]
+
+        requests = []
+        for bbox in bboxes:
+            img, center, scale = self.pose_model.preprocess(image, bbox)
+            request = _PoseRequest(img, center, scale)
+            self._queue.put(request)
+            requests.append(request)
+
+        keypoints, scores = [], []
+        for request in requests:
+            kpts, score = request.future.result()
+            keypoints.append(kpts)
+            scores.append(score)
+
+        return np.concatenate(keypoints, axis=0), np.concatenate(scores, axis=0)
+
+    def _collect_batch(self, first: _PoseRequest) -> Tuple[List[_PoseRequest], bool]:
+        """Gather requests arriving within the batch window"""
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+
+        return batch, False
+
+    def _run(self):
+        """Scheduler thread main loop"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            if self.supports_batching:
+                batch, stopping = self._collect_batch(first)
+            else:
+                batch, stopping = [first], False
+
+            self._run_batch(batch)
+
+            if stopping:
+                return
+
+    def _run_batch(self, batch: List[_PoseRequest]):
+        """Run the pose model once on stacked crops and resolve each request"""
+        try:
+            images = np.stack([request.image for request in batch])
+            inputs = np.ascontiguousarray(images.transpose(0, 3, 1, 2), dtype=np.float32)
+
+            session = self.pose_model.session
+            output_names = [out.name for out in session.get_outputs()]
+            simcc_x, simcc_y = session.run(output_names, {session.get_inputs()[0].name: inputs})
+
+            self.batches_run += 1
+            self.crops_processed += len(batch)
+
+            for i, request in enumerate(batch):
+                result = self.pose_model.postprocess(
+                    [simcc_x[i:i + 1], simcc_y[i:i + 1]],
+                    request.center,
+                    request.scale
+                )
+                request.future.set_result(result)
+
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Batching statistics for health/benchmark reporting"""
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "supports_batching": self.supports_batching,
+            "batches_run": self.batches_run,
+            "crops_processed": self.crops_processed,
+            "avg_batch_size": (
+                round(self.crops_processed / self.batches_run, 2) if self.batches_run else 0.0
+            )
+        }
+
+    def stop(self):
+        """Stop the scheduler thread once queued crops are processed"""
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
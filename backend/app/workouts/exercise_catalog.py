@@ -0,0 +1,144 @@
+"""
+In-memory exercise catalog with hot reload.
+
+exercises.json is parsed and compiled once into a CatalogSnapshot holding
+the counting configs, the compiled rules, the joint angle table and the
+pre-serialized, ETag-tagged exercise list. Counters read the current
+snapshot on every frame; at most every `check_interval` seconds that read
+also compares the file's mtime and swaps in a freshly compiled snapshot,
+so threshold tuning reaches live sessions without a restart. A file that
+fails to parse is reported and the previous snapshot stays in use.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+from .exercise_rules import ExerciseRule, compile_exercise_rules
+from .kinematics import JointAngleTable
+
+
+class CatalogSnapshot(NamedTuple):
+    """One loaded version of the catalog"""
+    version: int
+    configs: Dict[str, Any]
+    rules: Mapping[str, ExerciseRule]
+    angle_table: JointAngleTable
+    listing: Optional[bytes]    # GET /exercises body (None if the file never loaded)
+    etag: Optional[str]
+
+
+def parse_exercise_configs(exercises: Dict[str, Any]) -> Dict[str, Any]:
+    """Counting configs from the "exercises" object of exercises.json"""
+    configs = {}
+    for exercise_type, config in exercises.items():
+        configs[exercise_type] = {
+            'down_angle': config.get('down_angle'),
+            'up_angle': config.get('up_angle'),
+            'keypoints': config.get('keypoints', {}),
+            'is_leg_exercise': config.get('is_leg_exercise', False),
+            'count_reps': config.get('count_reps', True),
+            'angle_point': config.get('angle_point', []),
+            'smoothing': config.get('smoothing'),
+            'form_rules': config.get('form_rules', [])
+        }
+    return configs
+
+
+def build_listing(exercises: Dict[str, Any]) -> bytes:
+    """Serialized exercise list served by GET /exercises"""
+    listing = [
+        {
+            "id": ex_id,
+            "name_ru": ex_data.get("name_ru"),
+            "name_en": ex_data.get("name_en"),
+            "is_leg_exercise": ex_data.get("is_leg_exercise", False)
+        }
+        for ex_id, ex_data in exercises.items()
+    ]
+    return json.dumps({"exercises": listing}, ensure_ascii=False).encode('utf-8')
+
+
+def _snapshot(version: int, configs: Dict[str, Any], listing: Optional[bytes] = None) -> CatalogSnapshot:
+    rules = compile_exercise_rules(configs)
+    etag = f'"{hashlib.sha1(listing).hexdigest()[:16]}"' if listing is not None else None
+    return CatalogSnapshot(version, configs, rules, JointAngleTable(rules), listing, etag)
+
+
+class ExerciseCatalog:
+    """exercises.json loaded once, reloaded when the file changes"""
+
+    def __init__(self, path: Optional[str], check_interval: float = 2.0):    # 0 = never reload
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._next_check = 0.0
+        self._snapshot = _snapshot(0, {})
+        if path:
+            self.load()
+
+    @classmethod
+    def from_configs(cls, configs: Dict[str, Any]) -> 'ExerciseCatalog':
+        """Fixed catalog over already parsed configs (worker processes, benchmarks)"""
+        catalog = cls(None)
+        catalog._snapshot = _snapshot(1, configs)
+        return catalog
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot, checking the file for changes at most every check_interval"""
+        if self.path and self.check_interval > 0 and time.monotonic() >= self._next_check:
+            self.refresh()
+        return self._snapshot
+
+    def load(self) -> bool:
+        """Parse and compile the file into a new snapshot"""
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, 'r', encoding='utf-8') as f:
+                exercises = json.load(f).get('exercises', {})
+            snapshot = _snapshot(self._snapshot.version + 1, parse_exercise_configs(exercises), build_listing(exercises))
+        except FileNotFoundError:
+            print(f"ERROR: Exercises file not found at {self.path}")
+            return False
+        except Exception as e:
+            print(f"ERROR loading exercises from JSON: {e}")
+            return False
+
+        self._snapshot = snapshot
+        print(f"✓ Loaded {len(snapshot.configs)} exercises from {self.path} (version {snapshot.version})")
+        return True
+
+    def refresh(self) -> bool:
+        """Reload if the file's mtime changed since the last load; True if reloaded"""
+        if not self._lock.acquire(blocking=False):
+            return False    # Another thread is already checking
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return False
+            if mtime == self._mtime:
+                return False
+            reloaded = self.load()
+            self.reloads += int(reloaded)
+            return reloaded
+        finally:
+            self._lock.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Catalog statistics"""
+        snapshot = self._snapshot
+        return {
+            "path": self.path,
+            "version": snapshot.version,
+            "exercises": len(snapshot.configs),
+            "counted": len(snapshot.rules),
+            "reloads": self.reloads,
+            "etag": snapshot.etag
+        }
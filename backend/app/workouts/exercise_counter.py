@@ -3,202 +3,215 @@ Exercise counter with angle-based detection for workout tracking.
 Adapted from Good-GYM-master for FastAPI backend.
 """
 import numpy as np
-from collections import deque
 import time
-import json
-import os
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Mapping, Callable
+from .angle_filters import AngleFilter, create_angle_filter
+from .exercise_catalog import ExerciseCatalog
+from .exercise_rules import ExerciseRule
+from .kinematics import JointAngleTable, joint_angles
+
+# Frame-to-frame angle change below which a moving set gets a range of motion hint
+MIN_ANGLE_CHANGE = 5
+RANGE_OF_MOTION_CORRECTION = "Увеличьте амплитуду движения"
 
 
 class ExerciseCounter:
     """Basic exercise counter with angle-based detection"""
 
-    def __init__(self, exercises_config_path: str, smoothing_window: int = 5):
+    def __init__(
+        self,
+        exercises_config_path: Optional[str] = None,
+        smoothing_window: int = 5,
+        exercise_configs: Optional[Dict[str, Any]] = None,
+        catalog: Optional[ExerciseCatalog] = None
+    ):
         # Core counting variables
         self.counter = 0
         self.stage = None
 
         # Basic features
         self.smoothing_window = smoothing_window
-        self.angle_history = deque(maxlen=smoothing_window)
+        self.angle_filters: Dict[str, AngleFilter] = {}  # Per exercise, created on first use
+        self.filters_version = 0                         # Catalog version the filters were built for
         self.last_count_time = 0
         self.min_rep_time = 0.5  # Minimum time between reps (seconds)
+        self.clock: Callable[[], float] = time.time  # Video analysis counts on video time instead
 
         # Form corrections
         self.form_corrections = []
         self.last_angle = None
 
-        # Exercise configurations
-        self.exercise_configs = self.load_exercise_configs(exercises_config_path)
+        # Exercise configurations (a catalog is shared between counters and hot-reloads the file)
+        if catalog is None:
+            if exercise_configs is not None:
+                catalog = ExerciseCatalog.from_configs(exercise_configs)
+            else:
+                catalog = ExerciseCatalog(exercises_config_path)
+        self.catalog = catalog
 
-        # Independent counting for leg exercises - load from config
-        self.leg_exercises = [
-            exercise_type for exercise_type, config in self.exercise_configs.items()
-            if config.get('is_leg_exercise', False)
-        ]
+        # Independent counting for leg exercises
         self.leg_stages = {'left': None, 'right': None}  # Track each leg's stage
 
-    def load_exercise_configs(self, config_path: str) -> Dict[str, Any]:
-        """Load exercise-specific angle thresholds from JSON file"""
-        try:
-            if os.path.exists(config_path):
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    exercises = data.get('exercises', {})
-
-                    # Convert to the format expected by the rest of the code
-                    configs = {}
-                    for exercise_type, config in exercises.items():
-                        configs[exercise_type] = {
-                            'down_angle': config.get('down_angle'),
-                            'up_angle': config.get('up_angle'),
-                            'keypoints': config.get('keypoints', {}),
-                            'is_leg_exercise': config.get('is_leg_exercise', False)
-                        }
-
-                    print(f"✓ Loaded {len(configs)} exercises from {config_path}")
-                    return configs
-            else:
-                print(f"ERROR: Exercises file not found at {config_path}")
-                return {}
-        except Exception as e:
-            print(f"ERROR loading exercises from JSON: {e}")
-            return {}
-
     def reset_counter(self):
         """Reset counter to initial state"""
         self.counter = 0
         self.stage = None
-        self.angle_history.clear()
+        self.angle_filters.clear()
         self.leg_stages = {'left': None, 'right': None}
         self.form_corrections = []
         self.last_angle = None
 
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Compact, JSON-serializable counting state (see restore_snapshot)"""
+        return {
+            "counter": self.counter,
+            "stage": self.stage,
+            "leg_stages": dict(self.leg_stages),
+            "last_count_time": self.last_count_time,
+            "last_angle": self.last_angle,
+            "filters": {
+                exercise_type: [type(angle_filter).__name__, angle_filter.get_state()]
+                for exercise_type, angle_filter in self.angle_filters.items()
+            }
+        }
+
+    def restore_snapshot(self, snapshot: Dict[str, Any]):
+        """Continue counting from a get_snapshot() state, e.g. of a dropped connection"""
+        self.reset_counter()
+        self.counter = int(snapshot["counter"])
+        self.stage = snapshot.get("stage")
+        self.leg_stages.update(snapshot.get("leg_stages", {}))
+        self.last_count_time = float(snapshot.get("last_count_time", 0))
+        self.last_angle = snapshot.get("last_angle")
+
+        # Smoothing buffers, as long as the exercise still uses the same filter
+        for exercise_type, (filter_name, state) in snapshot.get("filters", {}).items():
+            if exercise_type not in self.rules:
+                continue
+            angle_filter = self.get_angle_filter(exercise_type)
+            if type(angle_filter).__name__ != filter_name or not angle_filter.set_state(state):
+                del self.angle_filters[exercise_type]
+
+    def clone(self) -> 'ExerciseCounter':
+        """Create a fresh counter sharing this counter's exercise catalog"""
+        return ExerciseCounter(
+            smoothing_window=self.smoothing_window,
+            catalog=self.catalog
+        )
+
+    @property
+    def exercise_configs(self) -> Dict[str, Any]:
+        return self.catalog.snapshot.configs
+
+    @property
+    def rules(self) -> Mapping[str, ExerciseRule]:
+        return self.catalog.snapshot.rules
+
+    @property
+    def angle_table(self) -> JointAngleTable:
+        return self.catalog.snapshot.angle_table
+
     def calculate_angle(self, a: np.ndarray, b: np.ndarray, c: np.ndarray) -> Optional[float]:
         """Calculate angle between three points"""
         try:
-            a = np.array(a, dtype=np.float64)
-            b = np.array(b, dtype=np.float64)
-            c = np.array(c, dtype=np.float64)
-
-            # Check for invalid points
-            if np.any(np.isnan([a, b, c])) or np.any([a, b, c] == [0, 0]):
-                return None
-
-            # Calculate vectors
-            ba = a - b
-            bc = c - b
-
-            # Check for zero vectors
-            ba_norm = np.linalg.norm(ba)
-            bc_norm = np.linalg.norm(bc)
-
-            if ba_norm == 0 or bc_norm == 0:
-                return None
-
-            # Calculate angle using dot product
-            cosine_angle = np.dot(ba, bc) / (ba_norm * bc_norm)
-            cosine_angle = np.clip(cosine_angle, -1.0, 1.0)  # Prevent numerical errors
-            angle = np.arccos(cosine_angle)
-
-            return float(np.degrees(angle))
+            angle = joint_angles([a, b, c], np.array([[0, 1, 2]]))[0]
+            return None if np.isnan(angle) else float(angle)
 
         except Exception as e:
             print(f"Angle calculation error: {e}")
             return None
 
-    def smooth_angle(self, angle: Optional[float]) -> Optional[float]:
+    def get_angle_filter(self, exercise_type: Optional[str] = None) -> AngleFilter:
+        """Smoothing filter configured for an exercise in exercises.json"""
+        snapshot = self.catalog.snapshot
+        if snapshot.version != self.filters_version:
+            # The catalog was reloaded: filter settings may have changed
+            self.angle_filters.clear()
+            self.filters_version = snapshot.version
+
+        angle_filter = self.angle_filters.get(exercise_type)
+        if angle_filter is None:
+            rule = snapshot.rules.get(exercise_type)
+            angle_filter = create_angle_filter(rule.smoothing if rule else None, self.smoothing_window)
+            self.angle_filters[exercise_type] = angle_filter
+        return angle_filter
+
+    def smooth_angle(self, angle: Optional[float], exercise_type: Optional[str] = None) -> Optional[float]:
         """Apply smoothing to reduce noise"""
         if angle is None:
             return None
-
-        self.angle_history.append(angle)
-
-        if len(self.angle_history) < 3:
-            return angle
-
-        # Use median filter to remove outliers, then average
-        angles_array = np.array(list(self.angle_history))
-        median_angle = np.median(angles_array)
-
-        # Remove outliers (angles > 2 std devs from median)
-        std_dev = np.std(angles_array)
-        filtered_angles = angles_array[np.abs(angles_array - median_angle) <= 2 * std_dev]
-
-        return float(np.mean(filtered_angles)) if len(filtered_angles) > 0 else angle
+        return self.get_angle_filter(exercise_type).update(angle, self.clock())
 
     def check_rep_timing(self) -> bool:
         """Prevent counting reps too quickly"""
-        current_time = time.time()
+        current_time = self.clock()
         if current_time - self.last_count_time < self.min_rep_time:
             return False
         return True
 
     def count_exercise(self, keypoints: np.ndarray, exercise_type: str) -> Optional[float]:
         """Generic exercise counting function"""
+        rule = self.rules.get(exercise_type)
+        if rule is None:
+            print(f"Unknown exercise type: {exercise_type}")
+            return None
+        return self.count_rule(keypoints, rule)
+
+    def count_rule(self, keypoints: np.ndarray, rule: ExerciseRule) -> Optional[float]:
+        """Count a frame with an already looked up exercise rule"""
         try:
-            if exercise_type not in self.exercise_configs:
-                print(f"Unknown exercise type: {exercise_type}")
-                return None
-
-            config = self.exercise_configs[exercise_type]
-            kp = config['keypoints']
-
-            # Calculate angles for both sides
-            left_angle = self.calculate_angle(
-                keypoints[kp['left'][0]],  # first point
-                keypoints[kp['left'][1]],  # middle point
-                keypoints[kp['left'][2]]   # last point
-            )
-
-            right_angle = self.calculate_angle(
-                keypoints[kp['right'][0]],  # first point
-                keypoints[kp['right'][1]],  # middle point
-                keypoints[kp['right'][2]]   # last point
-            )
-
-            if left_angle is None or right_angle is None:
-                return None
-
-            # Handle leg exercises differently
-            if exercise_type in self.leg_exercises:
-                return self.count_leg_exercise(left_angle, right_angle, config)
-
-            # For other exercises, use average angle
-            avg_angle = (left_angle + right_angle) / 2
-            smoothed_angle = self.smooth_angle(avg_angle)
-
-            if smoothed_angle is None:
-                return None
-
-            # Get thresholds
-            up_threshold = config['up_angle']
-            down_threshold = config['down_angle']
-
-            # Check form quality
-            self._check_form_quality(smoothed_angle, exercise_type, up_threshold, down_threshold)
-
-            # Counting logic with timing check
-            if smoothed_angle > up_threshold:
-                self.stage = "up"
-            elif (smoothed_angle < down_threshold and
-                  self.stage == "up" and
-                  self.check_rep_timing()):
-
-                self.stage = "down"
-                self.counter += 1
-                self.last_count_time = time.time()
+            # Calculate angles for both sides in one pass
+            left_angle, right_angle = joint_angles(keypoints, rule.triplets)
+            return self._count_angles(left_angle, right_angle, rule)
 
-            return smoothed_angle
+        except Exception as e:
+            print(f"Exercise counting error: {e}")
+            return None
 
+    def count_angles(self, left_angle: float, right_angle: float, exercise_type: str) -> Optional[float]:
+        """Advance counting from precomputed left/right angles (NaN = not measurable)"""
+        try:
+            return self._count_angles(left_angle, right_angle, self.rules[exercise_type])
         except Exception as e:
             print(f"Exercise counting error: {e}")
             return None
 
-    def count_leg_exercise(self, left_angle: float, right_angle: float, config: Dict[str, Any]) -> float:
+    def _count_angles(self, left_angle: float, right_angle: float, rule: ExerciseRule) -> Optional[float]:
+        if np.isnan(left_angle) or np.isnan(right_angle):
+            return None
+        left_angle, right_angle = float(left_angle), float(right_angle)
+
+        # Handle leg exercises differently
+        if rule.is_leg_exercise:
+            return self.count_leg_exercise(left_angle, right_angle, rule)
+
+        # For other exercises, use average angle
+        avg_angle = (left_angle + right_angle) / 2
+        smoothed_angle = self.smooth_angle(avg_angle, rule.name)
+
+        if smoothed_angle is None:
+            return None
+
+        # Check form quality
+        self._check_form_quality(smoothed_angle, rule)
+
+        # Counting logic with timing check
+        if smoothed_angle > rule.up_angle:
+            self.stage = "up"
+        elif (smoothed_angle < rule.down_angle and
+              self.stage == "up" and
+              self.check_rep_timing()):
+
+            self.stage = "down"
+            self.counter += 1
+            self.last_count_time = self.clock()
+
+        return smoothed_angle
+
+    def count_leg_exercise(self, left_angle: float, right_angle: float, rule: ExerciseRule) -> float:
         """Count leg exercises with complete up-down cycles"""
-        up_threshold = config['up_angle']
-        down_threshold = config['down_angle']
+        up_threshold = rule.up_angle
+        down_threshold = rule.down_angle
 
         # Check if either leg meets the criteria
         if self.check_rep_timing():
@@ -208,7 +221,7 @@ class ExerciseCounter:
             elif (left_angle < down_threshold and
                   self.leg_stages['left'] == "up"):
                 self.counter += 1
-                self.last_count_time = time.time()
+                self.last_count_time = self.clock()
                 self.leg_stages['left'] = "down"
 
             # Right leg
@@ -217,53 +230,12 @@ class ExerciseCounter:
             elif (right_angle < down_threshold and
                   self.leg_stages['right'] == "up"):
                 self.counter += 1
-                self.last_count_time = time.time()
+                self.last_count_time = self.clock()
                 self.leg_stages['right'] = "down"
 
         # Return average angle for display purposes
         return (left_angle + right_angle) / 2
 
-    # Wrapper functions for different exercises
-    def count_squat(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count squat repetitions"""
-        return self.count_exercise(keypoints, 'squat')
-
-    def count_pushup(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count pushup repetitions"""
-        return self.count_exercise(keypoints, 'pushup')
-
-    def count_situp(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count situp repetitions"""
-        return self.count_exercise(keypoints, 'situp')
-
-    def count_bicep_curl(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count bicep curl repetitions"""
-        return self.count_exercise(keypoints, 'bicep_curl')
-
-    def count_lateral_raise(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count lateral raise repetitions"""
-        return self.count_exercise(keypoints, 'lateral_raise')
-
-    def count_overhead_press(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count overhead press repetitions"""
-        return self.count_exercise(keypoints, 'overhead_press')
-
-    def count_leg_raise(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count leg raise repetitions"""
-        return self.count_exercise(keypoints, 'leg_raise')
-
-    def count_knee_raise(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count knee raise repetitions"""
-        return self.count_exercise(keypoints, 'knee_raise')
-
-    def count_knee_press(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count knee press repetitions"""
-        return self.count_exercise(keypoints, 'knee_press')
-
-    def count_crunch(self, keypoints: np.ndarray) -> Optional[float]:
-        """Count crunch repetitions"""
-        return self.count_exercise(keypoints, 'crunch')
-
     def get_counter(self) -> int:
         """Get current rep count"""
         return self.counter
@@ -278,46 +250,23 @@ class ExerciseCounter:
         self.form_corrections = []
         return corrections
 
-    def _check_form_quality(
-        self,
-        angle: float,
-        exercise_type: str,
-        up_threshold: float,
-        down_threshold: float
-    ):
+    def _check_form_quality(self, angle: float, rule: ExerciseRule):
         """
         Analyze form and add corrections if needed.
 
         Args:
             angle: Current angle measurement
-            exercise_type: Type of exercise being performed
-            up_threshold: Upper angle threshold for exercise
-            down_threshold: Lower angle threshold for exercise
+            rule: Compiled rule of the exercise being performed
         """
-
-        # Squat-specific corrections
-        if exercise_type == "squat":
-            if self.stage == 'down' and angle > down_threshold + 20:
-                self.form_corrections.append("Присядьте глубже - колени должны быть под углом 90°")
-            elif self.stage == 'up' and angle < up_threshold - 10:
-                self.form_corrections.append("Полностью выпрямите ноги")
-
-        # Pushup-specific corrections
-        elif exercise_type == "pushup":
-            if self.stage == 'down' and angle > down_threshold + 15:
-                self.form_corrections.append("Опуститесь ниже - грудь ближе к полу")
-            elif self.stage == 'up' and angle < up_threshold - 15:
-                self.form_corrections.append("Полностью выпрямите руки")
-
-        # Lunge-specific corrections
-        elif exercise_type == "lunge":
-            if self.stage == 'down' and angle > down_threshold + 20:
-                self.form_corrections.append("Опустите колено ниже - угол 90°")
+        # Exercise-specific corrections from exercises.json
+        correction = rule.form_correction(self.stage, angle)
+        if correction:
+            self.form_corrections.append(correction)
 
         # General correction for insufficient range of motion
         if self.last_angle is not None:
             angle_change = abs(angle - self.last_angle)
-            if angle_change < 5 and self.stage is not None:
-                self.form_corrections.append("Увеличьте амплитуду движения")
+            if angle_change < MIN_ANGLE_CHANGE and self.stage is not None:
+                self.form_corrections.append(RANGE_OF_MOTION_CORRECTION)
 
         self.last_angle = angle
@@ -0,0 +1,96 @@
+"""
+Compiled exercise rules.
+
+exercises.json is compiled once at load time into immutable ExerciseRule
+objects holding everything frame processing needs: the left/right joint
+triplets as an index array, thresholds, angle_point indices, the smoothing
+filter spec (validated here, like the rest of the entry) and form
+correction rules. Counting a frame is one lookup followed by the rule's own
+evaluation, so adding an exercise only takes a JSON entry. Exercises with `"count_reps": false` (e.g. timed holds) get no
+rule and are not counted.
+"""
+import numpy as np
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+from .angle_filters import create_angle_filter
+
+
+@dataclass(frozen=True)
+class FormRule:
+    """Correction given while in `stage` when the angle passes `limit`"""
+    stage: str
+    limit: float
+    above: bool
+    message: str
+
+    def matches(self, stage: Optional[str], angle: float) -> bool:
+        return stage == self.stage and (angle > self.limit if self.above else angle < self.limit)
+
+
+@dataclass(frozen=True, eq=False)
+class ExerciseRule:
+    """Everything needed to count one exercise"""
+    name: str
+    down_angle: float
+    up_angle: float
+    triplets: np.ndarray                    # (2, 3) left/right (first, middle, last) keypoints, read-only
+    angle_point: Optional[Tuple[int, int, int]]
+    is_leg_exercise: bool
+    smoothing: Optional[Mapping[str, Any]]
+    form_rules: Tuple[FormRule, ...]
+
+    def form_correction(self, stage: Optional[str], angle: float) -> Optional[str]:
+        """Message of the first matching form rule"""
+        for rule in self.form_rules:
+            if rule.matches(stage, angle):
+                return rule.message
+        return None
+
+
+def compile_form_rule(spec: Dict[str, Any], down_angle: float, up_angle: float) -> FormRule:
+    """`{"stage": "down", "above": 20, "message": ...}` = angle above down_angle + 20 while down"""
+    stage = spec['stage']
+    threshold = down_angle if stage == 'down' else up_angle
+    if 'above' in spec:
+        return FormRule(stage, threshold + spec['above'], True, spec['message'])
+    return FormRule(stage, threshold - spec['below'], False, spec['message'])
+
+
+def compile_exercise_rule(name: str, config: Dict[str, Any]) -> ExerciseRule:
+    """Compile one exercises.json entry"""
+    keypoints = config['keypoints']
+    triplets = np.array([keypoints['left'], keypoints['right']], dtype=np.intp)
+    if triplets.shape != (2, 3):
+        raise ValueError("keypoints need three indices per side")
+    triplets.setflags(write=False)
+
+    down_angle, up_angle = float(config['down_angle']), float(config['up_angle'])
+    angle_point = config.get('angle_point') or ()
+    smoothing = config.get('smoothing')
+    if smoothing:
+        create_angle_filter(smoothing)  # Unknown filters and bad parameters fail here, not on the first frame
+
+    return ExerciseRule(
+        name=name,
+        down_angle=down_angle,
+        up_angle=up_angle,
+        triplets=triplets,
+        angle_point=tuple(angle_point) if len(angle_point) == 3 else None,
+        is_leg_exercise=bool(config.get('is_leg_exercise', False)),
+        smoothing=MappingProxyType(dict(smoothing)) if smoothing else None,
+        form_rules=tuple(compile_form_rule(spec, down_angle, up_angle) for spec in config.get('form_rules', ()))
+    )
+
+
+def compile_exercise_rules(exercise_configs: Dict[str, Any]) -> Mapping[str, ExerciseRule]:
+    """Read-only exercise -> rule mapping of all counted exercises"""
+    rules = {}
+    for name, config in exercise_configs.items():
+        if not config.get('count_reps', True):
+            continue
+        try:
+            rules[name] = compile_exercise_rule(name, config)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"⚠ Skipping exercise {name}: invalid config ({e})")
+    return MappingProxyType(rules)
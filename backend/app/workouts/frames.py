@@ -0,0 +1,115 @@
+"""
+Frame decoding helpers for the vision API.
+
+Large JPEG frames can be decoded straight to a reduced size (libjpeg DCT
+scaling via IMREAD_REDUCED_COLOR_2/4/8), which is much cheaper than a full
+decode followed by a resize.
+"""
+import base64
+import binascii
+import cv2
+import numpy as np
+from typing import Optional, Tuple, Union
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+REDUCED_DECODE_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
+
+
+class FrameDecodeError(ValueError):
+    """Raised when a client frame cannot be decoded into an image"""
+
+
+def decode_image_bytes(data: Union[bytes, memoryview]) -> np.ndarray:
+    """Decode encoded image bytes (JPEG/PNG/WebP) into a BGR frame"""
+    nparr = np.frombuffer(data, np.uint8)
+    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    if frame is None:
+        raise FrameDecodeError("Failed to decode image")
+
+    return frame
+
+
+def jpeg_size(data: Union[bytes, memoryview]) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG's start-of-frame header, or None if not a JPEG"""
+    buf = memoryview(data)
+    if len(buf) < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 <= len(buf):
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Markers without a length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height = (buf[i + 5] << 8) | buf[i + 6]
+            width = (buf[i + 7] << 8) | buf[i + 8]
+            return width, height
+        if marker == 0xDA:  # Start of scan before any frame header
+            return None
+        i += 2 + ((buf[i + 2] << 8) | buf[i + 3])
+    return None
+
+
+def reduced_decode_factor(width: int, height: int, max_size: int) -> int:
+    """Largest JPEG scale factor that keeps the longer side at least max_size"""
+    longest = max(width, height)
+    for factor in (8, 4, 2):
+        if longest // factor >= max_size:
+            return factor
+    return 1
+
+
+def decode_image_bytes_scaled(
+    data: Union[bytes, memoryview],
+    max_size: Optional[int] = None
+) -> Tuple[np.ndarray, float]:
+    """
+    Decode image bytes, using reduced JPEG decoding for frames much larger than max_size.
+
+    Returns:
+        Tuple of (BGR frame, decoded size / original size)
+    """
+    if max_size:
+        size = jpeg_size(data)
+        factor = reduced_decode_factor(*size, max_size) if size else 1
+        if factor > 1:
+            frame = cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED_DECODE_FLAGS[factor])
+            if frame is not None:
+                return frame, 1.0 / factor
+
+    return decode_image_bytes(data), 1.0
+
+
+def decode_base64_bytes(frame_b64: str) -> bytes:
+    """Decode base64 image data, optionally prefixed with a data URL header"""
+    # Remove data URL prefix if present
+    if ',' in frame_b64:
+        frame_b64 = frame_b64.split(',')[1]
+
+    try:
+        return base64.b64decode(frame_b64)
+    except (binascii.Error, ValueError) as e:
+        raise FrameDecodeError(f"Image decode error: {e}") from e
+
+
+def decode_frame_scaled(
+    frame_data: Union[str, bytes, memoryview],
+    max_size: Optional[int] = None
+) -> Tuple[np.ndarray, float]:
+    """Decode a frame sent as base64 text (JSON protocol) or raw bytes (binary protocol), also returning its scale"""
+    if isinstance(frame_data, str):
+        frame_data = decode_base64_bytes(frame_data)
+    return decode_image_bytes_scaled(frame_data, max_size)
@@ -0,0 +1,85 @@
+"""
+Bounded executor that keeps frame decoding and pose inference off the event loop.
+
+ONNX Runtime and OpenCV release the GIL while they run, so a thread pool gives
+real parallelism here while session counters stay in-process.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when a frame is rejected because the executor is saturated"""
+
+
+class InferenceExecutor:
+    """Thread pool with a global limit on queued frames
+
+    Sessions hand frames over through a latest-wins mailbox, so each has at
+    most one frame in flight; only the node-wide backlog needs a bound.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 32
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="pose-inference"
+        )
+        self._pending: Dict[str, int] = {}
+        self.rejected_frames = 0
+
+    @property
+    def pending(self) -> int:
+        """Frames queued or running across all sessions"""
+        return sum(self._pending.values())
+
+    def queue_depth(self, session_id: str) -> int:
+        """Frames queued or running for one session"""
+        return self._pending.get(session_id, 0)
+
+    def is_saturated(self) -> bool:
+        """Whether a new frame would be rejected"""
+        return self.pending >= self.max_pending
+
+    def reserve(self, session_id: str):
+        """Claim a queue slot for a frame, or raise InferenceQueueFull"""
+        if self.is_saturated():
+            self.rejected_frames += 1
+            raise InferenceQueueFull("Inference queue is full")
+        self._pending[session_id] = self._pending.get(session_id, 0) + 1
+
+    def release(self, session_id: str):
+        """Free a queue slot claimed with reserve()"""
+        remaining = self._pending.get(session_id, 0) - 1
+        if remaining > 0:
+            self._pending[session_id] = remaining
+        else:
+            self._pending.pop(session_id, None)
+
+    def discard(self, session_id: str):
+        """Forget all queue slots of a closed session"""
+        self._pending.pop(session_id, None)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking function on the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Executor load for health/metrics reporting"""
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected_frames": self.rejected_frames
+        }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
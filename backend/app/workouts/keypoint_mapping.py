@@ -0,0 +1,53 @@
+"""
+Keypoint format conversion for clients that run pose estimation themselves.
+
+Mirrors dashboard/app/utils/keypointMapping.ts: MediaPipe BlazePose (33 points)
+is mapped to the COCO 17 format used by the exercise counter.
+"""
+import numpy as np
+from typing import Optional, Tuple
+
+COCO_KEYPOINT_COUNT = 17
+BLAZEPOSE_KEYPOINT_COUNT = 33
+
+# BlazePose index for each COCO index (nose, eyes, ears, shoulders, elbows,
+# wrists, hips, knees, ankles)
+BLAZEPOSE_TO_COCO = np.array([0, 2, 5, 7, 8, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28])
+
+KEYPOINT_FORMATS = {
+    COCO_KEYPOINT_COUNT: 'coco17',
+    BLAZEPOSE_KEYPOINT_COUNT: 'blazepose33'
+}
+
+
+def to_coco17(
+    keypoints: np.ndarray,
+    scores: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert client keypoints to COCO 17 format.
+
+    Args:
+        keypoints: (17, 2) COCO or (33, 2) BlazePose pixel coordinates
+        scores: Per-keypoint confidence/visibility (defaults to 1.0)
+
+    Returns:
+        Tuple of ((17, 2) keypoints, (17,) scores)
+    """
+    keypoints = np.asarray(keypoints, dtype=np.float64)
+    if keypoints.ndim != 2 or keypoints.shape[1] != 2 or keypoints.shape[0] not in KEYPOINT_FORMATS:
+        raise ValueError(
+            f"Expected keypoints of shape (17, 2) or (33, 2), got {keypoints.shape}"
+        )
+
+    if scores is None:
+        scores = np.ones(len(keypoints))
+    else:
+        scores = np.asarray(scores, dtype=np.float64)
+        if scores.shape != (len(keypoints),):
+            raise ValueError(f"Expected {len(keypoints)} scores, got shape {scores.shape}")
+
+    if len(keypoints) == BLAZEPOSE_KEYPOINT_COUNT:
+        return keypoints[BLAZEPOSE_TO_COCO], scores[BLAZEPOSE_TO_COCO]
+
+    return keypoints, scores
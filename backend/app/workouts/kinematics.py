@@ -0,0 +1,67 @@
+"""
+Vectorized joint angle computation.
+
+Every exercise in exercises.json measures one joint angle per side, given as
+a (first, middle, last) keypoint triplet. JointAngleTable stacks the distinct
+triplets of all compiled exercise rules into one index array, so every configured angle of
+a frame (17, 2) or of a whole sequence (T, 17, 2) is computed in a single
+NumPy pass. Angles with a missing point (NaN or (0, 0), which is how low
+confidence keypoints are blanked) or a zero-length limb are NaN.
+"""
+import numpy as np
+from typing import Dict, List, Mapping, Tuple
+from .exercise_rules import ExerciseRule
+
+
+def joint_angles(keypoints: np.ndarray, triplets: np.ndarray) -> np.ndarray:
+    """Angles in degrees at the middle point of each triplet: (..., K, 2) x (N, 3) -> (..., N)"""
+    points = np.asarray(keypoints, dtype=np.float64)[..., triplets, :]    # (..., N, 3, 2)
+    vectors = points[..., ::2, :] - points[..., 1:2, :]                   # middle -> first, middle -> last
+    x, y = vectors[..., 0], vectors[..., 1]
+
+    # atan2 of cross and dot products: no normalization, and exact near 0 and 180 degrees
+    dot = x[..., 0] * x[..., 1] + y[..., 0] * y[..., 1]
+    cross = x[..., 0] * y[..., 1] - y[..., 0] * x[..., 1]
+    angles = np.degrees(np.abs(np.arctan2(cross, dot)))     # NaN points stay NaN
+
+    missing = ~points.any(axis=-1).all(axis=-1) | ((dot == 0) & (cross == 0))
+    angles[missing] = np.nan
+    return angles
+
+
+class JointAngleTable:
+    """Left/right joint triplets of every configured exercise"""
+
+    def __init__(self, rules: Mapping[str, ExerciseRule]):
+        triplets: List[Tuple[int, ...]] = []
+        self.exercise_rows: Dict[str, np.ndarray] = {}    # Exercise -> rows of (left, right) in triplets
+
+        for exercise_type, rule in rules.items():
+            rows = []
+            for side_triplet in rule.triplets:
+                triplet = tuple(int(i) for i in side_triplet)
+                if triplet not in triplets:
+                    triplets.append(triplet)
+                rows.append(triplets.index(triplet))
+            self.exercise_rows[exercise_type] = np.array(rows, dtype=np.intp)
+
+        self.triplets = np.array(triplets, dtype=np.intp).reshape(-1, 3)
+        self.exercise_triplets = {
+            exercise_type: self.triplets[rows] for exercise_type, rows in self.exercise_rows.items()
+        }
+
+    def __contains__(self, exercise_type: str) -> bool:
+        return exercise_type in self.exercise_rows
+
+    def all_angles(self, keypoints: np.ndarray) -> np.ndarray:
+        """Every distinct configured angle: (..., 17, 2) -> (..., N)"""
+        return joint_angles(keypoints, self.triplets)
+
+    def exercise_angles(self, keypoints: np.ndarray, exercise_type: str) -> np.ndarray:
+        """Left and right angle of one exercise: (..., 17, 2) -> (..., 2)"""
+        return joint_angles(keypoints, self.exercise_triplets[exercise_type])
+
+    def angles_by_exercise(self, keypoints: np.ndarray) -> Dict[str, np.ndarray]:
+        """Left and right angles of every exercise, from one pass over all triplets"""
+        angles = self.all_angles(keypoints)
+        return {exercise_type: angles[..., rows] for exercise_type, rows in self.exercise_rows.items()}
@@ -0,0 +1,40 @@
+"""
+One-slot frame mailbox for latest-frame-wins coalescing.
+
+The WebSocket reader always overwrites the slot with the newest frame and the
+inference task always takes the newest one, so latency stays bounded when a
+client sends faster than frames can be processed.
+"""
+import asyncio
+from typing import Any, Optional
+
+
+class FrameMailbox:
+    """Holds at most one pending frame; a newer frame supersedes the older one"""
+
+    def __init__(self):
+        self._item: Optional[Any] = None
+        self._ready = asyncio.Event()
+        self.superseded = 0
+
+    def put(self, item: Any) -> bool:
+        """Store the newest frame; returns True if an unprocessed frame was dropped"""
+        replaced = self._item is not None
+        if replaced:
+            self.superseded += 1
+        self._item = item
+        self._ready.set()
+        return replaced
+
+    async def get(self) -> Any:
+        """Wait for and take the newest frame"""
+        await self._ready.wait()
+        item = self._item
+        self._item = None
+        self._ready.clear()
+        return item
+
+    @property
+    def depth(self) -> int:
+        """Number of frames waiting (0 or 1)"""
+        return 0 if self._item is None else 1
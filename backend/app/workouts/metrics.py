@@ -0,0 +1,96 @@
+"""
+Per-stage latency instrumentation for the vision pipeline.
+
+A StageTimer follows one frame through the pipeline: `timer.mark('decode')`
+attributes the time since the previous mark to that stage, so each stage
+costs a single perf_counter() call. Finished timers are recorded into
+LatencyHistograms, cumulative histograms per (stage, model mode) with fixed
+buckets, rendered in the Prometheus text format (rates and quantiles over
+any window come from the scraper, e.g. histogram_quantile over rate()).
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Bucket upper bounds in milliseconds (exported in seconds)
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class StageTimer:
+    """Durations of the pipeline stages of one frame"""
+
+    __slots__ = ('stages', '_last')
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}    # Stage -> milliseconds
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        """Attribute the time since the previous mark to `stage`"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in ms, rounded for responses"""
+        return {stage: round(ms, 2) for stage, ms in self.stages.items()}
+
+
+class _NullTimer(StageTimer):
+    """Timer that records nothing (default when instrumentation is off)"""
+
+    __slots__ = ()
+
+    def __init__(self):
+        self.stages = {}
+
+    def mark(self, stage: str):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class LatencyHistograms:
+    """Latency histograms per (stage, mode), plus the total per frame"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._series: Dict[Tuple[str, str], List[float]] = {}    # Bucket counts (+Inf last), then sum
+        self._lock = threading.Lock()
+
+    def record(self, timer: StageTimer, mode: Optional[str]):
+        """Add one frame's stage durations"""
+        if not timer.stages:
+            return
+        mode = mode or 'none'
+        durations = list(timer.stages.items())
+        durations.append(('total', sum(timer.stages.values())))
+        with self._lock:
+            for stage, ms in durations:
+                series = self._series.get((stage, mode))
+                if series is None:
+                    series = self._series[(stage, mode)] = [0] * (len(self.buckets_ms) + 2)
+                series[bisect_left(self.buckets_ms, ms)] += 1
+                series[-1] += ms
+
+    def render_prometheus(self, name: str = 'vision_stage_latency_seconds') -> str:
+        """Prometheus text exposition of all histograms"""
+        lines = [
+            f"# HELP {name} Vision pipeline stage latency per frame",
+            f"# TYPE {name} histogram"
+        ]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for (stage, mode), values in series:
+            labels = f'stage="{stage}",mode="{mode}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets_ms, values):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+            cumulative += values[len(self.buckets_ms)]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {values[-1] / 1000:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return "\n".join(lines) + "\n"
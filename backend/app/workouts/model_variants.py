@@ -0,0 +1,28 @@
+"""
+File names of the INT8 model variants.
+
+Kept apart from the quantization tooling, which needs onnx and
+onnxruntime.quantization: the server only has to find quantized files that
+already exist, and must start without those packages.
+"""
+import os
+from typing import Optional
+
+QUANTIZATION_METHODS = ('static', 'dynamic')    # Lookup order when loading
+
+
+def quantized_model_path(model_path: str, method: str = 'static') -> str:
+    """Path of the INT8 variant of a model file"""
+    if method not in QUANTIZATION_METHODS:
+        raise ValueError(f"Unknown quantization method: {method}")
+    base, ext = os.path.splitext(model_path)
+    return f"{base}.int8-{method}{ext}"
+
+
+def find_quantized_model(model_path: str) -> Optional[str]:
+    """Existing INT8 variant of a model, preferring static quantization"""
+    for method in QUANTIZATION_METHODS:
+        path = quantized_model_path(model_path, method)
+        if os.path.exists(path):
+            return path
+    return None
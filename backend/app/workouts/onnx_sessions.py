@@ -0,0 +1,183 @@
+"""
+ONNX Runtime session tuning and optimized-model cache for the pose models.
+
+Sessions are built with explicit thread counts, execution mode, graph
+optimization level and memory arena setting. When a cache directory is set,
+the ORT-optimized graph is saved on first load (keyed by model hash, ORT
+version and options) and loaded directly on later starts, skipping graph
+optimization.
+"""
+import hashlib
+import os
+import onnxruntime as ort
+from rtmlib import Wholebody, YOLOX, RTMPose
+from typing import Dict, Optional, Tuple
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disabled': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+}
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL
+}
+
+DEVICE_PROVIDERS = {
+    'cpu': 'CPUExecutionProvider',
+    'cuda': 'CUDAExecutionProvider',
+    'rocm': 'ROCMExecutionProvider'
+}
+
+# Model file hashes, keyed by (path, size, mtime) so each file is hashed once per process
+_model_hashes: Dict[Tuple[str, int, float], str] = {}
+
+
+class OrtSessionConfig:
+    """ONNX Runtime session options shared by the detector and pose models"""
+
+    def __init__(
+        self,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        execution_mode: str = 'sequential',
+        graph_optimization: str = 'all',
+        enable_mem_arena: bool = True,
+        cache_dir: Optional[str] = None
+    ):
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {execution_mode}")
+        if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {graph_optimization}")
+
+        self.intra_op_threads = intra_op_threads    # 0 = ORT default (one per core)
+        self.inter_op_threads = inter_op_threads
+        self.execution_mode = execution_mode
+        self.graph_optimization = graph_optimization
+        self.enable_mem_arena = enable_mem_arena
+        self.cache_dir = cache_dir or None
+
+    def cache_key(self) -> str:
+        """Options that affect the optimized graph"""
+        return f"{self.graph_optimization}-{self.execution_mode}"
+
+    def build_options(self) -> ort.SessionOptions:
+        """Create SessionOptions from this config"""
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = EXECUTION_MODES[self.execution_mode]
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[self.graph_optimization]
+        options.enable_cpu_mem_arena = self.enable_mem_arena
+        return options
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "execution_mode": self.execution_mode,
+            "graph_optimization": self.graph_optimization,
+            "enable_mem_arena": self.enable_mem_arena,
+            "cache_dir": self.cache_dir
+        }
+
+
+def model_hash(model_path: str) -> str:
+    """Short SHA-256 of a model file"""
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_size, stat.st_mtime)
+    if key not in _model_hashes:
+        digest = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _model_hashes[key] = digest.hexdigest()[:16]
+    return _model_hashes[key]
+
+
+def optimized_model_path(model_path: str, config: OrtSessionConfig, device: str = 'cpu') -> str:
+    """Cache file for the optimized form of a model under the given options"""
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    key = f"{model_hash(model_path)}-{config.cache_key()}-{device}-ort{ort.__version__}"
+    return os.path.join(config.cache_dir, f"{name}.{key}.onnx")
+
+
+def create_session(
+    model_path: str,
+    config: OrtSessionConfig,
+    device: str = 'cpu'
+) -> ort.InferenceSession:
+    """Build an InferenceSession, reusing or writing the optimized-model cache"""
+    providers = [DEVICE_PROVIDERS.get(device, 'CPUExecutionProvider')]
+    options = config.build_options()
+
+    if config.cache_dir is None:
+        return ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+    cached_path = optimized_model_path(model_path, config, device)
+    if os.path.exists(cached_path):
+        # Already optimized: skip graph optimization on load
+        options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS['disabled']
+        try:
+            return ort.InferenceSession(cached_path, sess_options=options, providers=providers)
+        except Exception as e:
+            print(f"⚠ Ignoring unreadable optimized model {cached_path}: {e}")
+            options = config.build_options()
+
+    os.makedirs(config.cache_dir, exist_ok=True)
+    options.optimized_model_filepath = cached_path
+    return ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+
+def _tool_with_session(tool_cls, model_path: str, session, model_input_size: tuple, device: str, **attrs):
+    """Create an rtmlib tool around an existing session (BaseTool.__init__ would build its own)"""
+    tool = tool_cls.__new__(tool_cls)
+    tool.session = session
+    tool.onnx_model = model_path
+    tool.model_input_size = model_input_size
+    tool.mean = None
+    tool.std = None
+    tool.backend = 'onnxruntime'
+    tool.device = device
+    for name, value in attrs.items():
+        setattr(tool, name, value)
+    return tool
+
+
+def build_pose_model(
+    pose_model_path: str,
+    pose_input_size: tuple,
+    config: OrtSessionConfig,
+    device: str = 'cpu'
+) -> RTMPose:
+    """Equivalent of rtmlib RTMPose(...) using a tuned, cached session"""
+    # Attribute defaults mirror RTMPose.__init__ in rtmlib 0.0.13
+    return _tool_with_session(
+        RTMPose, pose_model_path, create_session(pose_model_path, config, device),
+        pose_input_size, device,
+        mean=(123.675, 116.28, 103.53), std=(58.395, 57.12, 57.375), to_openpose=False
+    )
+
+
+def build_wholebody(
+    det_model_path: str,
+    det_input_size: tuple,
+    pose_model_path: str,
+    pose_input_size: tuple,
+    config: OrtSessionConfig,
+    device: str = 'cpu'
+) -> Wholebody:
+    """Equivalent of rtmlib Wholebody(det=..., pose=...) using tuned, cached sessions"""
+    # Attribute defaults mirror YOLOX.__init__ in rtmlib 0.0.13
+    det_model = _tool_with_session(
+        YOLOX, det_model_path, create_session(det_model_path, config, device),
+        det_input_size, device,
+        nms_thr=0.45, score_thr=0.7
+    )
+
+    wholebody = Wholebody.__new__(Wholebody)
+    wholebody.det_model = det_model
+    wholebody.pose_model = build_pose_model(pose_model_path, pose_input_size, config, device)
+    return wholebody
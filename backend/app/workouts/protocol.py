@@ -0,0 +1,259 @@
+"""
+Binary WebSocket frame protocol for the vision API.
+
+A binary message is a fixed little-endian header followed by the raw encoded
+image (JPEG/WebP/PNG), which avoids base64 and JSON overhead:
+
+    offset  size  field
+    0       2     magic b"MU"
+    2       1     protocol version
+    3       1     message type (1 = image frame, 2 = keypoints)
+    4       2     exercise id (from the hello reply)
+    6       4     sequence number
+    10      8     client timestamp, ms
+
+Keypoint messages carry N x (x, y, score) little-endian float32 values
+(N = 17 for COCO, 33 for BlazePose) instead of an image. ROI frame messages
+carry the crop's (x, y) offset in the full camera frame as two uint16 values
+before the encoded image of the crop.
+"""
+import json
+import struct
+import numpy as np
+from typing import Any, Dict, Iterable, NamedTuple, Tuple
+
+PROTOCOL_VERSION = 1
+FRAME_MAGIC = b'MU'
+FRAME_HEADER = struct.Struct('<2sBBHIQ')
+
+# Message types
+MSG_IMAGE_FRAME = 1
+MSG_KEYPOINTS = 2
+MSG_ROI_FRAME = 3
+
+ROI_HEADER = struct.Struct('<HH')
+
+
+class ProtocolError(ValueError):
+    """Raised when a binary message does not follow the frame protocol"""
+
+
+class BinaryFrame(NamedTuple):
+    """Parsed binary message"""
+    msg_type: int
+    exercise_id: int
+    seq: int
+    client_ts: int
+    payload: memoryview
+
+
+def parse_binary_frame(data: bytes) -> BinaryFrame:
+    """Split a binary message into header fields and a zero-copy payload view"""
+    if len(data) < FRAME_HEADER.size:
+        raise ProtocolError("Binary frame is shorter than its header")
+
+    magic, version, msg_type, exercise_id, seq, client_ts = FRAME_HEADER.unpack_from(data)
+
+    if magic != FRAME_MAGIC:
+        raise ProtocolError("Invalid binary frame magic")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version: {version}")
+
+    payload = memoryview(data)[FRAME_HEADER.size:]
+    return BinaryFrame(msg_type, exercise_id, seq, client_ts, payload)
+
+
+def parse_keypoints_payload(payload: memoryview) -> Tuple[np.ndarray, np.ndarray]:
+    """Read (x, y, score) float32 triples into (N, 2) keypoints and (N,) scores"""
+    if len(payload) % 12 != 0:
+        raise ProtocolError("Keypoint payload must be a multiple of 3 float32 values")
+
+    values = np.frombuffer(payload, dtype='<f4').reshape(-1, 3)
+    return values[:, :2], values[:, 2]
+
+
+def parse_roi_payload(payload: memoryview) -> Tuple[Tuple[int, int], memoryview]:
+    """Split an ROI frame payload into the crop's (x, y) offset and the encoded crop"""
+    if len(payload) <= ROI_HEADER.size:
+        raise ProtocolError("ROI frame payload is shorter than its offset header")
+    return ROI_HEADER.unpack_from(payload), payload[ROI_HEADER.size:]
+
+
+def pack_roi_payload(x: int, y: int, image: bytes) -> bytes:
+    """Build an ROI frame payload (used by clients, tests and benchmarks)"""
+    return ROI_HEADER.pack(x, y) + bytes(image)
+
+
+def pack_binary_frame(
+    exercise_id: int,
+    seq: int,
+    client_ts: int,
+    payload: bytes,
+    msg_type: int = MSG_IMAGE_FRAME
+) -> bytes:
+    """Build a binary message (used by clients, tests and benchmarks)"""
+    header = FRAME_HEADER.pack(FRAME_MAGIC, PROTOCOL_VERSION, msg_type, exercise_id, seq, client_ts)
+    return header + bytes(payload)
+
+
+def build_exercise_ids(exercise_types: Iterable[str]) -> Dict[str, int]:
+    """Assign numeric ids (starting at 1) to exercises in config order"""
+    return {exercise_type: i for i, exercise_type in enumerate(exercise_types, start=1)}
+
+
+# Compact pose results (server -> client), negotiated with
+# { "type": "hello", "response_format": "compact" }:
+#
+#     offset  size  field
+#     0       2     magic b"MU"
+#     2       1     protocol version
+#     3       1     message type (16 = pose result)
+#     4       1     flags (see RESULT_* below)
+#     5       1     number of keypoints
+#     6       4     sequence number echoed from the client (0 for JSON frames)
+#     10      8     client timestamp echoed from the client (0 for JSON frames)
+#     18      2     angle in tenths of a degree (int16)
+#     20      2     frames waiting in the session mailbox
+#     22      4     frames dropped by the session so far
+#
+# followed by optional sections in this order: keypoints as int16 (x, y)
+# pixels, angle_point as 3 int16 (x, y) pixels, the tracked ROI as 4 int16
+# (x1, y1, x2, y2) pixels, a JSON object with the session state fields that
+# changed since the previous result, and a JSON object with the debug stage
+# timings. JSON sections are UTF-8 prefixed with their uint16 byte length.
+RESULT_HEADER = struct.Struct('<2sBBBBIQhHI')
+RESULT_JSON_LENGTH = struct.Struct('<H')
+MSG_POSE_RESULT = 16
+
+RESULT_DETECTED = 0x01
+RESULT_ANGLE = 0x02
+RESULT_KEYPOINTS = 0x04
+RESULT_ANGLE_POINT = 0x08
+RESULT_STATE = 0x10
+RESULT_ROI = 0x20
+RESULT_TIMINGS = 0x40
+
+# Per-frame fields carried outside the state delta (header or their own sections)
+_RESULT_BINARY_FIELDS = {
+    "success", "detected", "angle", "keypoints", "angle_point", "seq", "client_ts",
+    "queue_depth", "dropped_frames", "roi", "timings_ms"
+}
+
+
+def _to_int16(values) -> bytes:
+    return np.clip(np.rint(np.asarray(values, dtype=np.float64)), -32768, 32767).astype('<i2').tobytes()
+
+
+def _json_section(value: Dict[str, Any]) -> bytes:
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return RESULT_JSON_LENGTH.pack(len(data)) + data
+
+
+def _read_json_section(data: bytes, offset: int) -> Tuple[Dict[str, Any], int]:
+    (size,) = RESULT_JSON_LENGTH.unpack_from(data, offset)
+    offset += RESULT_JSON_LENGTH.size
+    return json.loads(bytes(data[offset:offset + size]).decode('utf-8')), offset + size
+
+
+class CompactResponseEncoder:
+    """Encodes pose results as compact binary frames, sending static fields only when they change"""
+
+    def __init__(self, include_keypoints: bool = True):
+        self.include_keypoints = include_keypoints
+        self._last_state: Dict[str, Any] = {}
+
+    def encode(self, response: Dict[str, Any]) -> bytes:
+        """Encode a successful pose response built by the vision API"""
+        flags = 0
+        sections = []
+
+        if response.get("detected"):
+            flags |= RESULT_DETECTED
+
+        angle = response.get("angle")
+        angle_tenths = 0
+        if angle is not None:
+            flags |= RESULT_ANGLE
+            angle_tenths = int(np.clip(round(angle * 10), -32768, 32767))
+
+        keypoints = response.get("keypoints")
+        num_keypoints = 0
+        if keypoints is not None and self.include_keypoints:
+            flags |= RESULT_KEYPOINTS
+            num_keypoints = len(keypoints)
+            sections.append(_to_int16(keypoints))
+
+        angle_point = response.get("angle_point")
+        if angle_point is not None:
+            flags |= RESULT_ANGLE_POINT
+            sections.append(_to_int16(angle_point))
+
+        roi = response.get("roi")
+        if roi is not None:
+            flags |= RESULT_ROI
+            sections.append(_to_int16(roi))
+
+        changed = {}
+        for key, value in response.items():
+            if key in _RESULT_BINARY_FIELDS:
+                continue
+            if key == "form_corrections":
+                # Corrections are events: sent whenever there are any
+                if value:
+                    changed[key] = value
+            elif self._last_state.get(key) != value or key not in self._last_state:
+                changed[key] = value
+                self._last_state[key] = value
+
+        if changed:
+            flags |= RESULT_STATE
+            sections.append(_json_section(changed))
+
+        timings = response.get("timings_ms")
+        if timings:
+            flags |= RESULT_TIMINGS
+            sections.append(_json_section(timings))
+
+        header = RESULT_HEADER.pack(
+            FRAME_MAGIC, PROTOCOL_VERSION, MSG_POSE_RESULT, flags, num_keypoints,
+            response.get("seq", 0), response.get("client_ts", 0), angle_tenths,
+            min(response.get("queue_depth", 0), 0xFFFF), response.get("dropped_frames", 0)
+        )
+        return header + b''.join(sections)
+
+
+def decode_compact_result(data: bytes) -> Dict[str, Any]:
+    """Decode a compact pose result (reference implementation for clients and tests)"""
+    (magic, version, msg_type, flags, num_keypoints, seq, client_ts,
+     angle_tenths, queue_depth, dropped_frames) = RESULT_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC or msg_type != MSG_POSE_RESULT:
+        raise ProtocolError("Not a compact pose result")
+
+    result: Dict[str, Any] = {
+        "seq": seq,
+        "client_ts": client_ts,
+        "detected": bool(flags & RESULT_DETECTED),
+        "queue_depth": queue_depth,
+        "dropped_frames": dropped_frames
+    }
+    offset = RESULT_HEADER.size
+
+    if flags & RESULT_ANGLE:
+        result["angle"] = angle_tenths / 10
+    if flags & RESULT_KEYPOINTS:
+        size = num_keypoints * 4
+        result["keypoints"] = np.frombuffer(data, '<i2', num_keypoints * 2, offset).reshape(-1, 2).tolist()
+        offset += size
+    if flags & RESULT_ANGLE_POINT:
+        result["angle_point"] = np.frombuffer(data, '<i2', 6, offset).reshape(3, 2).tolist()
+        offset += 12
+    if flags & RESULT_ROI:
+        result["roi"] = np.frombuffer(data, '<i2', 4, offset).tolist()
+        offset += 8
+    if flags & RESULT_STATE:
+        state, offset = _read_json_section(data, offset)
+        result.update(state)
+    if flags & RESULT_TIMINGS:
+        result["timings_ms"], offset = _read_json_section(data, offset)
+
+    return result
@@ -0,0 +1,101 @@
+"""
+INT8 quantization of the YOLOX detector and RTMPose models.
+
+Quantized files sit next to the FP32 models as `<name>.int8-static.onnx` or
+`<name>.int8-dynamic.onnx` and are picked up by RTMPoseProcessor with
+precision='int8'. Static (QDQ) quantization is calibrated on recorded frames
+and usually the faster of the two for these conv nets on CPU; dynamic
+quantization needs no data but only quantizes weights ahead of time.
+
+onnx and onnxruntime.quantization are imported only when a model is
+quantized, so the server does not need them to load existing INT8 files.
+"""
+import os
+import numpy as np
+from typing import Iterable, List, Optional, Tuple
+from .model_variants import quantized_model_path
+
+# Only the compute-heavy ops are calibrated and quantized: YOLOX exports end in
+# NMS, whose (often empty) outputs break min/max calibration
+STATIC_OP_TYPES = ['Conv', 'MatMul', 'Gemm']
+
+
+def _calibration_reader(input_name: str, inputs: List[np.ndarray]):
+    """Calibration data reader feeding preprocessed model inputs to the static quantizer"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self._inputs = iter(inputs)
+
+        def get_next(self):
+            tensor = next(self._inputs, None)
+            return None if tensor is None else {input_name: tensor}
+
+    return FrameCalibrationReader()
+
+
+def _to_model_input(image: np.ndarray) -> np.ndarray:
+    """(H, W, 3) preprocessed image to a (1, 3, H, W) float32 tensor, as in rtmlib inference"""
+    return np.ascontiguousarray(image.transpose(2, 0, 1), dtype=np.float32)[None]
+
+
+def calibration_inputs(wholebody, frames: Iterable[np.ndarray]) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Detector and pose model inputs for recorded frames, preprocessed with the FP32 models"""
+    det_inputs, pose_inputs = [], []
+    for frame in frames:
+        det_image, _ = wholebody.det_model.preprocess(frame)
+        det_inputs.append(_to_model_input(det_image))
+
+        bboxes = wholebody.det_model(frame)
+        if len(bboxes) == 0:
+            bboxes = [[0, 0, frame.shape[1], frame.shape[0]]]
+        for bbox in bboxes:
+            pose_image, _, _ = wholebody.pose_model.preprocess(frame, bbox)
+            pose_inputs.append(_to_model_input(pose_image))
+    return det_inputs, pose_inputs
+
+
+def quantize_model_dynamic(model_path: str, output_path: Optional[str] = None) -> str:
+    """Write a dynamically quantized (INT8 weights) copy of a model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_path = output_path or quantized_model_path(model_path, 'dynamic')
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QUInt8)
+    return output_path
+
+
+def quantize_model_static(
+    model_path: str,
+    inputs: List[np.ndarray],
+    output_path: Optional[str] = None,
+    per_channel: bool = True
+) -> str:
+    """Write a statically quantized (QDQ, calibrated on the given inputs) copy of a model"""
+    if not inputs:
+        raise ValueError("Static quantization needs at least one calibration input")
+
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    model = onnx.load(model_path, load_external_data=False)
+    input_name = model.graph.input[0].name
+
+    # Per-channel QDQ needs DequantizeLinear with an axis (opset 13+)
+    opset = next((o.version for o in model.opset_import if o.domain in ('', 'ai.onnx')), 0)
+    if per_channel and opset < 13:
+        print(f"⚠ {os.path.basename(model_path)} uses opset {opset}, quantizing per tensor")
+        per_channel = False
+
+    output_path = output_path or quantized_model_path(model_path, 'static')
+    quantize_static(
+        model_path,
+        output_path,
+        _calibration_reader(input_name, inputs),
+        quant_format=QuantFormat.QDQ,
+        op_types_to_quantize=STATIC_OP_TYPES,
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8
+    )
+    return output_path
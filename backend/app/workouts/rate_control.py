@@ -0,0 +1,91 @@
+"""
+Server-recommended client frame rate and resolution.
+
+Each session's frames go through the pipeline one at a time (latest frame
+wins), so frames sent faster than the session's service time are decoded by
+nobody and only cost upload bandwidth. FrameRateAdvisor tracks that service
+time, the round trip time measured with ping/pong, and the session's share
+of the node's inference budget, and recommends the highest frame rate that
+keeps the pipeline busy without dropping frames. When even the minimum rate
+does not fit, or end-to-end latency exceeds its budget, it steps the frame
+size down; it steps back up once latency is well inside the budget.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_FRAME_SIZES = (640, 480, 320)   # Longer side in pixels, largest first
+
+
+class FrameRateAdvisor:
+    """Recommended fps and frame size for one session"""
+
+    def __init__(
+        self,
+        min_fps: float = 5.0,
+        max_fps: float = 30.0,
+        latency_budget_ms: float = 250.0,
+        frame_sizes: Tuple[int, ...] = DEFAULT_FRAME_SIZES,
+        headroom: float = 0.85,
+        recover_ratio: float = 0.5,
+        alpha: float = 0.2
+    ):
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.latency_budget_ms = latency_budget_ms
+        self.frame_sizes = frame_sizes
+        self.headroom = headroom                # Share of the service rate to fill
+        self.recover_ratio = recover_ratio
+        self.alpha = alpha
+
+        self.service_ms = 0.0       # Receive to sent, per frame (EWMA)
+        self.rtt_ms: Optional[float] = None
+        self.size_index = 0
+        self.last_sent: Optional[Dict[str, Any]] = None
+
+    def _smooth(self, current: float, value: float) -> float:
+        return value if not current else current + self.alpha * (value - current)
+
+    def record_frame(self, service_ms: float):
+        """Add the server-side time of one frame of this session"""
+        self.service_ms = self._smooth(self.service_ms, service_ms)
+
+    def record_rtt(self, rtt_ms: float):
+        """Add a ping/pong round trip time"""
+        self.rtt_ms = self._smooth(self.rtt_ms or 0.0, rtt_ms)
+
+    @property
+    def latency_ms(self) -> float:
+        """Estimated end-to-end latency of a frame: network round trip plus server time"""
+        return self.service_ms + (self.rtt_ms or 0.0)
+
+    def recommend(self, share_fps: Optional[float] = None) -> Dict[str, Any]:
+        """Frame rate and size to ask for; share_fps is this session's part of the node budget"""
+        limits = [self.max_fps]
+        if self.service_ms > 0:
+            limits.append(1000.0 * self.headroom / self.service_ms)
+        if share_fps:
+            limits.append(share_fps)
+        fits = min(limits)
+
+        # Smaller frames when the pipeline cannot keep up or the round trip is too slow
+        if (fits < self.min_fps or self.latency_ms > self.latency_budget_ms) and \
+                self.size_index < len(self.frame_sizes) - 1:
+            self.size_index += 1
+        elif (self.size_index > 0 and fits >= self.max_fps * self.recover_ratio and
+              self.latency_ms < self.latency_budget_ms * self.recover_ratio):
+            self.size_index -= 1
+
+        return {
+            "fps": int(max(self.min_fps, min(fits, self.max_fps))),
+            "max_size": self.frame_sizes[self.size_index],
+            "latency_ms": round(self.latency_ms, 1),
+            "server_ms": round(self.service_ms, 1),
+            "rtt_ms": round(self.rtt_ms, 1) if self.rtt_ms is not None else None
+        }
+
+    def changed(self, recommendation: Dict[str, Any]) -> bool:
+        """Whether a recommendation differs from the last one sent (and mark it sent)"""
+        previous = self.last_sent
+        self.last_sent = recommendation
+        return previous is None or (previous["fps"], previous["max_size"]) != (
+            recommendation["fps"], recommendation["max_size"]
+        )
@@ -3,12 +3,30 @@ RTMPose pose detection processor for workout tracking.
 Adapted from Good-GYM-master for FastAPI backend.
 """
 import os
+import time
 import cv2
 import numpy as np
-import json
-from rtmlib import Wholebody
+from rtmlib import Wholebody, RTMPose
 from typing import Optional, Tuple, List, Dict, Any
+from .batching import PoseBatchScheduler
+from .exercise_catalog import ExerciseCatalog
 from .exercise_counter import ExerciseCounter
+from .metrics import NULL_TIMER, StageTimer
+from .onnx_sessions import OrtSessionConfig, build_pose_model, build_wholebody
+from .model_variants import find_quantized_model
+from .tracking import FrameGeometry, PoseTracker
+
+# Local ONNX model files
+DET_MODEL_FILE = 'yolox_nano_8xb8-300e_humanart-40f6f0d0.onnx'
+DET_INPUT_SIZE = (416, 416)
+POSE_MODEL_FILES = {
+    'lightweight': 'rtmpose-t_simcc-body7_pt-body7_420e-256x192-026a1439_20230504.onnx',
+    'balanced': 'rtmpose-s_simcc-body7_pt-body7_420e-256x192-acd4a1ef_20230504.onnx',
+    'performance': 'rtmpose-m_simcc-body7_pt-body7_420e-256x192-e48f03d0_20230504.onnx'
+}
+POSE_INPUT_SIZE = (192, 256)
+MAX_FRAME_SIZE = 640    # Larger frames are downscaled before inference
+MODEL_PRECISIONS = ('fp32', 'int8')
 
 
 class RTMPoseProcessor:
@@ -20,24 +38,36 @@ class RTMPoseProcessor:
         models_dir: str,
         mode: str = 'balanced',
         backend: str = 'onnxruntime',
-        device: str = 'cpu'
+        device: str = 'cpu',
+        load_models: bool = True,
+        session_config: Optional[OrtSessionConfig] = None,
+        precision: str = 'fp32'
     ):
+        if precision not in MODEL_PRECISIONS:
+            raise ValueError(f"Unknown model precision: {precision}")
+
         self.exercise_counter = exercise_counter
         self.show_skeleton = True
         self.conf_threshold = 0.5
         self.device = device
         self.backend = backend
         self.models_dir = models_dir
+        self.session_config = session_config
+        self.precision = precision
+
+        self.mode = mode
 
-        # Initialize RTMPose model
+        # Initialize RTMPose model (skipped when inference runs in worker processes)
         self.wholebody = None
-        self.init_rtmpose(mode)
+        self.pose_models: Dict[str, Any] = {}    # Loaded pose models by mode (detector is shared)
+        self.pose_batchers: Dict[str, PoseBatchScheduler] = {}
+        self.pose_runner = None
+        if load_models:
+            self.init_rtmpose(mode)
+            self.pose_models[mode] = self.wholebody.pose_model
 
         self.keypoint_mapping = self.get_keypoint_mapping()
 
-        # Load exercise configurations for angle points
-        self.exercise_configs = self.load_exercise_configs()
-
     def init_rtmpose(self, mode: str = 'balanced'):
         """Initialize RTMPose model"""
         try:
@@ -46,27 +76,31 @@ class RTMPoseProcessor:
             # Check if local model files exist
             if os.path.exists(self.models_dir):
                 # Try to use local models
-                det_model = os.path.join(self.models_dir, 'yolox_nano_8xb8-300e_humanart-40f6f0d0.onnx')
+                det_model = os.path.join(self.models_dir, DET_MODEL_FILE)
 
                 # Select different pose detection models based on mode
-                if mode == 'lightweight':
-                    pose_model = os.path.join(self.models_dir,
-                                              'rtmpose-t_simcc-body7_pt-body7_420e-256x192-026a1439_20230504.onnx')
-                    pose_input_size = (192, 256)
-                elif mode == 'performance':
-                    pose_model = os.path.join(self.models_dir,
-                                              'rtmpose-m_simcc-body7_pt-body7_420e-256x192-e48f03d0_20230504.onnx')
-                    pose_input_size = (192, 256)
-                else:  # balanced
-                    pose_model = os.path.join(self.models_dir,
-                                              'rtmpose-s_simcc-body7_pt-body7_420e-256x192-acd4a1ef_20230504.onnx')
-                    pose_input_size = (192, 256)
+                pose_model = os.path.join(
+                    self.models_dir,
+                    POSE_MODEL_FILES.get(mode, POSE_MODEL_FILES['balanced'])
+                )
+                pose_input_size = POSE_INPUT_SIZE
 
                 if os.path.exists(det_model) and os.path.exists(pose_model):
-                    print(f"✓ Using local model files ({mode} mode)")
+                    if self.precision == 'int8':
+                        det_model = self.resolve_int8_model(det_model)
+                        pose_model = self.resolve_int8_model(pose_model)
+                    print(f"✓ Using local model files ({mode} mode, {self.precision})")
+                    if self.session_config is not None and self.backend == 'onnxruntime':
+                        self.wholebody = build_wholebody(
+                            det_model, DET_INPUT_SIZE,
+                            pose_model, pose_input_size,
+                            self.session_config, self.device
+                        )
+                        print(f"✓ RTMPose local model initialization successful (tuned sessions: {self.session_config.to_dict()})")
+                        return
                     self.wholebody = Wholebody(
                         det=det_model,
-                        det_input_size=(416, 416),
+                        det_input_size=DET_INPUT_SIZE,
                         pose=pose_model,
                         pose_input_size=pose_input_size,
                         backend=self.backend,
@@ -91,6 +125,14 @@ class RTMPoseProcessor:
             print(f"✗ RTMPose initialization failed: {e}")
             raise
 
+    def resolve_int8_model(self, model_path: str) -> str:
+        """INT8 variant of a model file, or the FP32 file if it was not quantized yet"""
+        quantized = find_quantized_model(model_path)
+        if quantized is None:
+            print(f"⚠ No INT8 model for {os.path.basename(model_path)}, using FP32")
+            return model_path
+        return quantized
+
     def get_keypoint_mapping(self) -> List[int]:
         """Get keypoint mapping (COCO 17 keypoint format)"""
         # RTMPose uses COCO 17 keypoint format:
@@ -100,59 +142,234 @@ class RTMPoseProcessor:
         # 13: left_knee, 14: right_knee, 15: left_ankle, 16: right_ankle
         return list(range(17))  # 1:1 mapping
 
-    def load_exercise_configs(self) -> Dict[str, Any]:
-        """Load exercise configurations from JSON file"""
-        exercises_file = os.path.join(os.path.dirname(self.models_dir), 'data', 'exercises.json')
-
-        try:
-            if os.path.exists(exercises_file):
-                with open(exercises_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    exercises = data.get('exercises', {})
-
-                    # Extract angle_point for each exercise
-                    configs = {}
-                    for exercise_type, config in exercises.items():
-                        configs[exercise_type] = {
-                            'angle_point': config.get('angle_point', [])
-                        }
-
-                    return configs
+    def load_pose_modes(self, modes) -> List[str]:
+        """Keep the pose models of additional modes loaded (local files only) for per-session switching"""
+        for mode in modes:
+            if mode in self.pose_models:
+                continue
+
+            pose_model = os.path.join(self.models_dir, POSE_MODEL_FILES[mode])
+            if not os.path.exists(pose_model):
+                print(f"⚠ Pose model for {mode} mode not found, skipping")
+                continue
+            if self.precision == 'int8':
+                pose_model = self.resolve_int8_model(pose_model)
+
+            if self.session_config is not None and self.backend == 'onnxruntime':
+                self.pose_models[mode] = build_pose_model(
+                    pose_model, POSE_INPUT_SIZE, self.session_config, self.device
+                )
             else:
-                print(f"⚠ Exercises file not found at {exercises_file}")
-                return {}
-        except Exception as e:
-            print(f"✗ ERROR loading exercises from JSON: {e}")
-            return {}
+                self.pose_models[mode] = RTMPose(
+                    pose_model,
+                    model_input_size=POSE_INPUT_SIZE,
+                    backend=self.backend,
+                    device=self.device
+                )
+
+            # Batch the new model like the others
+            batcher = self.pose_batcher
+            if batcher is not None:
+                self.pose_batchers[mode] = PoseBatchScheduler(
+                    self.pose_models[mode],
+                    window_ms=batcher.window * 1000.0,
+                    max_batch_size=batcher.max_batch_size
+                )
+            print(f"✓ RTMPose {mode} pose model loaded")
+
+        return sorted(self.pose_models)
+
+    @property
+    def loaded_modes(self) -> List[str]:
+        """Pose model modes this processor can run, locally or in its worker pool"""
+        if self.pose_runner is not None:
+            return self.pose_runner.modes
+        return sorted(self.pose_models)
+
+    def resolve_mode(self, mode: Optional[str]) -> str:
+        """Mode that actually runs for a requested one (modes that are not loaded fall back to the default)"""
+        return mode if mode in self.loaded_modes else self.mode
+
+    def warm_up(self, runs: int = 3) -> Dict[str, Dict[str, Any]]:
+        """Run every loaded model on a dummy frame at its input size; returns first-call and warm latency"""
+        results: Dict[str, Dict[str, Any]] = {}
+        if self.wholebody is None:
+            return results
+        rng = np.random.default_rng(0)
+
+        def measure(name: str, input_size: Tuple[int, int], call):
+            timings = []
+            for _ in range(max(runs, 2)):
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                "input_size": list(input_size),
+                "first_ms": round(timings[0], 1),
+                "warm_ms": round(float(np.median(timings[1:])), 1)
+            }
+
+        # Model input sizes are (width, height)
+        det_frame = rng.integers(0, 256, (DET_INPUT_SIZE[1], DET_INPUT_SIZE[0], 3), dtype=np.uint8)
+        measure('detector', DET_INPUT_SIZE, lambda: self.wholebody.det_model(det_frame))
+
+        pose_frame = rng.integers(0, 256, (POSE_INPUT_SIZE[1], POSE_INPUT_SIZE[0], 3), dtype=np.uint8)
+        bboxes = [[0, 0, POSE_INPUT_SIZE[0], POSE_INPUT_SIZE[1]]]
+        for mode, pose_model in self.pose_models.items():
+            measure(f"pose_{mode}", POSE_INPUT_SIZE, lambda model=pose_model: model(pose_frame, bboxes=bboxes))
+
+        print("✓ RTMPose models warmed up: " + ", ".join(
+            f"{name} {stats['first_ms']:.0f} -> {stats['warm_ms']:.0f} ms" for name, stats in results.items()
+        ))
+        return results
+
+    def create_exercise_counter(self) -> ExerciseCounter:
+        """Create an independent counter for one client session (model stays shared)"""
+        return self.exercise_counter.clone()
+
+    @property
+    def pose_batcher(self) -> Optional[PoseBatchScheduler]:
+        """Batch scheduler of the default mode's pose model"""
+        return self.pose_batchers.get(self.mode)
+
+    def enable_batching(self, window_ms: float = 8.0, max_batch_size: int = 16):
+        """Share pose model calls between concurrent sessions (see PoseBatchScheduler)"""
+        self.disable_batching()
+        for mode, pose_model in self.pose_models.items():
+            self.pose_batchers[mode] = PoseBatchScheduler(
+                pose_model,
+                window_ms=window_ms,
+                max_batch_size=max_batch_size
+            )
+        print(f"✓ RTMPose pose batching enabled (window: {window_ms} ms, max batch: {max_batch_size})")
+
+    def disable_batching(self):
+        """Go back to one pose model call per frame"""
+        for batcher in self.pose_batchers.values():
+            batcher.stop()
+        self.pose_batchers = {}
 
     def update_model(self, mode: str = 'balanced'):
         """Update model"""
         print(f"Updating RTMPose model to mode: {mode}")
+        batcher = self.pose_batcher
+        self.disable_batching()
         self.init_rtmpose(mode)
+        self.pose_models[mode] = self.wholebody.pose_model
+        self.mode = mode
+        if batcher is not None:
+            self.enable_batching(batcher.window * 1000.0, batcher.max_batch_size)
         print(f"✓ RTMPose processor updated to mode: {mode}")
 
+    def estimate_pose(
+        self,
+        frame: np.ndarray,
+        bboxes: Optional[List] = None,
+        mode: Optional[str] = None,
+        timer: StageTimer = NULL_TIMER
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Estimate keypoints in the given person boxes, running the detector if none are given"""
+        if bboxes is None:
+            bboxes = self.wholebody.det_model(frame)
+            timer.mark('detect')
+
+        # Modes that are not loaded fall back to the default model
+        mode = mode if mode in self.pose_models else self.mode
+        pose_model = (
+            self.pose_batchers.get(mode) or
+            self.pose_models.get(mode) or
+            self.wholebody.pose_model
+        )
+        result = pose_model(frame, bboxes=bboxes)
+        timer.mark('pose')
+        return result
+
+    def run_pose_model(
+        self,
+        frame: np.ndarray,
+        tracker: Optional[PoseTracker] = None,
+        mode: Optional[str] = None,
+        timer: StageTimer = NULL_TIMER,
+        geometry: Optional[FrameGeometry] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Detect people and estimate their keypoints (locally or on the worker pool)"""
+        geometry = geometry or FrameGeometry.full_frame(frame.shape)
+
+        # With tracking, reuse the previous pose's box while it is valid
+        # (ROI crops were cut around that box, so they skip the detection interval)
+        bboxes = None
+        if tracker is not None:
+            tracked = tracker.tracked_bboxes(ignore_interval=geometry.cropped)
+            if tracked is not None:
+                bbox = geometry.to_frame_box(tracked[0], frame.shape)
+                bboxes = [bbox] if bbox is not None else None
+            if bboxes is None:
+                tracker.mark_detection()
+
+        if self.pose_runner is not None:
+            keypoints, scores = self.pose_runner(frame, bboxes, mode)
+            timer.mark('inference')     # Detection and pose in a worker process
+        else:
+            keypoints, scores = self.estimate_pose(frame, bboxes, mode, timer)
+
+        if tracker is not None:
+            if len(keypoints) > 0:
+                tracker.update(geometry.to_client(keypoints[0]), scores[0], geometry.client_shape)
+            else:
+                tracker.update(None, None, geometry.client_shape)
+
+        return keypoints, scores
+
+    def prepare_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Downscale frames larger than MAX_FRAME_SIZE; returns the frame and the applied scale"""
+        h, w = frame.shape[:2]
+
+        # RTMPose is suitable for higher resolution, but limit for performance
+        if w > MAX_FRAME_SIZE or h > MAX_FRAME_SIZE:
+            scale = min(MAX_FRAME_SIZE / w, MAX_FRAME_SIZE / h)
+            return cv2.resize(frame, (int(w * scale), int(h * scale))), scale
+        return frame, 1.0
+
     def process_frame(
         self,
         frame: np.ndarray,
-        exercise_type: str
+        exercise_type: str,
+        exercise_counter: Optional[ExerciseCounter] = None,
+        tracker: Optional[PoseTracker] = None,
+        mode: Optional[str] = None,
+        input_scale: float = 1.0,
+        timer: StageTimer = NULL_TIMER,
+        crop_origin: Optional[Tuple[float, float]] = None,
+        client_size: Optional[Tuple[int, int]] = None
     ) -> Tuple[Optional[float], Optional[List], Optional[np.ndarray]]:
         """
         Process single frame for pose detection and exercise counting.
 
+        Args:
+            frame: BGR image
+            exercise_type: Exercise identifier from exercises.json
+            exercise_counter: Session counter to update (defaults to the processor's own counter)
+            tracker: Session tracking state; when given the detector only runs every few frames
+            mode: Pose model mode for this frame (defaults to the processor's mode)
+            input_scale: Size of `frame` relative to the client's image (reduced JPEG decode);
+                keypoints are returned in the client's coordinates
+            timer: Receives the resize, detect, pose (or inference) and count stage durations
+            crop_origin: (x, y) of `frame` in the client's image when the client sent an ROI crop;
+                keypoints are then returned in full-image coordinates
+            client_size: (width, height) of the client's full image (required with crop_origin)
+
         Returns:
             Tuple of (current_angle, angle_point, keypoints)
         """
         # Size check, resize if frame is too large
-        h, w = frame.shape[:2]
-        original_size = (w, h)
-
-        # RTMPose is suitable for higher resolution, but limit for performance
-        if w > 640 or h > 640:
-            scale = min(640 / w, 640 / h)
-            frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
-            scale_factor = scale
+        frame, scale_factor = self.prepare_frame(frame)
+        scale_factor *= input_scale
+        if crop_origin is not None:
+            width, height = client_size
+            geometry = FrameGeometry(scale_factor, tuple(crop_origin), (height, width), cropped=True)
         else:
-            scale_factor = 1.0
+            geometry = FrameGeometry.full_frame(frame.shape, scale_factor)
+        timer.mark('resize')
 
         # Initialize results
         current_angle = None
@@ -161,7 +378,7 @@ class RTMPoseProcessor:
 
         try:
             # Use RTMPose for pose detection
-            detected_keypoints, scores = self.wholebody(frame)
+            detected_keypoints, scores = self.run_pose_model(frame, tracker, mode, timer, geometry)
 
             # Process results
             if detected_keypoints is not None and len(detected_keypoints) > 0:
@@ -169,17 +386,14 @@ class RTMPoseProcessor:
                 keypoints = detected_keypoints[0]  # shape: (17, 2)
                 confidence_scores = scores[0] if scores is not None else None
 
-                # Filter low confidence keypoints
-                if confidence_scores is not None:
-                    valid_mask = confidence_scores > self.conf_threshold
-                    keypoints[~valid_mask] = [0, 0]  # Set low confidence points to (0,0)
-
-                # If need to scale back to original size
-                if scale_factor != 1.0:
-                    keypoints = keypoints / scale_factor
+                # If need to scale back to original size (and place crops in the full image)
+                if scale_factor != 1.0 or geometry.cropped:
+                    keypoints = geometry.to_client(keypoints)
 
-                # Get corresponding angle and joint points based on exercise type
-                current_angle, angle_point = self.get_exercise_angle(keypoints, exercise_type)
+                current_angle, angle_point, keypoints = self.process_keypoints(
+                    keypoints, confidence_scores, exercise_type, exercise_counter
+                )
+                timer.mark('count')
 
         except Exception as e:
             print(f"✗ RTMPose processing failed: {e}")
@@ -187,44 +401,50 @@ class RTMPoseProcessor:
         # Return current_angle, angle_point, and keypoints
         return current_angle, angle_point, keypoints
 
+    def process_keypoints(
+        self,
+        keypoints: np.ndarray,
+        scores: Optional[np.ndarray],
+        exercise_type: str,
+        exercise_counter: Optional[ExerciseCounter] = None
+    ) -> Tuple[Optional[float], Optional[List], np.ndarray]:
+        """
+        Count an exercise from COCO-17 keypoints (from RTMPose or sent by the client).
+
+        Returns:
+            Tuple of (current_angle, angle_point, keypoints)
+        """
+        # Filter low confidence keypoints
+        if scores is not None:
+            valid_mask = scores > self.conf_threshold
+            keypoints[~valid_mask] = [0, 0]  # Set low confidence points to (0,0)
+
+        # Get corresponding angle and joint points based on exercise type
+        current_angle, angle_point = self.get_exercise_angle(
+            keypoints, exercise_type, exercise_counter
+        )
+        return current_angle, angle_point, keypoints
+
     def get_exercise_angle(
         self,
         keypoints: np.ndarray,
-        exercise_type: str
+        exercise_type: str,
+        exercise_counter: Optional[ExerciseCounter] = None
     ) -> Tuple[Optional[float], Optional[List]]:
         """Get angle based on exercise type"""
+        counter = exercise_counter or self.exercise_counter
+        rule = counter.rules.get(exercise_type)
+        if rule is None:
+            return None, None
+
         current_angle = None
         angle_point = None
-
         try:
-            # Get the counting method based on exercise type
-            count_method_map = {
-                "squat": self.exercise_counter.count_squat,
-                "pushup": self.exercise_counter.count_pushup,
-                "situp": self.exercise_counter.count_situp,
-                "bicep_curl": self.exercise_counter.count_bicep_curl,
-                "lateral_raise": self.exercise_counter.count_lateral_raise,
-                "overhead_press": self.exercise_counter.count_overhead_press,
-                "leg_raise": self.exercise_counter.count_leg_raise,
-                "knee_raise": self.exercise_counter.count_knee_raise,
-                "knee_press": self.exercise_counter.count_knee_press,
-                "crunch": self.exercise_counter.count_crunch
-            }
+            current_angle = counter.count_rule(keypoints, rule)
 
-            # Get counting method
-            count_method = count_method_map.get(exercise_type)
-            if count_method:
-                current_angle = count_method(keypoints)
-
-                # Get angle_point from config
-                if current_angle is not None and exercise_type in self.exercise_configs:
-                    angle_point_indices = self.exercise_configs[exercise_type].get('angle_point', [])
-                    if len(angle_point_indices) == 3:
-                        angle_point = [
-                            keypoints[angle_point_indices[0]].tolist(),
-                            keypoints[angle_point_indices[1]].tolist(),
-                            keypoints[angle_point_indices[2]].tolist()
-                        ]
+            # Joint points drawn by the client
+            if current_angle is not None and rule.angle_point is not None:
+                angle_point = keypoints[list(rule.angle_point)].tolist()
         except Exception as e:
             print(f"✗ Error calculating exercise angle: {e}")
 
@@ -243,20 +463,27 @@ _rtmpose_processor_instance: Optional[RTMPoseProcessor] = None
 def get_rtmpose_processor(
     models_dir: str,
     exercises_config_path: str,
-    mode: str = 'balanced'
+    mode: str = 'balanced',
+    load_models: bool = True,
+    session_config: Optional[OrtSessionConfig] = None,
+    precision: str = 'fp32',
+    catalog: Optional[ExerciseCatalog] = None
 ) -> RTMPoseProcessor:
     """Get or create RTMPose processor singleton"""
     global _rtmpose_processor_instance
 
     if _rtmpose_processor_instance is None:
-        # Create exercise counter first
-        exercise_counter = ExerciseCounter(exercises_config_path)
+        # Create exercise counter first (sessions clone it and share its catalog)
+        exercise_counter = ExerciseCounter(exercises_config_path, catalog=catalog)
 
         # Create RTMPose processor
         _rtmpose_processor_instance = RTMPoseProcessor(
             exercise_counter=exercise_counter,
             models_dir=models_dir,
-            mode=mode
+            mode=mode,
+            load_models=load_models,
+            session_config=session_config,
+            precision=precision
         )
 
     return _rtmpose_processor_instance
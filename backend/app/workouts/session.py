@@ -0,0 +1,215 @@
+"""
+Per-connection pose sessions on top of the shared RTMPose processor.
+The ONNX models are loaded once; every client gets its own counting state.
+"""
+import time
+import uuid
+import numpy as np
+from typing import Optional, Tuple, List, Dict, Any, Union
+from .adaptive import AdaptiveModeController, NodeLoadMonitor
+from .exercise_counter import ExerciseCounter
+from .frames import decode_base64_bytes, decode_image_bytes_scaled
+from .keypoint_mapping import to_coco17
+from .metrics import NULL_TIMER, StageTimer
+from .protocol import CompactResponseEncoder
+from .rate_control import FrameRateAdvisor
+from .rtmpose_processor import RTMPoseProcessor
+from .tracking import PoseTracker
+
+
+class PoseSession:
+    """Counting state of a single client connection"""
+
+    def __init__(self, processor: RTMPoseProcessor, session_id: Optional[str] = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.processor = processor
+        self.exercise_counter: ExerciseCounter = processor.create_exercise_counter()
+        self.started_at = time.time()
+        self.frames_processed = 0
+        self.dropped_frames = 0
+        self.protocol = 'json'
+        self.send_keypoints = True
+        self.response_encoder: Optional[CompactResponseEncoder] = None
+        self.tracker: Optional[PoseTracker] = None
+        self.mode_controller: Optional[AdaptiveModeController] = None
+        self.rate_advisor: Optional[FrameRateAdvisor] = None
+        self.last_mode: Optional[str] = None
+        self.decode_max_size: Optional[int] = None   # Reduced JPEG decode target (None = full decode)
+        self.resume_token: Optional[str] = None      # Client token the state is persisted under
+        self.debug_timings = False                   # Attach per-stage timings to responses
+        self.roi_frame_size: Optional[Tuple[int, int]] = None    # Full camera frame (w, h) in ROI mode
+
+    @property
+    def mode(self) -> str:
+        """Pose model mode for this session's next frame"""
+        if self.mode_controller is not None:
+            return self.mode_controller.mode
+        return self.processor.mode
+
+    def process_frame(
+        self,
+        frame: np.ndarray,
+        exercise_type: str,
+        input_scale: float = 1.0,
+        timer: StageTimer = NULL_TIMER,
+        crop_origin: Optional[Tuple[float, float]] = None
+    ) -> Tuple[Optional[float], Optional[List], Optional[np.ndarray]]:
+        """Run the shared model on a frame (or an ROI crop at crop_origin) and update this session's counter"""
+        if crop_origin is not None and self.roi_frame_size is None:
+            raise ValueError("ROI frames require ROI mode")
+        mode = self.processor.resolve_mode(self.mode)
+        started = time.perf_counter()
+        result = self.processor.process_frame(
+            frame, exercise_type, self.exercise_counter, self.tracker, mode, input_scale, timer,
+            crop_origin, self.roi_frame_size
+        )
+        if self.mode_controller is not None:
+            self.mode_controller.record((time.perf_counter() - started) * 1000)
+        self.last_mode = mode
+        self.frames_processed += 1
+        return result
+
+    def configure_adaptive(
+        self,
+        monitor: Optional[NodeLoadMonitor],
+        fallback_mode: str = 'lightweight',
+        latency_budget_ms: float = 150.0
+    ):
+        """Switch to the fallback model under node load or over budget (monitor None disables)"""
+        if monitor is None:
+            self.mode_controller = None
+        elif self.mode_controller is None:
+            self.mode_controller = AdaptiveModeController(
+                monitor,
+                preferred_mode=self.processor.mode,
+                fallback_mode=fallback_mode,
+                latency_budget_ms=latency_budget_ms
+            )
+        else:
+            self.mode_controller.latency_budget_ms = latency_budget_ms
+
+    def configure_rate_control(
+        self,
+        enabled: bool,
+        min_fps: float = 5.0,
+        max_fps: float = 30.0,
+        latency_budget_ms: float = 250.0
+    ):
+        """Enable or disable server-recommended client frame rate and size"""
+        if not enabled:
+            self.rate_advisor = None
+        elif self.rate_advisor is None:
+            self.rate_advisor = FrameRateAdvisor(
+                min_fps=min_fps,
+                max_fps=max_fps,
+                latency_budget_ms=latency_budget_ms
+            )
+        else:
+            self.rate_advisor.latency_budget_ms = latency_budget_ms
+
+    def configure_roi(self, frame_size: Optional[Tuple[int, int]], detect_interval: int = 10):
+        """Accept ROI crops of a camera frame of frame_size (w, h); None disables"""
+        self.roi_frame_size = tuple(frame_size) if frame_size is not None else None
+        if frame_size is not None and self.tracker is None:
+            self.configure_tracking(True, detect_interval)
+
+    def tracked_roi(self) -> Optional[List[int]]:
+        """Tracked person box [x1, y1, x2, y2] in camera frame pixels, None while not tracked"""
+        if self.tracker is None or self.tracker.bbox is None:
+            return None
+        x1, y1, x2, y2 = self.tracker.bbox
+        return [int(x1), int(y1), int(np.ceil(x2)), int(np.ceil(y2))]
+
+    def configure_tracking(self, enabled: bool, detect_interval: int = 10):
+        """Enable detector skipping (run detection every `detect_interval` frames) or disable it"""
+        if not enabled:
+            self.tracker = None
+        elif self.tracker is None:
+            self.tracker = PoseTracker(
+                detect_interval=detect_interval,
+                conf_threshold=self.processor.conf_threshold
+            )
+        else:
+            self.tracker.detect_interval = detect_interval
+
+    def process_encoded_frame(
+        self,
+        frame_data: Union[str, bytes, memoryview],
+        exercise_type: str,
+        timer: StageTimer = NULL_TIMER,
+        crop_origin: Optional[Tuple[float, float]] = None
+    ) -> Tuple[Optional[float], Optional[List], Optional[np.ndarray]]:
+        """Decode a base64 or raw encoded frame and process it (blocking, run off the event loop)"""
+        if isinstance(frame_data, str):
+            frame_data = decode_base64_bytes(frame_data)
+            timer.mark('b64decode')
+        frame, input_scale = decode_image_bytes_scaled(frame_data, self.decode_max_size)
+        timer.mark('imdecode')
+        return self.process_frame(frame, exercise_type, input_scale, timer, crop_origin)
+
+    def process_keypoints(
+        self,
+        keypoints: np.ndarray,
+        scores: Optional[np.ndarray],
+        exercise_type: str,
+        timer: StageTimer = NULL_TIMER
+    ) -> Tuple[Optional[float], Optional[List], np.ndarray]:
+        """Count from client-side keypoints (COCO-17 or BlazePose-33), skipping decode and ONNX"""
+        coco_keypoints, coco_scores = to_coco17(keypoints, scores)
+        result = self.processor.process_keypoints(
+            coco_keypoints, coco_scores, exercise_type, self.exercise_counter
+        )
+        timer.mark('count')
+        self.frames_processed += 1
+        return result
+
+    def get_state(self) -> Dict[str, Any]:
+        """Current counting state for responses"""
+        return {
+            "reps": self.exercise_counter.get_counter(),
+            "stage": self.exercise_counter.get_stage(),
+            "form_corrections": self.exercise_counter.get_form_corrections()
+        }
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Serializable state needed to resume this session on another connection or worker"""
+        return {
+            "counter": self.exercise_counter.get_snapshot(),
+            "frames_processed": self.frames_processed,
+            "saved_at": time.time()
+        }
+
+    def restore_snapshot(self, snapshot: Dict[str, Any]):
+        """Resume from get_snapshot() output"""
+        self.exercise_counter.restore_snapshot(snapshot["counter"])
+        self.frames_processed = int(snapshot.get("frames_processed", 0))
+
+    def reset(self):
+        """Reset this session's counter only"""
+        self.exercise_counter.reset_counter()
+        if self.tracker is not None:
+            self.tracker.reset()
+
+
+class SessionRegistry:
+    """Registry of active pose sessions"""
+
+    def __init__(self):
+        self._sessions: Dict[str, PoseSession] = {}
+
+    def open(self, processor: RTMPoseProcessor) -> PoseSession:
+        """Create and register a new session"""
+        session = PoseSession(processor)
+        self._sessions[session.session_id] = session
+        return session
+
+    def close(self, session_id: str) -> Optional[PoseSession]:
+        """Unregister a session"""
+        return self._sessions.pop(session_id, None)
+
+    def get(self, session_id: str) -> Optional[PoseSession]:
+        """Get an active session by id"""
+        return self._sessions.get(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
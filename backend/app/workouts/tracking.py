@@ -0,0 +1,129 @@
+"""
+Keypoint-based person tracking used to skip the YOLOX detector.
+
+Between detector runs the next pose crop is built from the previous frame's
+keypoint bounding box plus a margin; the athlete barely moves between frames.
+Tracked boxes live in the client's full-frame coordinates, so they stay valid
+when frames arrive downscaled or as ROI crops of the camera image.
+"""
+import numpy as np
+from typing import Optional, List, Dict, Any, NamedTuple, Tuple
+
+
+def keypoints_bbox(
+    keypoints: np.ndarray,
+    scores: np.ndarray,
+    frame_shape: tuple,
+    conf_threshold: float = 0.5,
+    margin: float = 0.15
+) -> Optional[List[float]]:
+    """Bounding box (x1, y1, x2, y2) of confident keypoints, grown by a margin and clipped to the frame"""
+    valid = scores > conf_threshold
+    if np.count_nonzero(valid) < 2:
+        return None
+
+    points = keypoints[valid]
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+
+    pad_x = (x2 - x1) * margin
+    pad_y = (y2 - y1) * margin
+    h, w = frame_shape[:2]
+
+    bbox = [
+        max(0.0, float(x1 - pad_x)),
+        max(0.0, float(y1 - pad_y)),
+        min(float(w), float(x2 + pad_x)),
+        min(float(h), float(y2 + pad_y))
+    ]
+    if bbox[2] - bbox[0] < 1 or bbox[3] - bbox[1] < 1:
+        return None
+    return bbox
+
+
+class FrameGeometry(NamedTuple):
+    """Where a processed frame lies in the client's full camera frame"""
+    scale: float                    # Processed pixels per client pixel
+    origin: Tuple[float, float]     # Client coordinates of the frame's top-left corner
+    client_shape: Tuple[float, float]   # (height, width) of the full client frame
+    cropped: bool = False           # ROI crop sent by the client
+
+    @classmethod
+    def full_frame(cls, frame_shape: tuple, scale: float = 1.0) -> 'FrameGeometry':
+        return cls(scale, (0.0, 0.0), (frame_shape[0] / scale, frame_shape[1] / scale))
+
+    def to_client(self, keypoints: np.ndarray) -> np.ndarray:
+        """Frame keypoints (..., 2) in client coordinates"""
+        return keypoints / self.scale + np.asarray(self.origin)
+
+    def to_frame_box(self, bbox: List[float], frame_shape: tuple) -> Optional[List[float]]:
+        """Client box in frame coordinates, clipped; None if it misses the frame"""
+        x, y = self.origin
+        h, w = frame_shape[:2]
+        x1, y1, x2, y2 = ((bbox[0] - x) * self.scale, (bbox[1] - y) * self.scale,
+                          (bbox[2] - x) * self.scale, (bbox[3] - y) * self.scale)
+        box = [max(0.0, x1), max(0.0, y1), min(float(w), x2), min(float(h), y2)]
+        if box[2] - box[0] < 1 or box[3] - box[1] < 1:
+            return None
+        return box
+
+
+class PoseTracker:
+    """Per-session state deciding when the detector has to run"""
+
+    def __init__(
+        self,
+        detect_interval: int = 10,
+        min_confidence: float = 0.5,
+        bbox_margin: float = 0.15,
+        conf_threshold: float = 0.5
+    ):
+        self.detect_interval = detect_interval
+        self.min_confidence = min_confidence
+        self.bbox_margin = bbox_margin
+        self.conf_threshold = conf_threshold
+
+        self.bbox: Optional[List[float]] = None
+        self.frames_since_detection = 0
+        self.detections_run = 0
+        self.frames_tracked = 0
+
+    def tracked_bboxes(self, ignore_interval: bool = False) -> Optional[List[List[float]]]:
+        """Box to use instead of running the detector, or None if detection is due"""
+        if self.bbox is None:
+            return None
+        if self.frames_since_detection >= self.detect_interval and not ignore_interval:
+            return None
+        self.frames_since_detection += 1
+        self.frames_tracked += 1
+        return [self.bbox]
+
+    def mark_detection(self):
+        """Record that the detector ran on this frame"""
+        self.frames_since_detection = 0
+        self.detections_run += 1
+
+    def update(self, keypoints: Optional[np.ndarray], scores: Optional[np.ndarray], frame_shape: tuple):
+        """Derive the next crop from this frame's pose; lose the track on low confidence"""
+        if keypoints is None or scores is None or float(np.mean(scores)) < self.min_confidence:
+            self.bbox = None
+            return
+
+        self.bbox = keypoints_bbox(
+            keypoints, scores, frame_shape,
+            conf_threshold=self.conf_threshold,
+            margin=self.bbox_margin
+        )
+
+    def reset(self):
+        """Force detection on the next frame"""
+        self.bbox = None
+        self.frames_since_detection = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tracking statistics"""
+        return {
+            "detect_interval": self.detect_interval,
+            "detections_run": self.detections_run,
+            "frames_tracked": self.frames_tracked
+        }
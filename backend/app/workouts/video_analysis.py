@@ -0,0 +1,225 @@
+"""
+Offline analysis of uploaded workout videos.
+
+The video is split into time chunks that worker processes decode and run pose
+estimation on in parallel. Each worker starts decoding a little before its
+chunk, since seeks land inexactly with some codecs, and runs the pose models
+only on frames inside it.
+The per-frame keypoints are merged in frame order, their joint angles are
+computed for the whole video in one vectorized pass, and a single counter
+steps through them on video time, so rep state carries across chunk
+boundaries exactly as it would in a live stream.
+"""
+import cv2
+import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .exercise_counter import ExerciseCounter
+from .rtmpose_processor import RTMPoseProcessor
+
+# (frame index, keypoints or None, scores or None)
+FramePose = Tuple[int, Optional[np.ndarray], Optional[np.ndarray]]
+
+# Repeated form corrections are reported at most this often (seconds)
+CORRECTION_REPEAT_INTERVAL = 2.0
+
+# Pose model of a worker process
+_worker_processor: Optional[RTMPoseProcessor] = None
+
+
+class VideoAnalysisError(ValueError):
+    """Raised when an uploaded video cannot be analyzed"""
+
+
+def _init_worker(models_dir: str, mode: str, session_config=None, precision: str = 'fp32'):
+    """Load the models once per worker process"""
+    global _worker_processor
+    _worker_processor = RTMPoseProcessor(
+        exercise_counter=ExerciseCounter(exercise_configs={}),
+        models_dir=models_dir,
+        mode=mode,
+        session_config=session_config,
+        precision=precision
+    )
+
+
+def create_video_pool(
+    workers: int,
+    models_dir: str,
+    mode: str = 'balanced',
+    session_config=None,
+    precision: str = 'fp32'
+) -> ProcessPoolExecutor:
+    """Process pool whose workers each hold their own detector and pose model"""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(models_dir, mode, session_config, precision)
+    )
+
+
+def probe_video(path: str) -> Tuple[float, int]:
+    """Frame rate and frame count of a video file"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise VideoAnalysisError("Cannot open video")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+    if not fps or fps <= 0 or frame_count <= 0:
+        raise VideoAnalysisError("Video has no readable frames")
+    return fps, frame_count
+
+
+def plan_chunks(frame_count: int, fps: float, chunk_seconds: float) -> List[Tuple[int, int]]:
+    """[start, end) frame ranges of about chunk_seconds each"""
+    chunk_frames = max(1, int(round(chunk_seconds * fps)))
+    return [(start, min(start + chunk_frames, frame_count)) for start in range(0, frame_count, chunk_frames)]
+
+
+def process_chunk(
+    path: str,
+    start: int,
+    end: int,
+    overlap: int,
+    stride: int = 1
+) -> List[FramePose]:
+    """Pose of every `stride`-th frame in [start, end), decoded from `overlap` frames earlier (worker process)"""
+    processor = _worker_processor
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise VideoAnalysisError("Cannot open video")
+
+    results: List[FramePose] = []
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, max(0, start - overlap))
+        index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+        while index < end:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            current, index = index, index + 1
+            if current < start or current % stride:
+                continue
+
+            frame, scale_factor = processor.prepare_frame(frame)
+            keypoints, scores = processor.estimate_pose(frame)
+            if len(keypoints) > 0:
+                results.append((current, keypoints[0] / scale_factor, scores[0]))
+            else:
+                results.append((current, None, None))
+    finally:
+        cap.release()
+
+    return results
+
+
+def merge_chunks(chunks: Iterable[List[FramePose]]) -> List[FramePose]:
+    """Frames of all chunks in order, dropping frames that two chunks both returned"""
+    frames: Dict[int, FramePose] = {}
+    for chunk in chunks:
+        for frame in chunk:
+            frames.setdefault(frame[0], frame)
+    return [frames[index] for index in sorted(frames)]
+
+
+def count_timeline(
+    processor: RTMPoseProcessor,
+    frames: List[FramePose],
+    exercise_type: str,
+    fps: float
+) -> Dict[str, Any]:
+    """Count merged frames on video time and build the rep timeline"""
+    counter = processor.create_exercise_counter()
+    video_time = 0.0
+    counter.clock = lambda: video_time
+    if exercise_type not in counter.rules:
+        raise VideoAnalysisError(f"Unknown exercise: {exercise_type}")
+
+    # Left/right angles of every detected frame at once; low confidence points are blanked as in streaming
+    detected_frames = [(index, keypoints, scores) for index, keypoints, scores in frames if keypoints is not None]
+    side_angles = np.empty((0, 2))
+    if detected_frames:
+        keypoints = np.stack([np.asarray(k, dtype=np.float64) for _, k, _ in detected_frames])
+        scores = np.stack([np.asarray(s) for _, _, s in detected_frames])
+        keypoints[scores <= processor.conf_threshold] = 0
+        side_angles = counter.angle_table.exercise_angles(keypoints, exercise_type)
+
+    reps: List[Dict[str, Any]] = []
+    angle_times: List[float] = []
+    angles: List[float] = []
+    corrections: List[Dict[str, Any]] = []
+    last_reported: Dict[str, float] = {}
+
+    for (index, _, _), (left_angle, right_angle) in zip(detected_frames, side_angles):
+        video_time = index / fps
+        angle = counter.count_angles(left_angle, right_angle, exercise_type)
+        if angle is not None:
+            angle_times.append(round(video_time, 3))
+            angles.append(round(float(angle), 1))
+
+        while len(reps) < counter.get_counter():
+            reps.append({"rep": len(reps) + 1, "time": round(video_time, 3)})
+
+        for message in counter.get_form_corrections():
+            if video_time - last_reported.get(message, -CORRECTION_REPEAT_INTERVAL) >= CORRECTION_REPEAT_INTERVAL:
+                corrections.append({"time": round(video_time, 3), "message": message})
+                last_reported[message] = video_time
+
+    return {
+        "reps": counter.get_counter(),
+        "rep_timeline": reps,
+        "angles": {"time": angle_times, "angle": angles},
+        "form_corrections": corrections,
+        "frames_analyzed": len(frames),
+        "frames_detected": len(detected_frames)
+    }
+
+
+def analyze_video(
+    path: str,
+    exercise_type: str,
+    processor: RTMPoseProcessor,
+    pool: Executor,
+    chunk_seconds: float = 10.0,
+    overlap_seconds: float = 0.5,
+    sample_fps: float = 0.0
+) -> Dict[str, Any]:
+    """
+    Count an exercise over a whole video file.
+
+    Args:
+        path: Local video file
+        exercise_type: Exercise identifier from exercises.json
+        processor: Provides the counting configuration (its models are not used)
+        pool: Executor from create_video_pool
+        chunk_seconds: Video time per worker task
+        overlap_seconds: Video decoded (but not analyzed) before each chunk
+        sample_fps: Analyze at most this many frames per second (0 = every frame)
+
+    Returns:
+        Rep count, rep timeline, angle series and form corrections
+    """
+    fps, frame_count = probe_video(path)
+    stride = max(1, int(round(fps / sample_fps))) if sample_fps > 0 else 1
+    overlap = int(round(overlap_seconds * fps))
+
+    futures = [
+        pool.submit(process_chunk, path, start, end, overlap, stride)
+        for start, end in plan_chunks(frame_count, fps, chunk_seconds)
+    ]
+    frames = merge_chunks(future.result() for future in futures)
+
+    result = count_timeline(processor, frames, exercise_type, fps)
+    result.update({
+        "exercise": exercise_type,
+        "duration": round(frame_count / fps, 3),
+        "fps": round(fps, 2),
+        "chunks": len(futures)
+    })
+    return result
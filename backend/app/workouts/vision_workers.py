@@ -0,0 +1,322 @@
+"""
+Multi-process vision worker tier.
+
+The API process writes decoded frames into a shared-memory ring buffer and
+sends only a small job tuple (slot, shape, boxes) to pre-started worker
+processes. Each worker holds its own ONNX sessions, runs detection + pose on
+the frame in place and returns keypoints/scores, so image arrays are never
+pickled and pre/post-processing scales past one core's GIL.
+
+A slot belongs to a job until its result arrives or its caller stops waiting
+(timeout); a stale result for an abandoned job is dropped. Each worker answers
+on its own pipe, so a worker that dies mid-send cannot wedge the others, and
+the pipe closing tells the pool at once. Dead workers are replaced, and the
+jobs in flight at that moment fail immediately instead of waiting out their
+timeout.
+"""
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_for_connections
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+FRAME_CHANNELS = 3
+
+
+def _slot_frame(buffer, slot_bytes: int, slot: int, height: int, width: int) -> np.ndarray:
+    """Contiguous (H, W, 3) uint8 view of one ring slot"""
+    return np.ndarray(
+        (height, width, FRAME_CHANNELS),
+        dtype=np.uint8,
+        buffer=buffer,
+        offset=slot * slot_bytes
+    )
+
+
+def _worker_main(
+    shm_name: str,
+    slot_bytes: int,
+    tasks,
+    results,
+    models_dir: str,
+    mode: str,
+    backend: str,
+    device: str,
+    session_config=None,
+    precision: str = 'fp32',
+    extra_modes=(),
+    estimator_factory: Optional[Callable[[], Any]] = None
+):
+    """Worker process: load models once, then serve jobs until a None sentinel"""
+    # Spawned workers share the parent's resource tracker, which unlinks the segment
+    shm = shared_memory.SharedMemory(name=shm_name)
+
+    try:
+        if estimator_factory is not None:
+            processor = estimator_factory()
+        else:
+            # Imported here so the parent can start workers without loading rtmlib twice
+            from .exercise_counter import ExerciseCounter
+            from .rtmpose_processor import RTMPoseProcessor
+
+            processor = RTMPoseProcessor(
+                exercise_counter=ExerciseCounter(exercise_configs={}),
+                models_dir=models_dir,
+                mode=mode,
+                backend=backend,
+                device=device,
+                session_config=session_config,
+                precision=precision
+            )
+            processor.load_pose_modes(extra_modes)
+        modes = sorted(getattr(processor, 'pose_models', {}))
+        results.send(('ready', processor.warm_up(), modes, None))
+    except Exception as e:
+        results.send(('ready', None, None, f"Worker initialization failed: {e}"))
+        shm.close()
+        return
+
+    while True:
+        job = tasks.get()
+        if job is None:
+            break
+
+        job_id, slot, height, width, bboxes, pose_mode = job
+        try:
+            frame = _slot_frame(shm.buf, slot_bytes, slot, height, width)
+            keypoints, scores = processor.estimate_pose(frame, bboxes, pose_mode)
+            results.send((job_id, np.asarray(keypoints), np.asarray(scores), None))
+        except Exception as e:
+            results.send((job_id, None, None, str(e)))
+
+    shm.close()
+
+
+class VisionWorkerPool:
+    """Pool of inference processes fed through a shared-memory frame ring"""
+
+    def __init__(
+        self,
+        models_dir: str,
+        mode: str = 'balanced',
+        workers: int = 2,
+        slots: Optional[int] = None,
+        max_frame_size: int = 640,
+        backend: str = 'onnxruntime',
+        device: str = 'cpu',
+        timeout: float = 10.0,
+        session_config=None,
+        precision: str = 'fp32',
+        extra_modes=(),
+        health_interval: float = 1.0,
+        estimator_factory: Optional[Callable[[], Any]] = None
+    ):
+        self.workers = workers
+        self.slots = slots or workers * 2
+        self.max_frame_size = max_frame_size
+        self.slot_bytes = max_frame_size * max_frame_size * FRAME_CHANNELS
+        self.timeout = timeout
+        self.health_interval = health_interval     # Seconds between worker liveness checks
+
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(self.slots):
+            self._free_slots.put(slot)
+
+        ctx = mp.get_context('spawn')
+        self._tasks = ctx.Queue()
+        self._pending: Dict[int, Tuple[Future, int]] = {}
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self.frames_processed = 0
+        self.respawned_workers = 0
+        self.warm_stats: List[Dict[str, Any]] = []    # Per-worker model warm-up latency
+        self.modes: List[str] = []                      # Pose model modes the workers loaded
+        self._closing = False
+        self._respawn = True        # Off once a replacement worker fails to start
+
+        self._ctx = ctx
+        self._worker_config = (
+            models_dir, mode, backend, device, session_config, precision,
+            tuple(extra_modes), estimator_factory
+        )
+        self._readers: List[Any] = [None] * workers     # Result pipe per worker, None once closed
+        self._retired = set()                           # Dead workers that are not replaced
+        self._processes = [self._start_worker(i) for i in range(workers)]
+
+        self._collector: Optional[threading.Thread] = None
+        self._wait_until_ready()
+
+        self._collector = threading.Thread(target=self._collect_results, name="vision-results", daemon=True)
+        self._collector.start()
+
+    def _start_worker(self, index: int):
+        reader, writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._shm.name, self.slot_bytes, self._tasks, writer) + self._worker_config,
+            name=f"vision-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        # Only the worker keeps the write end, so its exit closes the pipe
+        writer.close()
+        self._readers[index] = reader
+        return process
+
+    def _wait_until_ready(self):
+        """Block until every worker has loaded and warmed up its models"""
+        for reader in self._readers:
+            try:
+                tag, warm_stats, modes, error = reader.recv()
+            except EOFError:
+                error = "Vision worker exited during initialization"
+            if error:
+                self.close()
+                raise RuntimeError(error)
+            self.warm_stats.append(warm_stats)
+            self.modes = modes
+
+    def _collect_results(self):
+        """Resolve callers' futures and free ring slots as results arrive"""
+        next_check = time.monotonic() + self.health_interval
+        while not self._closing:
+            readers = [reader for reader in self._readers if reader is not None]
+            for reader in wait_for_connections(readers, timeout=self.health_interval):
+                try:
+                    self._handle_result(*reader.recv())
+                except (EOFError, OSError):
+                    # The worker exited; replace it right away
+                    self._readers[self._readers.index(reader)] = None
+                    next_check = 0.0
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + self.health_interval
+
+    def _handle_result(self, job_id, keypoints, scores, error):
+        if job_id == 'ready':
+            # A replacement worker finished (or failed) loading its models
+            if error:
+                print(f"✗ {error}; not respawning vision workers")
+                self._respawn = False
+            return
+
+        with self._lock:
+            future, slot = self._pending.pop(job_id, (None, None))
+        if slot is not None:
+            self._free_slots.put(slot)
+        if future is None:
+            return
+
+        if error:
+            future.set_exception(RuntimeError(f"Vision worker error: {error}"))
+        else:
+            self.frames_processed += 1
+            future.set_result((keypoints, scores))
+
+    def _check_workers(self):
+        """Replace dead workers and fail the jobs that were in flight when they died"""
+        dead = [
+            i for i, process in enumerate(self._processes)
+            if i not in self._retired and (self._readers[i] is None or not process.is_alive())
+        ]
+        if not dead or self._closing:
+            return
+
+        # Any in-flight job may have been the dead worker's, and its result will never come
+        with self._lock:
+            orphaned = list(self._pending.values())
+            self._pending.clear()
+        for future, slot in orphaned:
+            self._free_slots.put(slot)
+            future.set_exception(RuntimeError("Vision worker died while processing the frame"))
+
+        for i in dead:
+            # The pipe can close a moment before the exit status is available
+            self._processes[i].join(timeout=1)
+            if self._readers[i] is not None:
+                self._readers[i].close()
+                self._readers[i] = None
+            print(f"⚠ Vision worker {i} exited with code {self._processes[i].exitcode}")
+            if self._respawn:
+                self._processes[i] = self._start_worker(i)
+                self.respawned_workers += 1
+            else:
+                self._retired.add(i)
+
+    def _abandon(self, job_id: int):
+        """Free the slot of a job whose caller stopped waiting (its late result is dropped)"""
+        with self._lock:
+            _, slot = self._pending.pop(job_id, (None, None))
+        if slot is not None:
+            self._free_slots.put(slot)
+
+    def __call__(
+        self,
+        frame: np.ndarray,
+        bboxes: Optional[List] = None,
+        mode: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Run detection (unless boxes are given) and pose on a worker; blocks until done"""
+        height, width = frame.shape[:2]
+        if height > self.max_frame_size or width > self.max_frame_size:
+            raise ValueError(f"Frame {width}x{height} exceeds the ring slot size {self.max_frame_size}")
+        if len(self._retired) == len(self._processes):
+            raise RuntimeError("No vision worker is running")
+
+        # Waiting for a free slot is the pool's backpressure
+        slot = self._free_slots.get(timeout=self.timeout)
+        try:
+            _slot_frame(self._shm.buf, self.slot_bytes, slot, height, width)[:] = frame
+            bbox_list = [list(map(float, bbox)) for bbox in bboxes] if bboxes is not None else None
+        except BaseException:
+            self._free_slots.put(slot)
+            raise
+
+        future: Future = Future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._pending[job_id] = (future, slot)
+
+        try:
+            self._tasks.put((job_id, slot, height, width, bbox_list, mode))
+            return future.result(timeout=self.timeout)
+        except BaseException:
+            # Timed out or interrupted: the slot must not wait for a result that may never come
+            self._abandon(job_id)
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool load for health/metrics reporting"""
+        return {
+            "workers": self.workers,
+            "alive_workers": sum(process.is_alive() for process in self._processes),
+            "slots": self.slots,
+            "free_slots": self._free_slots.qsize(),
+            "frames_processed": self.frames_processed,
+            "respawned_workers": self.respawned_workers
+        }
+
+    def close(self):
+        """Stop workers and release the shared memory ring"""
+        self._closing = True
+        for process in self._processes:
+            if process.is_alive():
+                self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        if self._collector is not None:
+            self._collector.join(timeout=self.health_interval + 1)
+        for reader in self._readers:
+            if reader is not None:
+                reader.close()
+        self._shm.close()
+        self._shm.unlink()
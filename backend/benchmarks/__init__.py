@@ -0,0 +1,4 @@
+"""
+Performance benchmarks for the vision pipeline.
+Run from the backend directory, e.g. `python -m benchmarks.pose_batching --help`.
+"""
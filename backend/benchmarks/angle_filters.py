@@ -0,0 +1,208 @@
+"""
+Streaming angle filters against the original median/2-sigma window filter.
+
+Angle traces (left/right joint angle per frame) come from recorded clips run
+through the pose model, from trace files written earlier with --save-traces,
+or from --synthetic noisy traces with known ground truth. Every trace is
+replayed through an ExerciseCounter with each filter and the report shows
+update cost, rep counts, error against the ground truth (synthetic) or the
+window filter (recorded), lag and residual jitter.
+
+    python -m benchmarks.angle_filters clips/ --save-traces traces.json
+    python -m benchmarks.angle_filters traces.json --filter one_euro:min_cutoff=0.5,beta=0.02
+    python -m benchmarks.angle_filters --synthetic 20
+"""
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from typing import Any, Dict, List
+from benchmarks.common import EXERCISES_CONFIG, build_processor, clip_exercise, find_clips, iter_video_frames
+from app.workouts import ExerciseCounter
+from app.workouts.angle_filters import ANGLE_FILTERS, create_angle_filter
+
+DEFAULT_FILTERS = ['window', 'median', 'ema', 'one_euro']
+MAX_LAG_FRAMES = 15
+
+
+def parse_filter(text: str) -> Dict[str, Any]:
+    """`one_euro:min_cutoff=0.5,beta=0.02` -> {"type": "one_euro", "min_cutoff": 0.5, "beta": 0.02}"""
+    name, _, params = text.partition(':')
+    if name not in ANGLE_FILTERS:
+        raise ValueError(f"unknown filter: {name}")
+    spec: Dict[str, Any] = {"type": name}
+    for item in filter(None, params.split(',')):
+        key, _, value = item.partition('=')
+        spec[key] = int(value) if value.isdigit() else float(value)
+    return spec
+
+
+def clip_trace(processor, path: str, exercise_type: str, max_frames: int = None) -> Dict[str, Any]:
+    """Unsmoothed left/right angles of a clip, as the counter would see them"""
+    table = processor.exercise_counter.angle_table
+    angles = []
+    for frame in iter_video_frames(path, max_frames):
+        frame, scale_factor = processor.prepare_frame(frame)
+        keypoints, scores = processor.estimate_pose(frame)
+        if len(keypoints) == 0:
+            angles.append([None, None])
+            continue
+        points = np.array(keypoints[0] / scale_factor, dtype=np.float64)
+        points[scores[0] <= processor.conf_threshold] = 0
+        angles.append([None if np.isnan(a) else round(float(a), 2) for a in table.exercise_angles(points, exercise_type)])
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return {"name": path, "exercise": exercise_type, "fps": fps, "angles": angles}
+
+
+def synthetic_trace(seed: int, fps: float = 30.0, seconds: float = 30.0) -> Dict[str, Any]:
+    """Squat-like trace: 2-3 s reps between 165 and 80 degrees, sensor noise, spikes and dropouts"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * fps)) / fps
+    period = rng.uniform(2.0, 3.0)
+    truth = 122.5 + 42.5 * np.cos(2 * np.pi * t / period)
+
+    sides = truth[:, None] + rng.normal(0, 4.0, (len(t), 2))
+    spikes = rng.random(len(t)) < 0.02
+    sides[spikes] += rng.choice([-40.0, 40.0], (spikes.sum(), 1))
+    sides[rng.random(len(t)) < 0.01] = np.nan
+
+    return {
+        "name": f"synthetic-{seed}",
+        "exercise": "squat",
+        "fps": fps,
+        "angles": [[None if np.isnan(a) else float(a) for a in row] for row in sides],
+        "truth": truth.tolist()
+    }
+
+
+def run_filter(configs: Dict[str, Any], spec: Dict[str, Any], trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Replay one trace through a counter using the given filter"""
+    exercise_type = trace["exercise"]
+    configs = dict(configs)
+    configs[exercise_type] = dict(configs[exercise_type], smoothing=spec)
+    counter = ExerciseCounter(exercise_configs=configs)
+
+    fps = trace["fps"]
+    now = 0.0
+    counter.clock = lambda: now
+    output = np.full(len(trace["angles"]), np.nan)
+    for i, (left, right) in enumerate(trace["angles"]):
+        now = i / fps
+        if left is None or right is None:
+            continue
+        angle = counter.count_angles(left, right, exercise_type)
+        if angle is not None:
+            output[i] = angle
+
+    # Filter update cost alone, on the same input
+    raw = [(l + r) / 2 for l, r in trace["angles"] if l is not None and r is not None]
+    angle_filter = create_angle_filter(spec)
+    started = time.perf_counter()
+    for i, value in enumerate(raw):
+        angle_filter.update(value, i / fps)
+    update_us = (time.perf_counter() - started) * 1e6 / max(len(raw), 1)
+
+    return {"output": output, "reps": counter.get_counter(), "update_us": update_us}
+
+
+def lag_frames(output: np.ndarray, reference: np.ndarray) -> int:
+    """Delay of `output` behind `reference` minimizing their mean absolute difference"""
+    errors = []
+    for lag in range(MAX_LAG_FRAMES + 1):
+        diff = output[lag:] - reference[:len(reference) - lag]
+        errors.append(np.nanmean(np.abs(diff)))
+    return int(np.argmin(errors))
+
+
+def trace_metrics(output: np.ndarray, reference: np.ndarray) -> Dict[str, float]:
+    """RMSE against a reference, lag and jitter (mean absolute second difference)"""
+    valid = ~np.isnan(output) & ~np.isnan(reference)
+    smooth = output[~np.isnan(output)]
+    return {
+        "rmse": float(np.sqrt(np.mean((output[valid] - reference[valid]) ** 2))) if valid.any() else 0.0,
+        "lag_frames": lag_frames(output, reference),
+        "jitter": float(np.mean(np.abs(np.diff(smooth, 2)))) if len(smooth) > 2 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help='Video files, directories or trace JSON files')
+    parser.add_argument('--synthetic', type=int, default=0, help='Number of synthetic traces to add')
+    parser.add_argument('--filter', dest='filters', action='append', help='Filter spec (repeatable)')
+    parser.add_argument('--mode', default='balanced', help='Pose model mode for clips')
+    parser.add_argument('--exercise', help='Exercise type for all clips')
+    parser.add_argument('--max-frames', type=int, help='Frames per clip')
+    parser.add_argument('--save-traces', help='Write the angle traces to this JSON file')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        specs = [parse_filter(text) for text in args.filters or DEFAULT_FILTERS]
+    except ValueError as e:
+        parser.error(str(e))
+
+    traces: List[Dict[str, Any]] = []
+    trace_files = [path for path in args.inputs if path.endswith('.json')]
+    for path in trace_files:
+        with open(path, encoding='utf-8') as f:
+            traces.extend(json.load(f))
+    clips = find_clips([path for path in args.inputs if path not in trace_files])
+    if clips:
+        processor = build_processor(args.mode)
+        traces.extend(clip_trace(processor, clip, args.exercise or clip_exercise(clip), args.max_frames) for clip in clips)
+    traces.extend(synthetic_trace(seed) for seed in range(args.synthetic))
+    if not traces:
+        parser.error("no traces: give clips, trace files or --synthetic")
+
+    if args.save_traces:
+        with open(args.save_traces, 'w', encoding='utf-8') as f:
+            json.dump(traces, f)
+
+    configs = ExerciseCounter(EXERCISES_CONFIG).exercise_configs
+    window = {"type": "window"}
+    baselines, expected_reps = {}, {}
+    for trace in traces:
+        baseline = run_filter(configs, window, trace)
+        baselines[trace["name"]] = baseline["output"]
+        expected_reps[trace["name"]] = baseline["reps"]
+        if "truth" in trace:
+            # Reps of the noise-free signal, counted without smoothing
+            clean = dict(trace, angles=[[angle, angle] for angle in trace["truth"]])
+            expected_reps[trace["name"]] = run_filter(configs, {"type": "ema", "alpha": 1.0}, clean)["reps"]
+
+    results = []
+    print(f"{'filter':<36} {'update_us':>9} {'rmse':>7} {'lag':>5} {'jitter':>7} {'reps_ok':>8}")
+    for spec in specs:
+        rows = []
+        for trace in traces:
+            run = run_filter(configs, spec, trace)
+            reference = np.array(trace["truth"]) if "truth" in trace else baselines[trace["name"]]
+            rows.append(dict(trace_metrics(run["output"], reference), trace=trace["name"], reps=run["reps"],
+                             expected_reps=expected_reps[trace["name"]], update_us=run["update_us"]))
+
+        name = ','.join(f"{k}={v}" for k, v in spec.items() if k != 'type')
+        name = f"{spec['type']}:{name}" if name else spec['type']
+        summary = {
+            "filter": name,
+            "update_us": round(float(np.mean([r["update_us"] for r in rows])), 2),
+            "rmse": round(float(np.mean([r["rmse"] for r in rows])), 2),
+            "lag_frames": round(float(np.mean([r["lag_frames"] for r in rows])), 1),
+            "jitter": round(float(np.mean([r["jitter"] for r in rows])), 2),
+            "reps_ok": f"{sum(r['reps'] == r['expected_reps'] for r in rows)}/{len(rows)}",
+            "traces": rows
+        }
+        results.append(summary)
+        print(f"{name:<36} {summary['update_us']:>9.2f} {summary['rmse']:>7.2f} {summary['lag_frames']:>5.1f} "
+              f"{summary['jitter']:>7.2f} {summary['reps_ok']:>8}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
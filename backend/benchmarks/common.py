@@ -0,0 +1,97 @@
+"""
+Shared helpers for benchmarks: model setup and video clip replay.
+"""
+import os
+import cv2
+import numpy as np
+from typing import Iterator, List, Optional
+from app.workouts import ExerciseCounter, RTMPoseProcessor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(__file__))
+MODELS_DIR = os.path.join(BACKEND_DIR, 'models')
+EXERCISES_CONFIG = os.path.join(BACKEND_DIR, 'data', 'exercises.json')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv', '.webm')
+
+
+def build_processor(
+    mode: str = 'balanced',
+    models_dir: str = MODELS_DIR,
+    precision: str = 'fp32',
+    load_models: bool = True
+) -> RTMPoseProcessor:
+    """Create a processor the same way the API does (without the singleton)"""
+    return RTMPoseProcessor(
+        exercise_counter=ExerciseCounter(EXERCISES_CONFIG),
+        models_dir=models_dir,
+        mode=mode,
+        precision=precision,
+        load_models=load_models
+    )
+
+
+def current_rss_mb() -> float:
+    """Resident memory of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def find_clips(paths: List[str]) -> List[str]:
+    """Expand files and directories into a sorted list of video files"""
+    clips = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    clips.append(os.path.join(path, name))
+        else:
+            clips.append(path)
+    return clips
+
+
+def iter_video_frames(path: str, max_frames: Optional[int] = None) -> Iterator[np.ndarray]:
+    """Yield BGR frames of a local video file"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video: {path}")
+
+    try:
+        count = 0
+        while max_frames is None or count < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            count += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def clip_fps(path: str, default: float = 30.0) -> float:
+    """Frame rate of a clip (default if the container does not report one)"""
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else default
+
+
+class VideoClock:
+    """Counter clock on video time (frame index / fps), so replay speed cannot change rep counts"""
+
+    def __init__(self, fps: float):
+        self.fps = fps
+        self.frame = 0
+
+    def __call__(self) -> float:
+        return self.frame / self.fps
+
+
+def clip_exercise(path: str, default: str = 'squat') -> str:
+    """Exercise type from a clip name such as `squat_01.mp4`"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    prefix = name.rsplit('_', 1)[0] if '_' in name else name
+    return prefix if prefix else default
@@ -0,0 +1,76 @@
+"""
+Detector skipping (keypoint bbox tracking) against full per-frame detection.
+
+Replays local clips through RTMPoseProcessor twice -- once running YOLOX on
+every frame, once with a PoseTracker per clip -- and reports fps, detector runs
+and rep counts. Clips are named `<exercise>_<anything>.mp4` (e.g. `squat_01.mp4`)
+unless --exercise is given.
+
+    python -m benchmarks.detector_tracking clips/ --mode balanced --intervals 5,10,20
+"""
+import argparse
+import json
+import time
+from benchmarks.common import VideoClock, build_processor, clip_exercise, clip_fps, find_clips, iter_video_frames
+from app.workouts.rtmpose_processor import POSE_MODEL_FILES
+from app.workouts.tracking import PoseTracker
+
+
+def replay(processor, frames, exercise_type: str, detect_interval: int = 0, fps: float = 30.0):
+    """Count reps over preloaded frames; detect_interval 0 means detection on every frame"""
+    counter = processor.create_exercise_counter()
+    # Video time: faster runs (fewer detections) must not drop reps under min_rep_time
+    clock = counter.clock = VideoClock(fps)
+    tracker = PoseTracker(detect_interval=detect_interval) if detect_interval > 0 else None
+
+    started = time.perf_counter()
+    for index, frame in enumerate(frames):
+        clock.frame = index
+        processor.process_frame(frame, exercise_type, counter, tracker)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "reps": counter.get_counter(),
+        "fps": round(len(frames) / elapsed, 1) if elapsed > 0 else 0.0,
+        "detections": tracker.detections_run if tracker else len(frames)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('clips', nargs='+', help='Video files or directories')
+    parser.add_argument('--mode', default='balanced', choices=sorted(POSE_MODEL_FILES))
+    parser.add_argument('--exercise', help='Exercise type for all clips')
+    parser.add_argument('--intervals', default='5,10,20', help='Comma-separated detector intervals')
+    parser.add_argument('--max-frames', type=int)
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    processor = build_processor(args.mode)
+    intervals = [int(i) for i in args.intervals.split(',')]
+    results = []
+
+    print(f"{'clip':<32} {'interval':>8} {'fps':>8} {'detections':>10} {'reps':>6} {'rep_diff':>8}")
+    for clip in find_clips(args.clips):
+        exercise_type = args.exercise or clip_exercise(clip)
+        frames = list(iter_video_frames(clip, args.max_frames))
+        fps = clip_fps(clip)
+
+        baseline = replay(processor, frames, exercise_type, fps=fps)
+        rows = [dict(baseline, interval=0, rep_diff=0)]
+        for interval in intervals:
+            tracked = replay(processor, frames, exercise_type, interval, fps)
+            rows.append(dict(tracked, interval=interval, rep_diff=tracked["reps"] - baseline["reps"]))
+
+        for row in rows:
+            print(f"{clip[-32:]:<32} {row['interval']:>8} {row['fps']:>8.1f} "
+                  f"{row['detections']:>10} {row['reps']:>6} {row['rep_diff']:>8}")
+        results.append({"clip": clip, "exercise": exercise_type, "frames": len(frames), "runs": rows})
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"mode": args.mode, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+End-to-end vision pipeline benchmark over recorded clips.
+
+Every clip frame is JPEG-encoded up front (as a client would send it), then
+replayed through decode -> resize -> detect -> pose -> count for each model
+mode. Reports fps, p50/p95/p99 latency per stage, peak RSS and final rep counts.
+Each mode runs in a fresh process so peak RSS is per mode. Clips are named
+`<exercise>_<anything>.mp4` (e.g. `squat_01.mp4`) unless --exercise is given.
+
+    python -m benchmarks.pipeline clips/ --modes lightweight,balanced --json bench.json
+    python -m benchmarks.pipeline clips/ --compare bench.json    # deltas against a previous run
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List
+from benchmarks.common import (
+    BACKEND_DIR,
+    VideoClock,
+    build_processor,
+    clip_exercise,
+    clip_fps,
+    find_clips,
+    iter_video_frames
+)
+from app.workouts.frames import decode_frame_scaled
+from app.workouts.rtmpose_processor import MAX_FRAME_SIZE, POSE_MODEL_FILES
+
+STAGES = ('decode', 'resize', 'detect', 'pose', 'count')
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """Mean and p50/p95/p99 of latencies in ms"""
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "mean": round(float(np.mean(values)), 2),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2)
+    }
+
+
+def encode_clip(path: str, max_frames: int = None, quality: int = 80) -> List[bytes]:
+    """JPEG-encode the frames of a clip"""
+    params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+    return [cv2.imencode('.jpg', frame, params)[1].tobytes() for frame in iter_video_frames(path, max_frames)]
+
+
+def replay_clip(processor, jpegs: List[bytes], exercise_type: str, stages: Dict[str, List[float]],
+                reduced_decode: bool = True, fps: float = 30.0) -> int:
+    """Run one clip through every stage, appending per-stage ms to `stages`; returns reps"""
+    counter = processor.create_exercise_counter()
+    clock = counter.clock = VideoClock(fps)
+    max_size = MAX_FRAME_SIZE if reduced_decode else None
+
+    for index, data in enumerate(jpegs):
+        clock.frame = index
+        t0 = time.perf_counter()
+        frame, input_scale = decode_frame_scaled(data, max_size)
+        t1 = time.perf_counter()
+        frame, scale_factor = processor.prepare_frame(frame)
+        scale_factor *= input_scale
+        t2 = time.perf_counter()
+        bboxes = processor.wholebody.det_model(frame)
+        t3 = time.perf_counter()
+        keypoints, scores = processor.estimate_pose(frame, bboxes)
+        t4 = time.perf_counter()
+        if len(keypoints) > 0:
+            processor.process_keypoints(keypoints[0] / scale_factor, scores[0], exercise_type, counter)
+        t5 = time.perf_counter()
+
+        for stage, started, ended in zip(STAGES, (t0, t1, t2, t3, t4), (t1, t2, t3, t4, t5)):
+            stages[stage].append((ended - started) * 1000)
+
+    return counter.get_counter()
+
+
+def run_mode(mode: str, clips: List[str], exercise: str = None, max_frames: int = None,
+             quality: int = 80, precision: str = 'fp32', reduced_decode: bool = True) -> Dict[str, Any]:
+    """Benchmark one mode over all clips (meant to run in its own process)"""
+    processor = build_processor(mode, precision=precision)
+    stages: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    clip_results = []
+    frames = 0
+    elapsed = 0.0
+
+    for clip in clips:
+        exercise_type = exercise or clip_exercise(clip)
+        jpegs = encode_clip(clip, max_frames, quality)
+
+        started = time.perf_counter()
+        reps = replay_clip(processor, jpegs, exercise_type, stages, reduced_decode, clip_fps(clip))
+        elapsed += time.perf_counter() - started
+        frames += len(jpegs)
+
+        clip_results.append({"clip": clip, "exercise": exercise_type, "frames": len(jpegs), "reps": reps})
+
+    totals = [sum(parts) for parts in zip(*stages.values())]
+    return {
+        "mode": mode,
+        "precision": precision,
+        "reduced_decode": reduced_decode,
+        "frames": frames,
+        "fps": round(frames / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": dict({stage: latency_summary(values) for stage, values in stages.items()},
+                           total=latency_summary(totals)),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "clips": clip_results
+    }
+
+
+def git_commit() -> str:
+    """Current commit of the checkout, if available"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str):
+    """Print fps, p95 and rep count changes against a previous JSON report"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r["mode"], r.get("precision", "fp32")): r for r in baseline["results"]}
+
+    print(f"\nCompared with {baseline.get('commit', baseline_path)}:")
+    print(f"{'mode':<12} {'fps':>14} {'total_p95_ms':>18} {'reps_changed':>12}")
+    for result in results:
+        before = previous.get((result["mode"], result["precision"]))
+        if before is None:
+            continue
+        old_reps = {c["clip"]: c["reps"] for c in before["clips"]}
+        changed = sum(1 for c in result["clips"] if c["clip"] in old_reps and c["reps"] != old_reps[c["clip"]])
+        p95, old_p95 = result["latency_ms"]["total"]["p95"], before["latency_ms"]["total"]["p95"]
+        print(f"{result['mode']:<12} {before['fps']:>6.1f} -> {result['fps']:<6.1f} "
+              f"{old_p95:>8.1f} -> {p95:<8.1f} {changed:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('clips', nargs='+', help='Video files or directories')
+    parser.add_argument('--modes', default='lightweight,balanced,performance', help='Comma-separated model modes')
+    parser.add_argument('--precision', default='fp32', choices=('fp32', 'int8'))
+    parser.add_argument('--exercise', help='Exercise type for all clips')
+    parser.add_argument('--max-frames', type=int, help='Frames per clip')
+    parser.add_argument('--jpeg-quality', type=int, default=80)
+    parser.add_argument('--full-decode', action='store_true', help='Disable reduced JPEG decoding')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Previous JSON report to compare against')
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(',') if m]
+    for mode in modes:
+        if mode not in POSE_MODEL_FILES:
+            parser.error(f"unknown mode: {mode}")
+
+    clips = find_clips(args.clips)
+    results = []
+
+    print(f"{'mode':<12} {'fps':>7} " + " ".join(f"{stage + '_p95':>11}" for stage in STAGES + ('total',)) +
+          f" {'rss_mb':>8} {'reps':>6}")
+    for mode in modes:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+            result = pool.submit(
+                run_mode, mode, clips, args.exercise, args.max_frames, args.jpeg_quality, args.precision,
+                not args.full_decode
+            ).result()
+        results.append(result)
+
+        latency = result["latency_ms"]
+        print(f"{mode:<12} {result['fps']:>7.1f} " +
+              " ".join(f"{latency[stage]['p95']:>11.1f}" for stage in STAGES + ('total',)) +
+              f" {result['peak_rss_mb']:>8.1f} {sum(c['reps'] for c in result['clips']):>6}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+    if args.json_path:
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "jpeg_quality": args.jpeg_quality,
+            "results": results
+        }
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Throughput of cross-session pose batching against batch window size.
+
+Simulates N concurrent sessions, each sending person crops to the RTMPose model,
+and reports total frames/sec per window (window 0 = no batching).
+
+    python -m benchmarks.pose_batching --mode balanced --clients 8 --windows 0,2,5,10,20
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+from rtmlib import RTMPose
+from benchmarks.common import MODELS_DIR
+from app.workouts.batching import PoseBatchScheduler
+from app.workouts.rtmpose_processor import POSE_MODEL_FILES, POSE_INPUT_SIZE
+
+
+def run_clients(pose_fn, clients: int, frames_per_client: int, frame: np.ndarray) -> float:
+    """Run concurrent sessions against pose_fn and return total frames/sec"""
+    bbox = [[0, 0, frame.shape[1], frame.shape[0]]]
+    start_barrier = threading.Barrier(clients + 1)
+
+    def client():
+        start_barrier.wait()
+        for _ in range(frames_per_client):
+            pose_fn(frame, bboxes=bbox)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return clients * frames_per_client / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--mode', default='balanced', choices=sorted(POSE_MODEL_FILES))
+    parser.add_argument('--pose-model', help='ONNX file or rtmlib download URL (overrides --mode)')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--frames', type=int, default=50, help='Frames per client')
+    parser.add_argument('--windows', default='0,2,5,10,20', help='Comma-separated batch windows in ms')
+    parser.add_argument('--max-batch', type=int, default=16)
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    pose_path = args.pose_model or os.path.join(args.models_dir, POSE_MODEL_FILES[args.mode])
+    pose_model = RTMPose(pose_path, model_input_size=POSE_INPUT_SIZE, backend='onnxruntime', device='cpu')
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+
+    # Warm up the session before measuring
+    for _ in range(3):
+        pose_model(frame)
+
+    results = []
+    print(f"{'window_ms':>10} {'fps':>10} {'avg_batch':>10}")
+    for window_ms in [float(w) for w in args.windows.split(',')]:
+        if window_ms <= 0:
+            fps = run_clients(pose_model, args.clients, args.frames, frame)
+            avg_batch = 1.0
+        else:
+            scheduler = PoseBatchScheduler(pose_model, window_ms=window_ms, max_batch_size=args.max_batch)
+            fps = run_clients(scheduler, args.clients, args.frames, frame)
+            avg_batch = scheduler.get_stats()['avg_batch_size']
+            scheduler.stop()
+
+        results.append({"window_ms": window_ms, "fps": round(fps, 1), "avg_batch_size": avg_batch})
+        print(f"{window_ms:>10.1f} {fps:>10.1f} {avg_batch:>10.2f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"mode": args.mode, "clients": args.clients, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
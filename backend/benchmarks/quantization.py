@@ -0,0 +1,174 @@
+"""
+INT8-quantized models against FP32: latency, memory and rep agreement.
+
+With --quantize, first writes static (calibrated on frames sampled from the
+clips) and/or dynamic INT8 copies of the detector and pose model next to the
+FP32 files. Then replays every clip through each variant and reports per-frame
+latency, resident memory added by loading the models, keypoint deviation from
+FP32 and whether the rep counts agree. Clips are named `<exercise>_<anything>.mp4`
+unless --exercise is given.
+
+    python -m benchmarks.quantization clips/ --mode balanced --quantize
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from rtmlib import Wholebody
+from benchmarks.common import (
+    MODELS_DIR,
+    VideoClock,
+    build_processor,
+    clip_exercise,
+    clip_fps,
+    current_rss_mb,
+    find_clips,
+    iter_video_frames
+)
+from app.workouts.model_variants import QUANTIZATION_METHODS, quantized_model_path
+from app.workouts.quantization import calibration_inputs, quantize_model_dynamic, quantize_model_static
+from app.workouts.rtmpose_processor import DET_INPUT_SIZE, DET_MODEL_FILE, POSE_INPUT_SIZE, POSE_MODEL_FILES
+
+
+def model_files(mode: str, method: str = None):
+    """Detector and pose model paths for a variant (method None = FP32)"""
+    det = os.path.join(MODELS_DIR, DET_MODEL_FILE)
+    pose = os.path.join(MODELS_DIR, POSE_MODEL_FILES[mode])
+    if method is None:
+        return det, pose
+    return quantized_model_path(det, method), quantized_model_path(pose, method)
+
+
+def sample_frames(clips, count: int):
+    """Up to `count` frames spread evenly over all clips"""
+    frames = [frame for clip in clips for frame in iter_video_frames(clip)]
+    if len(frames) <= count:
+        return frames
+    step = len(frames) / count
+    return [frames[int(i * step)] for i in range(count)]
+
+
+def quantize(mode: str, methods, clips, calibration_frames: int):
+    """Write INT8 variants of the mode's models"""
+    det, pose = model_files(mode)
+    for method in methods:
+        if method == 'dynamic':
+            for path in (det, pose):
+                print(f"Quantizing (dynamic) {os.path.basename(path)}")
+                quantize_model_dynamic(path)
+        else:
+            fp32 = Wholebody(det=det, det_input_size=DET_INPUT_SIZE, pose=pose, pose_input_size=POSE_INPUT_SIZE)
+            det_inputs, pose_inputs = calibration_inputs(fp32, sample_frames(clips, calibration_frames))
+            print(f"Quantizing (static) with {len(det_inputs)} frames / {len(pose_inputs)} person crops")
+            quantize_model_static(det, det_inputs)
+            quantize_model_static(pose, pose_inputs)
+
+
+def load_variant(mode: str, method: str = None):
+    """Processor running one model variant, plus the memory its models added"""
+    processor = build_processor(mode, load_models=False)
+    det, pose = model_files(mode, method)
+
+    before = current_rss_mb()
+    processor.wholebody = Wholebody(det=det, det_input_size=DET_INPUT_SIZE, pose=pose, pose_input_size=POSE_INPUT_SIZE)
+    loaded_mb = current_rss_mb() - before
+
+    size_mb = (os.path.getsize(det) + os.path.getsize(pose)) / (1024 * 1024)
+    return processor, loaded_mb, size_mb
+
+
+def replay(processor, frames, exercise_type: str, fps: float = 30.0):
+    """Per-frame latency, reps and keypoints over preloaded frames"""
+    counter = processor.create_exercise_counter()
+    # Video time, so reps only differ between variants through their keypoints, not their speed
+    clock = counter.clock = VideoClock(fps)
+    latencies, keypoints = [], []
+    for index, frame in enumerate(frames):
+        clock.frame = index
+        started = time.perf_counter()
+        _, _, kpts = processor.process_frame(frame, exercise_type, counter)
+        latencies.append((time.perf_counter() - started) * 1000)
+        keypoints.append(None if kpts is None else np.array(kpts))
+    return latencies, counter.get_counter(), keypoints
+
+
+def keypoint_error(reference, keypoints) -> float:
+    """Mean pixel distance to the reference keypoints over frames where both detected a person"""
+    errors = [
+        np.linalg.norm(ref - kpts, axis=1).mean()
+        for ref, kpts in zip(reference, keypoints)
+        if ref is not None and kpts is not None
+    ]
+    return float(np.mean(errors)) if errors else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('clips', nargs='+', help='Video files or directories')
+    parser.add_argument('--mode', default='balanced', choices=sorted(POSE_MODEL_FILES))
+    parser.add_argument('--exercise', help='Exercise type for all clips')
+    parser.add_argument('--methods', default='static,dynamic', help='Comma-separated quantization methods')
+    parser.add_argument('--quantize', action='store_true', help='Create the INT8 models before benchmarking')
+    parser.add_argument('--calibration-frames', type=int, default=64)
+    parser.add_argument('--max-frames', type=int)
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    methods = [m for m in args.methods.split(',') if m]
+    for method in methods:
+        if method not in QUANTIZATION_METHODS:
+            parser.error(f"unknown method: {method}")
+
+    clips = find_clips(args.clips)
+    if args.quantize:
+        quantize(args.mode, methods, clips, args.calibration_frames)
+
+    clip_frames = [(clip, list(iter_video_frames(clip, args.max_frames)), clip_fps(clip)) for clip in clips]
+    reference = {}
+    results = []
+
+    print(f"{'variant':<14} {'mean_ms':>8} {'p95_ms':>8} {'files_mb':>9} {'rss_mb':>8} {'kp_err_px':>9} {'reps_agree':>10}")
+    for method in [None] + methods:
+        name = 'fp32' if method is None else f"int8-{method}"
+        processor, loaded_mb, size_mb = load_variant(args.mode, method)
+
+        latencies, clip_rows, agree = [], [], 0
+        for clip, frames, fps in clip_frames:
+            exercise_type = args.exercise or clip_exercise(clip)
+            clip_latencies, reps, keypoints = replay(processor, frames, exercise_type, fps)
+            if method is None:
+                reference[clip] = (reps, keypoints)
+            ref_reps, ref_keypoints = reference[clip]
+
+            latencies.extend(clip_latencies)
+            agree += int(reps == ref_reps)
+            clip_rows.append({
+                "clip": clip,
+                "exercise": exercise_type,
+                "reps": reps,
+                "fp32_reps": ref_reps,
+                "keypoint_error_px": round(keypoint_error(ref_keypoints, keypoints), 2)
+            })
+
+        row = {
+            "variant": name,
+            "mean_ms": round(float(np.mean(latencies)), 2) if latencies else 0.0,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2) if latencies else 0.0,
+            "model_files_mb": round(size_mb, 1),
+            "loaded_rss_mb": round(loaded_mb, 1),
+            "keypoint_error_px": round(float(np.mean([c["keypoint_error_px"] for c in clip_rows])), 2) if clip_rows else 0.0,
+            "reps_agree": f"{agree}/{len(clip_rows)}",
+            "clips": clip_rows
+        }
+        results.append(row)
+        print(f"{name:<14} {row['mean_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['model_files_mb']:>9.1f} "
+              f"{row['loaded_rss_mb']:>8.1f} {row['keypoint_error_px']:>9.2f} {row['reps_agree']:>10}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"mode": args.mode, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
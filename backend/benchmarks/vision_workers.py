@@ -0,0 +1,77 @@
+"""
+Frames/sec of the multi-process vision worker tier against worker count.
+
+Concurrent client threads push 640x480 frames through VisionWorkerPool
+(shared-memory handoff, detection + pose in the workers). Worker count 0 runs
+the same load on an in-process RTMPoseProcessor for comparison.
+
+    python -m benchmarks.vision_workers --workers 0,1,2,4 --clients 8
+"""
+import argparse
+import json
+import threading
+import time
+import numpy as np
+from benchmarks.common import MODELS_DIR, build_processor
+from app.workouts.rtmpose_processor import POSE_MODEL_FILES
+from app.workouts.vision_workers import VisionWorkerPool
+
+
+def run_clients(estimate, clients: int, frames_per_client: int, frame: np.ndarray) -> float:
+    """Run concurrent callers of estimate(frame, None) and return total frames/sec"""
+    start_barrier = threading.Barrier(clients + 1)
+
+    def client():
+        start_barrier.wait()
+        for _ in range(frames_per_client):
+            estimate(frame, None)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return clients * frames_per_client / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--mode', default='balanced', choices=sorted(POSE_MODEL_FILES))
+    parser.add_argument('--workers', default='0,1,2,4', help='Comma-separated worker counts (0 = in-process)')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--frames', type=int, default=40, help='Frames per client')
+    parser.add_argument('--json', dest='json_path', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, size=(480, 640, 3), dtype=np.uint8)
+    results = []
+
+    print(f"{'workers':>8} {'fps':>10}")
+    for workers in [int(w) for w in args.workers.split(',')]:
+        if workers == 0:
+            processor = build_processor(args.mode, args.models_dir)
+            processor.estimate_pose(frame)
+            fps = run_clients(processor.estimate_pose, args.clients, args.frames, frame)
+        else:
+            pool = VisionWorkerPool(args.models_dir, mode=args.mode, workers=workers)
+            try:
+                pool(frame)
+                fps = run_clients(pool, args.clients, args.frames, frame)
+            finally:
+                pool.close()
+
+        results.append({"workers": workers, "fps": round(fps, 1)})
+        print(f"{workers:>8} {fps:>10.1f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({"mode": args.mode, "clients": args.clients, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
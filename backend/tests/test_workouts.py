@@ -0,0 +1,743 @@
+import os
+import asyncio
+import json
+import threading
+import time
+import cv2
+import numpy as np
+import pytest
+from app.workouts import ExerciseCounter, SessionRegistry
+from app.workouts.adaptive import AdaptiveModeController, NodeLoadMonitor
+from app.workouts.admission import CapacityManager, TokenBucket
+from app.workouts.angle_filters import OneEuroFilter, RunningMedianFilter, WindowOutlierFilter
+from app.workouts.batching import PoseBatchScheduler
+from app.workouts.exercise_catalog import ExerciseCatalog
+from app.workouts.exercise_rules import compile_exercise_rule
+from app.workouts.frames import decode_image_bytes_scaled, jpeg_size
+from app.workouts.inference_executor import InferenceExecutor, InferenceQueueFull
+from app.workouts.keypoint_mapping import to_coco17
+from app.workouts.kinematics import JointAngleTable
+from app.workouts.mailbox import FrameMailbox
+from app.workouts.metrics import LatencyHistograms, StageTimer
+from app.workouts.model_variants import find_quantized_model
+from app.workouts.onnx_sessions import OrtSessionConfig, create_session, optimized_model_path
+from app.workouts.protocol import (
+    MSG_IMAGE_FRAME,
+    RESULT_STATE,
+    CompactResponseEncoder,
+    ProtocolError,
+    decode_compact_result,
+    pack_binary_frame,
+    parse_binary_frame
+)
+from app.workouts.quantization import quantize_model_static
+from app.workouts.rate_control import FrameRateAdvisor
+from app.workouts.tracking import PoseTracker
+from app.workouts import video_analysis
+from app.workouts.video_analysis import analyze_video, count_timeline, merge_chunks
+from app.workouts.vision_workers import VisionWorkerPool
+
+EXERCISES_CONFIG = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'exercises.json')
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
+DET_MODEL = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'models', 'yolox_nano_8xb8-300e_humanart-40f6f0d0.onnx'
+)
+
+
+class FakeProcessor:
+    """Stands in for RTMPoseProcessor: counts directly on given keypoints"""
+
+    conf_threshold = 0.5
+    mode = 'balanced'
+
+    def __init__(self):
+        self.exercise_counter = ExerciseCounter(EXERCISES_CONFIG)
+
+    def create_exercise_counter(self):
+        return self.exercise_counter.clone()
+
+    loaded_modes = ['balanced']
+
+    def resolve_mode(self, mode):
+        return mode
+
+    def process_frame(self, keypoints, exercise_type, exercise_counter=None, tracker=None, mode=None, input_scale=1.0,
+                      timer=None, crop_origin=None, client_size=None):
+        counter = exercise_counter or self.exercise_counter
+        return counter.count_exercise(keypoints, exercise_type), None, keypoints
+
+    def process_keypoints(self, keypoints, scores, exercise_type, exercise_counter=None):
+        return self.process_frame(keypoints, exercise_type, exercise_counter)
+
+
+class StubEstimator:
+    """Stands in for the worker's RTMPoseProcessor; the frame's first pixel selects the behaviour"""
+
+    SLOW, CRASH = 1, 2
+
+    def warm_up(self):
+        return {}
+
+    def estimate_pose(self, frame, bboxes=None, mode=None):
+        if frame[0, 0, 0] == self.SLOW:
+            time.sleep(1.0)
+        elif frame[0, 0, 0] == self.CRASH:
+            os._exit(1)
+        return np.full((1, 17, 2), frame.mean()), np.ones((1, 17))
+
+
+def squat_keypoints(knee_angle: float) -> np.ndarray:
+    """COCO-17 keypoints with both knees bent at the given angle"""
+    keypoints = np.zeros((17, 2))
+    rad = np.radians(knee_angle)
+    for hip, knee, ankle, x in ((11, 13, 15, 100.0), (12, 14, 16, 200.0)):
+        keypoints[knee] = [x, 300.0]
+        keypoints[hip] = [x, 200.0]
+        keypoints[ankle] = [x + 100 * np.sin(rad), 300.0 - 100 * np.cos(rad)]
+    return keypoints
+
+
+def test_sessions_count_independently():
+    processor = FakeProcessor()
+    sessions = SessionRegistry()
+    first = sessions.open(processor)
+    second = sessions.open(processor)
+
+    for angle in [170] * 5 + [90] * 5:
+        first.process_frame(squat_keypoints(angle), "squat")
+
+    assert first.get_state()["reps"] == 1
+    assert second.get_state()["reps"] == 0
+    assert first.exercise_counter.exercise_configs is second.exercise_counter.exercise_configs
+
+    sessions.close(first.session_id)
+    assert len(sessions) == 1
+    assert sessions.get(second.session_id) is second
+
+
+def test_session_snapshot_resumes_counting_on_a_new_connection():
+    processor = FakeProcessor()
+    sessions = SessionRegistry()
+    now = [0.0]
+
+    def feed(session, angles):
+        session.exercise_counter.clock = lambda: now[0]
+        results = []
+        for angle in angles:
+            now[0] += 1 / 30
+            results.append(session.process_frame(squat_keypoints(angle), "squat")[0])
+        return results
+
+    original = sessions.open(processor)
+    feed(original, [170] * 20 + [90] * 20 + [170] * 20)
+    assert original.get_state()["reps"] == 1
+
+    # Dropped connection: the state travels as JSON to another worker's session
+    snapshot = json.loads(json.dumps(original.get_snapshot()))
+    resumed = sessions.open(processor)
+    resumed.restore_snapshot(snapshot)
+    assert resumed.get_state()["reps"] == 1
+    assert resumed.exercise_counter.get_stage() == "up"
+
+    clock = now[0]
+    expected = feed(original, [90] * 20)
+    now[0] = clock
+    assert feed(resumed, [90] * 20) == pytest.approx(expected)
+    assert resumed.get_state()["reps"] == original.get_state()["reps"] == 2
+
+
+def test_joint_angles_are_computed_for_frames_and_sequences():
+    table = JointAngleTable(ExerciseCounter(EXERCISES_CONFIG).rules)
+    sequence = np.stack([squat_keypoints(angle) for angle in (170.0, 90.0, 45.0)])
+
+    np.testing.assert_allclose(table.exercise_angles(sequence, 'squat'), [[170, 170], [90, 90], [45, 45]])
+    np.testing.assert_allclose(table.exercise_angles(sequence[1], 'squat'), [90, 90])
+    by_exercise = table.angles_by_exercise(sequence)
+    assert by_exercise['squat'].shape == (3, 2)
+    # Arms are all at (0, 0), i.e. missing
+    assert np.isnan(by_exercise['pushup']).all()
+
+
+def test_exercise_rules_are_compiled_from_config():
+    counter = ExerciseCounter(EXERCISES_CONFIG)
+    squat = counter.rules['squat']
+
+    assert squat.triplets.tolist() == [[11, 13, 15], [12, 14, 16]]
+    assert not squat.triplets.flags.writeable
+    assert squat.form_correction('down', squat.down_angle + 25) == "Присядьте глубже - колени должны быть под углом 90°"
+    assert squat.form_correction('down', squat.down_angle) is None
+    # Timed holds are configured but not counted
+    assert 'plank' in counter.exercise_configs and 'plank' not in counter.rules
+    assert counter.rules['lunge'].form_correction('down', 135) == "Опустите колено ниже - угол 90°"
+    with pytest.raises(ValueError):
+        compile_exercise_rule('squat', dict(counter.exercise_configs['squat'], smoothing={"type": "kalman"}))
+    with pytest.raises(ValueError):
+        compile_exercise_rule('squat', dict(counter.exercise_configs['squat'], smoothing={"type": "ema", "alpha": 0}))
+    with pytest.raises(TypeError):
+        counter.rules['custom'] = squat
+
+
+def test_exercise_catalog_hot_reloads_into_live_counters(tmp_path):
+    path = tmp_path / 'exercises.json'
+    with open(EXERCISES_CONFIG, encoding='utf-8') as f:
+        data = json.load(f)
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+    catalog = ExerciseCatalog(str(path), check_interval=0.01)
+    counter = ExerciseCounter(catalog=catalog).clone()
+    etag = catalog.snapshot.etag
+    assert json.loads(catalog.snapshot.listing)["exercises"][0]["id"] == 'squat'
+
+    data["exercises"]["squat"]["down_angle"] = 95
+    data["exercises"]["squat"]["name_en"] = "Deep Squat"
+    path.write_text(json.dumps(data), encoding='utf-8')
+    os.utime(path, ns=(time.time_ns() + 10**9, time.time_ns() + 10**9))
+    time.sleep(0.02)
+
+    assert counter.rules['squat'].down_angle == 95
+    assert catalog.snapshot.etag != etag and catalog.reloads == 1
+
+    # A broken edit keeps the last good version
+    path.write_text('{"exercises": ', encoding='utf-8')
+    os.utime(path, ns=(time.time_ns() + 2 * 10**9, time.time_ns() + 2 * 10**9))
+    time.sleep(0.02)
+    assert counter.rules['squat'].down_angle == 95
+
+
+def test_streaming_angle_filters_smooth_and_reject_spikes():
+    median = RunningMedianFilter(window=5)
+    outputs = [median.update(angle, i / 30) for i, angle in enumerate([120, 121, 10, 122, 123, 124])]
+    assert min(outputs[2:]) >= 120
+
+    one_euro = OneEuroFilter()
+    rng = np.random.default_rng(0)
+    noisy = 120 + rng.normal(0, 3, 90)
+    smoothed = [one_euro.update(angle, i / 30) for i, angle in enumerate(noisy)]
+    assert np.std(smoothed[30:]) < np.std(noisy[30:]) / 2
+
+    # Exercises without a "smoothing" entry keep the window filter; One-Euro is opt-in
+    with open(EXERCISES_CONFIG, encoding='utf-8') as f:
+        configs = json.load(f)['exercises']
+    configs['squat'] = dict(configs['squat'], smoothing={"type": "one_euro", "min_cutoff": 1.0, "beta": 0.02})
+    counter = ExerciseCounter(exercise_configs=configs)
+    assert isinstance(counter.get_angle_filter('squat'), OneEuroFilter)
+    assert isinstance(counter.get_angle_filter('pushup'), WindowOutlierFilter)
+    assert counter.get_angle_filter('squat') is counter.get_angle_filter('squat')
+
+
+def test_inference_executor_rejects_when_saturated():
+    executor = InferenceExecutor(max_workers=1, max_pending=3)
+    try:
+        executor.reserve("a")
+        executor.reserve("a")
+        executor.reserve("b")
+        with pytest.raises(InferenceQueueFull):
+            executor.reserve("c")
+
+        assert executor.queue_depth("a") == 2
+        assert executor.pending == 3
+        assert executor.rejected_frames == 1
+
+        executor.release("a")
+        executor.discard("b")
+        assert executor.pending == 1
+    finally:
+        executor.shutdown()
+
+
+def test_vision_worker_pool_frees_slots_of_timed_out_frames():
+    pool = VisionWorkerPool('', workers=1, max_frame_size=64, timeout=0.3, estimator_factory=StubEstimator)
+    try:
+        keypoints, scores = pool(np.full((48, 64, 3), 7, np.uint8))
+        assert keypoints.shape == (1, 17, 2) and keypoints[0, 0, 0] == 7
+
+        slow = np.full((48, 64, 3), StubEstimator.SLOW, np.uint8)
+        with pytest.raises(TimeoutError):
+            pool(slow)
+        assert pool.get_stats()["free_slots"] == pool.slots
+
+        # The late result of the abandoned frame is dropped, not handed to the next caller
+        pool.timeout = 5.0
+        keypoints, _ = pool(np.full((48, 64, 3), 9, np.uint8))
+        assert keypoints[0, 0, 0] == 9
+    finally:
+        pool.close()
+
+
+def test_vision_worker_pool_replaces_dead_workers():
+    pool = VisionWorkerPool(
+        '', workers=1, max_frame_size=64, timeout=30.0, health_interval=0.1, estimator_factory=StubEstimator
+    )
+    try:
+        started = time.perf_counter()
+        with pytest.raises(RuntimeError, match="died"):
+            pool(np.full((48, 64, 3), StubEstimator.CRASH, np.uint8))
+        assert time.perf_counter() - started < 10
+        assert pool.get_stats()["free_slots"] == pool.slots
+
+        keypoints, _ = pool(np.full((48, 64, 3), 5, np.uint8))
+        assert keypoints[0, 0, 0] == 5
+        assert pool.respawned_workers == 1 and pool.get_stats()["alive_workers"] == 1
+    finally:
+        pool.close()
+
+
+class _Node:
+    def __init__(self, name, shape=None):
+        self.name = name
+        self.shape = shape
+
+
+class FakeBatchSession:
+    """ONNX Runtime session stand-in that echoes the crop mean as SimCC peaks"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [_Node('input', ['batch', 3, 4, 4])]
+
+    def get_outputs(self):
+        return [_Node('simcc_x'), _Node('simcc_y')]
+
+    def run(self, output_names, feed):
+        batch = feed['input']
+        self.batch_sizes.append(len(batch))
+        simcc = np.zeros((len(batch), 17, 8), dtype=np.float32)
+        for i, crop in enumerate(batch):
+            simcc[i, :, int(crop.mean())] = 1.0
+        return [simcc, simcc]
+
+
+class FakePoseModel:
+    backend = 'onnxruntime'
+
+    def __init__(self):
+        self.session = FakeBatchSession()
+
+    def preprocess(self, image, bbox):
+        return np.full((4, 4, 3), image[0, 0, 0], dtype=np.float32), None, None
+
+    def postprocess(self, outputs, center, scale):
+        simcc_x, _ = outputs
+        return simcc_x.argmax(axis=2)[..., None].repeat(2, axis=2), simcc_x.max(axis=2)
+
+
+def test_capacity_manager_admits_within_measured_budget():
+    now = [0.0]
+    capacity = CapacityManager(parallelism=2, target_utilization=0.8, session_fps=10, clock=lambda: now[0])
+
+    # 40 ms frames on 2 threads: 50 fps, 40 at 80% -> 4 sessions of 10 fps
+    capacity.record(40.0)
+    assert capacity.session_capacity == 4
+    assert [capacity.try_admit() for _ in range(5)] == [True] * 4 + [False]
+    capacity.release()
+    assert capacity.try_admit()
+
+    # Measured utilization above target also stops admission
+    capacity.release()
+    capacity.release()
+    for _ in range(225):
+        capacity.record(40.0)
+    now[0] = 5.0
+    capacity.record(40.0)
+    assert capacity.utilization > 0.8
+    assert not capacity.try_admit()
+    assert capacity.get_stats()["rejected_sessions"] == 2
+
+    bucket = TokenBucket(rate=10, burst=2, clock=lambda: now[0])
+    assert [bucket.consume() for _ in range(3)] == [True, True, False]
+    now[0] += 0.15
+    assert bucket.consume() and not bucket.consume()
+
+
+def test_keypoint_sessions_do_not_count_against_image_capacity(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+    from app.api.v1 import vision
+
+    # No utilization target: a single image session fills the node whatever the measured frame cost
+    capacity = CapacityManager(target_utilization=0.0)
+    monkeypatch.setattr(vision, 'processor', FakeProcessor())
+    monkeypatch.setattr(vision, 'capacity_manager', capacity)
+    app = FastAPI()
+    app.include_router(vision.router, prefix="/api/v1/vision")
+    client = TestClient(app)
+    keypoints = {"type": "keypoints", "exercise": "squat", "keypoints": squat_keypoints(170).tolist()}
+
+    assert capacity.session_capacity == 1
+    with client.websocket_connect("/api/v1/vision/ws/pose") as image_ws:
+        image_ws.send_json({"frame": "not-an-image"})
+        image_ws.receive_json()
+        assert capacity.active_sessions == 1
+
+        # The node is full for image sessions, but keypoint sessions still run
+        for _ in range(3):
+            with client.websocket_connect("/api/v1/vision/ws/pose") as ws:
+                ws.send_json(keypoints)
+                assert ws.receive_json()["success"]
+        assert capacity.active_sessions == 1
+
+        with client.websocket_connect("/api/v1/vision/ws/pose") as ws:
+            ws.send_json(keypoints)
+            ws.receive_json()
+            ws.send_json({"frame": "not-an-image"})
+            assert ws.receive_json()["type"] == "busy"
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+            assert closed.value.code == 1013
+    assert capacity.active_sessions == 0
+
+
+def test_rate_advisor_recommends_fps_and_size_from_measured_latency():
+    advisor = FrameRateAdvisor(min_fps=5, max_fps=30, latency_budget_ms=250)
+
+    # 40 ms per frame: 85% of 25 fps
+    for _ in range(20):
+        advisor.record_frame(40.0)
+    recommendation = advisor.recommend()
+    assert (recommendation["fps"], recommendation["max_size"]) == (21, 640)
+    assert advisor.changed(recommendation) and not advisor.changed(advisor.recommend())
+
+    # The node's budget share caps the rate
+    assert advisor.recommend(share_fps=8.0)["fps"] == 8
+
+    # A slow network pushes end-to-end latency over budget: smaller frames
+    advisor.record_rtt(300.0)
+    assert advisor.recommend()["max_size"] == 480
+    assert advisor.recommend()["max_size"] == 320
+
+    # Fast again: sizes step back up
+    advisor.rtt_ms = 20.0
+    assert advisor.recommend()["max_size"] == 480
+
+
+def test_pose_batch_scheduler_returns_each_result_to_its_caller():
+    pose_model = FakePoseModel()
+    scheduler = PoseBatchScheduler(pose_model, window_ms=50, max_batch_size=4)
+    results = {}
+
+    def client(value):
+        keypoints, _ = scheduler(np.full((8, 8, 3), value, dtype=np.uint8))
+        results[value] = int(keypoints[0, 0, 0])
+
+    threads = [threading.Thread(target=client, args=(value,)) for value in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.stop()
+
+    assert results == {0: 0, 1: 1, 2: 2, 3: 3}
+    assert max(pose_model.session.batch_sizes) > 1
+
+
+def test_binary_frame_roundtrip():
+    message = pack_binary_frame(exercise_id=3, seq=42, client_ts=1700000000123, payload=b'\xff\xd8jpeg')
+    frame = parse_binary_frame(message)
+
+    assert (frame.msg_type, frame.exercise_id, frame.seq, frame.client_ts) == (MSG_IMAGE_FRAME, 3, 42, 1700000000123)
+    assert bytes(frame.payload) == b'\xff\xd8jpeg'
+
+    with pytest.raises(ProtocolError):
+        parse_binary_frame(b'XX' + message[2:])
+
+
+def test_large_jpeg_is_decoded_at_reduced_size():
+    image = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    jpeg = cv2.imencode('.jpg', image)[1].tobytes()
+    png = cv2.imencode('.png', image)[1].tobytes()
+
+    assert jpeg_size(jpeg) == (1920, 1080)
+    frame, scale = decode_image_bytes_scaled(jpeg, max_size=640)
+    assert frame.shape[:2] == (540, 960) and scale == 0.5
+
+    frame, scale = decode_image_bytes_scaled(png, max_size=640)
+    assert frame.shape[:2] == (1080, 1920) and scale == 1.0
+
+
+def test_stage_timings_are_exported_as_prometheus_histograms():
+    timer = StageTimer()
+    time.sleep(0.003)
+    timer.mark('decode')
+    timer.mark('count')
+    timer.mark('count')
+    assert list(timer.stages) == ['decode', 'count']
+    assert timer.stages['decode'] >= 3.0
+
+    histograms = LatencyHistograms(buckets_ms=(1, 1000))
+    histograms.record(timer, 'balanced')
+    histograms.record(StageTimer(), 'balanced')    # Nothing timed: not a frame
+    lines = histograms.render_prometheus().splitlines()
+    assert 'vision_stage_latency_seconds_bucket{stage="decode",mode="balanced",le="0.001"} 0' in lines
+    assert 'vision_stage_latency_seconds_bucket{stage="decode",mode="balanced",le="1"} 1' in lines
+    assert 'vision_stage_latency_seconds_count{stage="count",mode="balanced"} 1' in lines
+    assert 'vision_stage_latency_seconds_count{stage="total",mode="balanced"} 1' in lines
+
+
+def test_frame_mailbox_keeps_only_newest_frame():
+    async def scenario():
+        mailbox = FrameMailbox()
+        assert mailbox.put("frame-1") is False
+        assert mailbox.put("frame-2") is True
+        assert mailbox.put("frame-3") is True
+        assert mailbox.depth == 1
+        newest = await mailbox.get()
+        return newest, mailbox.depth, mailbox.superseded
+
+    assert asyncio.run(scenario()) == ("frame-3", 0, 2)
+
+
+def test_pose_tracker_skips_detection_until_interval_or_low_confidence():
+    tracker = PoseTracker(detect_interval=3, min_confidence=0.5)
+    keypoints = squat_keypoints(170)
+    confident = np.full(17, 0.9)
+
+    assert tracker.tracked_bboxes() is None
+    tracker.mark_detection()
+    tracker.update(keypoints, confident, (480, 640, 3))
+
+    bboxes = tracker.tracked_bboxes()
+    x1, y1, x2, y2 = bboxes[0]
+    assert x1 <= 100 and x2 >= 200 and y1 <= 200 and y2 <= 480
+
+    tracker.update(keypoints, confident, (480, 640, 3))
+    assert tracker.tracked_bboxes() is not None
+    tracker.update(keypoints, confident, (480, 640, 3))
+    assert tracker.tracked_bboxes() is not None
+    assert tracker.tracked_bboxes() is None  # detect_interval reached
+
+    tracker.mark_detection()
+    tracker.update(keypoints, np.full(17, 0.2), (480, 640, 3))
+    assert tracker.tracked_bboxes() is None  # track lost on low confidence
+
+
+def test_roi_crops_map_keypoints_back_and_skip_detection():
+    from types import SimpleNamespace
+    from app.workouts import PoseSession, RTMPoseProcessor
+
+    # Stub models: the person stands at squat_keypoints() + (200, 100) in a 640x480 camera frame
+    person = squat_keypoints(170) + [200.0, 100.0]
+    crop_origin = np.zeros(2)
+    calls = {'det': 0, 'pose': []}
+
+    def det_model(frame):
+        calls['det'] += 1
+        return [[0, 0, frame.shape[1], frame.shape[0]]]
+
+    def pose_model(frame, bboxes):
+        calls['pose'].append(bboxes[0])
+        return (person - crop_origin)[None], np.full((1, 17), 0.9)
+
+    processor = RTMPoseProcessor(ExerciseCounter(EXERCISES_CONFIG), MODELS_DIR, load_models=False)
+    processor.wholebody = SimpleNamespace(det_model=det_model, pose_model=pose_model)
+    processor.pose_models = {'balanced': pose_model}
+    session = PoseSession(processor)
+    session.configure_roi((640, 480), detect_interval=2)
+
+    session.process_frame(np.zeros((480, 640, 3), np.uint8), "squat")
+    x1, y1, x2, y2 = session.tracked_roi()
+    assert calls['det'] == 1
+    assert x1 <= person[:, 0].min() and x2 >= person[:, 0].max() and y2 <= 480
+
+    # Crops of the tracked region: no detection, keypoints in camera coordinates
+    crop_origin[:] = [x1, y1]
+    for _ in range(4):
+        _, _, keypoints = session.process_frame(np.zeros((y2 - y1, x2 - x1, 3), np.uint8), "squat",
+                                                crop_origin=(x1, y1))
+        assert np.allclose(keypoints, person)
+    assert calls['det'] == 1
+    # The pose model ran on the tracked box, shifted into the crop
+    assert np.allclose(np.add(calls['pose'][-1], [x1, y1, x1, y1]), session.tracker.bbox, atol=1)
+    assert session.tracked_roi() == [x1, y1, x2, y2]
+
+
+def test_blazepose_keypoints_map_to_coco17():
+    blazepose = np.arange(66, dtype=np.float64).reshape(33, 2)
+    scores = np.linspace(0, 1, 33)
+
+    keypoints, coco_scores = to_coco17(blazepose, scores)
+
+    assert keypoints.shape == (17, 2)
+    assert keypoints[5].tolist() == blazepose[11].tolist()   # left shoulder
+    assert keypoints[16].tolist() == blazepose[28].tolist()  # right ankle
+    assert coco_scores[11] == scores[23]                     # left hip
+
+    with pytest.raises(ValueError):
+        to_coco17(np.zeros((5, 2)))
+
+
+def test_compact_responses_send_state_only_when_changed():
+    encoder = CompactResponseEncoder()
+    response = {
+        "success": True, "detected": True, "exercise": "squat", "reps": 3, "stage": "up",
+        "form_corrections": [], "angle": 152.34, "keypoints": squat_keypoints(150), "seq": 7
+    }
+
+    first = decode_compact_result(encoder.encode(response))
+    assert first["seq"] == 7 and first["angle"] == 152.3
+    assert first["reps"] == 3 and first["stage"] == "up"
+    assert np.abs(np.array(first["keypoints"]) - response["keypoints"]).max() <= 0.5
+
+    second = decode_compact_result(encoder.encode(dict(response, seq=8)))
+    assert "reps" not in second and "stage" not in second
+
+    third = decode_compact_result(encoder.encode(dict(response, reps=4, seq=9)))
+    assert third["reps"] == 4 and "stage" not in third
+
+
+def test_compact_responses_keep_per_frame_fields_out_of_state():
+    encoder = CompactResponseEncoder()
+    response = {
+        "success": True, "detected": True, "session_id": "s1", "exercise": "squat", "reps": 3,
+        "stage": "up", "form_corrections": [], "mode": "accurate", "angle": 150.0, "seq": 7,
+        "client_ts": 1700000000123, "queue_depth": 0, "dropped_frames": 2, "roi": [10, 20, 300, 400]
+    }
+    encoder.encode(response)
+
+    data = encoder.encode(dict(response, seq=8, client_ts=1700000000156, queue_depth=1, roi=[12, 20, 302, 400]))
+    assert not data[4] & RESULT_STATE
+    result = decode_compact_result(data)
+    assert result["client_ts"] == 1700000000156 and result["queue_depth"] == 1
+    assert result["dropped_frames"] == 2 and result["roi"] == [12, 20, 302, 400]
+
+
+@pytest.mark.skipif(not os.path.exists(DET_MODEL), reason="detector model not available")
+def test_optimized_model_cache_is_written_once_and_reused(tmp_path):
+    config = OrtSessionConfig(intra_op_threads=1, cache_dir=str(tmp_path))
+    cached_path = optimized_model_path(DET_MODEL, config)
+
+    create_session(DET_MODEL, config)
+    assert os.path.exists(cached_path)
+    mtime = os.path.getmtime(cached_path)
+
+    session = create_session(DET_MODEL, config)
+    assert os.path.getmtime(cached_path) == mtime
+    assert session.get_inputs()[0].shape[1] == 3
+
+    # Different graph options get their own cache entry
+    other = OrtSessionConfig(graph_optimization='basic', cache_dir=str(tmp_path))
+    assert optimized_model_path(DET_MODEL, other) != cached_path
+
+
+@pytest.mark.skipif(not os.path.exists(DET_MODEL), reason="detector model not available")
+def test_static_quantization_writes_loadable_int8_model(tmp_path):
+    import shutil
+    import onnxruntime as ort
+
+    model_path = str(tmp_path / 'det.onnx')
+    shutil.copy(DET_MODEL, model_path)
+    assert find_quantized_model(model_path) is None
+
+    rng = np.random.default_rng(0)
+    inputs = [rng.uniform(0, 255, (1, 3, 416, 416)).astype(np.float32) for _ in range(2)]
+    quantized = quantize_model_static(model_path, inputs)
+
+    assert find_quantized_model(model_path) == quantized
+    assert os.path.getsize(quantized) < os.path.getsize(model_path)
+    session = ort.InferenceSession(quantized, providers=['CPUExecutionProvider'])
+    session.run(None, {session.get_inputs()[0].name: inputs[0]})
+
+
+def test_adaptive_mode_falls_back_under_load_and_recovers():
+    from app.workouts import RTMPoseProcessor
+
+    executor = InferenceExecutor(max_workers=1, max_pending=4)
+    monitor = NodeLoadMonitor(executor, overload_latency_ms=100.0, overload_queue_ratio=0.75)
+    controller = AdaptiveModeController(monitor, latency_budget_ms=1000.0, min_dwell_frames=3)
+
+    try:
+        for _ in range(3):
+            controller.record(50.0)
+        assert controller.mode == 'balanced'
+
+        # Queue pressure alone pushes the session to the lightweight model
+        for session_id in ('a', 'b', 'c', 'd'):
+            executor.reserve(session_id)
+        for _ in range(3):
+            controller.record(50.0)
+        assert controller.mode == 'lightweight'
+        assert monitor.overloaded
+
+        for session_id in ('a', 'b', 'c', 'd'):
+            executor.release(session_id)
+        for _ in range(3):
+            controller.record(50.0)
+        assert controller.mode == 'balanced'
+        assert controller.switches == 2
+    finally:
+        executor.shutdown()
+
+    # A server without the fallback model runs (and reports) the default mode
+    processor = RTMPoseProcessor(ExerciseCounter(EXERCISES_CONFIG), MODELS_DIR, load_models=False)
+    processor.pose_models = {'balanced': None}
+    assert processor.loaded_modes == ['balanced']
+    assert processor.resolve_mode('lightweight') == 'balanced'
+
+
+def test_video_chunks_are_stitched_and_counted_on_video_time():
+    from app.workouts import RTMPoseProcessor
+
+    processor = RTMPoseProcessor(ExerciseCounter(EXERCISES_CONFIG), MODELS_DIR, load_models=False)
+    fps = 30.0
+
+    # Three squats, one per 2 s of video: 170 deg -> 70 deg -> 170 deg
+    angles = [120 + 50 * np.cos(2 * np.pi * i / 60) for i in range(180)]
+    frames = [(i, squat_keypoints(angle), np.ones(17)) for i, angle in enumerate(angles)]
+
+    # Chunks arriving out of order, with frames 85-99 returned twice
+    merged = merge_chunks([frames[100:], frames[:100], frames[85:100]])
+    assert [frame[0] for frame in merged] == list(range(180))
+
+    result = count_timeline(processor, merged, 'squat', fps)
+    assert result["reps"] == 3
+    assert [rep["rep"] for rep in result["rep_timeline"]] == [1, 2, 3]
+    times = [rep["time"] for rep in result["rep_timeline"]]
+    assert all(later - earlier > 1.5 for earlier, later in zip(times, times[1:]))
+    assert len(result["angles"]["time"]) == len(result["angles"]["angle"]) == 180
+
+
+def test_video_rep_across_a_chunk_boundary_is_counted_once(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+
+    # 30 fps clip whose brightness encodes the knee angle; 1 s chunks end at frames 30, 60, ...
+    # Both squats bottom out across a boundary (down through frames 15-44 and 75-104)
+    angles = [70.0 if 15 <= i < 45 or 75 <= i < 105 else 170.0 for i in range(135)]
+    path = str(tmp_path / 'squats.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (64, 48))
+    for angle in angles:
+        writer.write(np.full((48, 64, 3), int(angle), np.uint8))
+    writer.release()
+
+    monkeypatch.setattr(video_analysis, '_worker_processor', SimpleNamespace(
+        prepare_frame=lambda frame: (frame, 1.0),
+        estimate_pose=lambda frame: (squat_keypoints(float(frame.mean()))[None], np.ones((1, 17)))
+    ))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        result = analyze_video(path, 'squat', FakeProcessor(), pool, chunk_seconds=1.0)
+
+    assert result["chunks"] == 5
+    assert result["frames_analyzed"] == len(angles)
+    assert result["reps"] == 2
+    first, second = (rep["time"] for rep in result["rep_timeline"])
+    assert 0.5 <= first < 1.5 and 2.5 <= second < 3.5
+
+
+def test_warm_up_runs_every_model_on_dummy_frames():
+    from types import SimpleNamespace
+    from app.workouts import RTMPoseProcessor
+
+    processor = RTMPoseProcessor(ExerciseCounter(EXERCISES_CONFIG), MODELS_DIR, load_models=False)
+    assert processor.warm_up() == {}
+
+    calls = {'det': [], 'pose': []}
+    processor.wholebody = SimpleNamespace(det_model=lambda frame: calls['det'].append(frame.shape))
+    processor.pose_models = {'balanced': lambda frame, bboxes: calls['pose'].append(frame.shape)}
+
+    stats = processor.warm_up(runs=3)
+    assert set(stats) == {'detector', 'pose_balanced'}
+    assert all(s["first_ms"] >= 0 and s["warm_ms"] >= 0 for s in stats.values())
+    assert len(calls['det']) == len(calls['pose']) == 3
+    assert calls['det'][0] == (stats['detector']['input_size'][1], stats['detector']['input_size'][0], 3)